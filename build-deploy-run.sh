@@ -12,6 +12,8 @@ ROOT="$(cd "$(dirname "$0")" && pwd)"
 echo "=== Build ==="
 cd "$ROOT/src/app"
 uv run apx build
+# Precompressed .gz/.br copies of the UI bundle, served according to Accept-Encoding
+uv run python -m gainwell_genie_app.backend.static
 
 echo ""
 echo "=== Deploy (target=$TARGET, profile=$PROFILE) ==="
@@ -2,12 +2,37 @@
 Generate synthetic data for plandata_parallel_replica tables.
 Parameterized via env: CATALOG, SCHEMA (defaults: dc_dev_replication, plandata_parallel_replica).
 Run on Databricks (Spark + pandas). Uses dbdemos-shared-endpoint for any SQL if needed.
+Anywhere else, --output parquet writes the tables as local Parquet files (needs pyarrow, not Spark).
+
+Every column is sampled with NumPy (no per-row Python); names and company names come from pools
+generated once with Faker. --scale-factor multiplies the row counts below (1 = demo size, 10000 =
+35M claims); carriers and plans stay fixed. Tables larger than --chunk-rows are generated in chunks
+on --workers processes and written chunk by chunk, so memory stays bounded. Each chunk is seeded by
+its table and first row, so the data does not depend on the number of workers.
+
+Foreign keys always resolve: ids are drawn from the generated key ranges, and the member and plan of
+enrollment i are a fixed function of i, so every claim and referral carries its enrollment's member
+(and claims its plan) without the workers sharing any arrays.
+
+lastupdate is the time of a row's latest change (adjudication, termination, an edit), never the run
+time. --delta adds one day (--as-of) of changes to an existing load instead: new claims and
+enrollments after the existing key ranges, pending claims paid or denied, active enrollments
+terminated, all stamped during that day. Spark merges them on the key; Parquet appends them as
+delta-<day> files. Writes are the size of the delta.
 """
+import argparse
 import os
+import shutil
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator
+
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
 from faker import Faker
 
 # -----------------------------------------------------------------------------
@@ -15,6 +40,7 @@ from faker import Faker
 # -----------------------------------------------------------------------------
 CATALOG = os.environ.get("CATALOG", "dc_dev_replication")
 SCHEMA = os.environ.get("SCHEMA", "plandata_parallel_replica")
+# Row counts at --scale-factor 1
 N_MEMBERS = 800
 N_CARRIERS = 12
 N_PLANS = 50
@@ -23,177 +49,725 @@ N_ENROLLMENTS = 2000
 N_CLAIMS = 3500
 N_REFERRALS = 400
 SEED = 42
+# Faker names sampled for members and providers
+NAME_POOL = 20_000
+# Claims are adjudicated within this many days of service; only younger claims can still be pending
+PENDING_DAYS = 30
+# Daily delta (--delta) at --scale-factor 1: the full load holds about 400 days of claims and two years
+# of enrollments, 15% of them terminated
+DELTA_CLAIMS = N_CLAIMS / 400
+DELTA_ENROLLMENTS = N_ENROLLMENTS / 730
+DELTA_TERMINATIONS = 0.15 * N_ENROLLMENTS / 730
+# Share of new claims that arrive pending (and, by default, of pending claims resolved per day)
+NEW_PENDING = 0.6
+# Key column and id prefix of the tables whose key ranges a delta reads
+KEYS = {"member": ("memid", "M"), "provider": ("provid", "P"), "enrollkeys": ("enrollid", "E"), "claim": ("claimid", "CLM")}
+
+# One chunk of a table: column name -> NumPy array (strings, float64, datetime64[us]; dob is datetime64[D])
+Columns = dict[str, np.ndarray]
+
+
+@dataclass(frozen=True)
+class Context:
+    """Everything a worker needs to generate any chunk of any table."""
+    counts: dict[str, int]
+    now: np.datetime64
+    names: np.ndarray
+    companies: np.ndarray
+    phrases: np.ndarray
+
+
+def scaled_counts(scale_factor: float) -> dict[str, int]:
+    def scale(n: int) -> int:
+        return max(int(round(n * scale_factor)), 1)
+
+    return {
+        "carrier": N_CARRIERS,
+        "benefitplan": N_PLANS,
+        "member": scale(N_MEMBERS),
+        "provider": scale(N_PROVIDERS),
+        "enrollkeys": scale(N_ENROLLMENTS),
+        "claim": scale(N_CLAIMS),
+        "referral": scale(N_REFERRALS),
+    }
+
+
+def make_context(scale_factor: float) -> Context:
+    Faker.seed(SEED)
+    fake = Faker()
+    counts = scaled_counts(scale_factor)
+    n_names = min(NAME_POOL, counts["member"] + counts["provider"])
+    return Context(
+        counts=counts,
+        now=np.datetime64(datetime.now().replace(microsecond=0), "us"),
+        names=np.array([fake.name() for _ in range(n_names)]),
+        companies=np.array([fake.company() for _ in range(2 * N_CARRIERS)]),
+        phrases=np.array([fake.catch_phrase() for _ in range(N_PLANS)]),
+    )
+
+
+# -----------------------------------------------------------------------------
+# Column helpers
+# -----------------------------------------------------------------------------
+DAY = np.timedelta64(1, "D")
+YEAR = np.timedelta64(365, "D")
+
+
+def key_width(width: int, n: int) -> int:
+    """Digits of the ids of an n-row table: at least width, more when n needs them (like %0<width>d)."""
+    return max(width, len(str(max(n - 1, 0))))
+
+
+def ids(prefix: str, index: np.ndarray, width: int) -> np.ndarray:
+    """prefix + zero-padded index, formatted as a byte matrix instead of one string at a time."""
+    index = np.asarray(index, dtype=np.int64)
+    out = np.empty((len(index), len(prefix) + width), dtype=np.uint8)
+    out[:, :len(prefix)] = np.frombuffer(prefix.encode(), dtype=np.uint8)
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    out[:, len(prefix):] = (index[:, None] // powers) % 10 + ord("0")
+    return out.view(f"S{out.shape[1]}").ravel().astype(str)
+
+
+def table_ids(ctx: Context, table: str, prefix: str, width: int, index: np.ndarray) -> np.ndarray:
+    return ids(prefix, index, key_width(width, ctx.counts[table]))
+
+
+def datetimes(rng: np.random.Generator, start: np.datetime64, end: np.datetime64, n: int) -> np.ndarray:
+    """n uniform timestamps in [start, end), second resolution."""
+    span = int((end - start) / np.timedelta64(1, "s"))
+    return start + rng.integers(0, max(span, 1), n).astype("timedelta64[s]")
+
+
+def after(rng: np.random.Generator, start: np.ndarray, end: np.datetime64) -> np.ndarray:
+    """A uniform timestamp between each start and end."""
+    span = ((end - start) / np.timedelta64(1, "s")).astype(np.int64)
+    return start + (rng.random(len(start)) * span).astype("timedelta64[s]")
+
+
+def updated(rng: np.random.Generator, event: np.ndarray, now: np.datetime64, max_days: float) -> np.ndarray:
+    """lastupdate of rows whose latest change was event: up to max_days of processing later, never after now."""
+    lag = (rng.random(len(event)) * max_days * 86_400).astype("timedelta64[s]")
+    return np.minimum(event + lag, now)
+
+
+def nullable(rng: np.random.Generator, values: np.ndarray, p_null: float) -> np.ndarray:
+    return np.where(rng.random(len(values)) < p_null, np.datetime64("NaT"), values)
+
 
-np.random.seed(SEED)
-Faker.seed(SEED)
-fake = Faker()
+def choice(rng: np.random.Generator, values: list[str], n: int, p: list[float] | None = None) -> np.ndarray:
+    return np.asarray(values)[rng.choice(len(values), n, p=p)]
 
-# Spark session (available on Databricks)
-spark = None
-try:
-    from pyspark.sql import SparkSession
-    spark = SparkSession.builder.getOrCreate()
-except Exception:
-    pass
 
-if spark is None:
-    raise RuntimeError("Spark is required. Run this script on Databricks or a Spark environment.")
+def _mix(index: np.ndarray, salt: int) -> np.ndarray:
+    """splitmix64 of index: a fixed pseudo-random function, identical in every worker."""
+    with np.errstate(over="ignore"):
+        z = index.astype(np.uint64) + np.uint64(salt) * np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
 
 
+def enrollment_member(ctx: Context, enrollment: np.ndarray) -> np.ndarray:
+    return (_mix(enrollment, 1) % np.uint64(ctx.counts["member"])).astype(np.int64)
+
+
+def enrollment_plan(ctx: Context, enrollment: np.ndarray) -> np.ndarray:
+    return (_mix(enrollment, 2) % np.uint64(ctx.counts["benefitplan"])).astype(np.int64)
+
+
+# -----------------------------------------------------------------------------
+# Tables: rows [lo, hi) of each, from a generator seeded for that chunk
+# -----------------------------------------------------------------------------
+def gen_carrier(ctx: Context, rng: np.random.Generator, lo: int, hi: int) -> Columns:
+    n = hi - lo
+    i = np.arange(lo, hi)
+    created = datetimes(rng, ctx.now - 2 * YEAR, ctx.now - YEAR, n)
+    return {
+        "carrierid": table_ids(ctx, "carrier", "C", 4, i),
+        "description": ctx.companies[i % len(ctx.companies)],
+        "carriertype": choice(rng, ["PPO", "HMO", "EPO"], n, p=[0.5, 0.35, 0.15]),
+        "fullname": ctx.companies[(i + N_CARRIERS) % len(ctx.companies)],
+        "createdate": created,
+        "lastupdate": updated(rng, created, ctx.now, 365),
+    }
+
+
+def gen_benefitplan(ctx: Context, rng: np.random.Generator, lo: int, hi: int) -> Columns:
+    n = hi - lo
+    i = np.arange(lo, hi)
+    created = datetimes(rng, ctx.now - 2 * YEAR, ctx.now - 182 * DAY, n)
+    return {
+        "planid": table_ids(ctx, "benefitplan", "PLAN", 5, i),
+        "programid": choice(rng, ["MED", "DENT", "VISION"], n, p=[0.7, 0.2, 0.1]),
+        "description": np.array([f"Plan {k} - {ctx.phrases[k % len(ctx.phrases)]}" for k in i]),
+        "plantype": choice(rng, ["Standard", "Premium", "Basic"], n, p=[0.5, 0.3, 0.2]),
+        "status": choice(rng, ["active", "inactive"], n, p=[0.9, 0.1]),
+        "lifetimemax": np.round(rng.lognormal(12, 0.5, n), 2),
+        "familydeductible": np.round(rng.lognormal(8, 0.6, n), 2),
+        "maxoutofpocket": np.round(rng.lognormal(9, 0.5, n), 2),
+        "createdate": created,
+        "lastupdate": updated(rng, created, ctx.now, 365),
+    }
+
+
+def gen_member(ctx: Context, rng: np.random.Generator, lo: int, hi: int) -> Columns:
+    n = hi - lo
+    i = np.arange(lo, hi)
+    today = ctx.now.astype("datetime64[D]")
+    dob = today - rng.integers(18 * 365, 85 * 365, n).astype("timedelta64[D]")
+    created = datetimes(rng, ctx.now - 3 * YEAR, ctx.now - YEAR, n)
+    return {
+        "memid": table_ids(ctx, "member", "M", 6, i),
+        "entityid": table_ids(ctx, "member", "ENT", 6, i),
+        "status": choice(rng, ["active", "inactive", "terminated"], n, p=[0.85, 0.05, 0.1]),
+        "sex": choice(rng, ["M", "F"], n, p=[0.48, 0.52]),
+        "fullname": ctx.names[rng.integers(0, len(ctx.names), n)],
+        "dob": dob,
+        "createdate": created,
+        "lastupdate": updated(rng, created, ctx.now, 365),
+    }
+
+
+def gen_provider(ctx: Context, rng: np.random.Generator, lo: int, hi: int) -> Columns:
+    n = hi - lo
+    i = np.arange(lo, hi)
+    created = datetimes(rng, ctx.now - 3 * YEAR, ctx.now - 182 * DAY, n)
+    return {
+        "provid": table_ids(ctx, "provider", "P", 5, i),
+        "entityid": table_ids(ctx, "provider", "PE", 5, i),
+        "fullname": ctx.names[rng.integers(0, len(ctx.names), n)],
+        "specialtycode": choice(rng, ["IM", "PED", "CAR", "ORTH", "PSY"], n, p=[0.25, 0.2, 0.2, 0.2, 0.15]),
+        "provtype": choice(rng, ["MD", "DO", "NP", "PA"], n, p=[0.5, 0.2, 0.2, 0.1]),
+        "status": choice(rng, ["active", "inactive"], n, p=[0.92, 0.08]),
+        "createdate": created,
+        "lastupdate": updated(rng, created, ctx.now, 365),
+    }
+
+
+def gen_enrollkeys(ctx: Context, rng: np.random.Generator, lo: int, hi: int) -> Columns:
+    n = hi - lo
+    i = np.arange(lo, hi)
+    effdate = datetimes(rng, ctx.now - 2 * YEAR, ctx.now, n)
+    termdate = nullable(rng, after(rng, effdate, ctx.now), 0.85)
+    return {
+        "enrollid": table_ids(ctx, "enrollkeys", "E", 8, i),
+        "planid": table_ids(ctx, "benefitplan", "PLAN", 5, enrollment_plan(ctx, i)),
+        "memid": table_ids(ctx, "member", "M", 6, enrollment_member(ctx, i)),
+        "effdate": effdate,
+        "termdate": termdate,
+        "enrollmenttype": choice(rng, ["New", "Renewal", "Transfer"], n, p=[0.3, 0.5, 0.2]),
+        "createdate": effdate - rng.integers(0, 30 * 86_400, n).astype("timedelta64[s]"),
+        "lastupdate": updated(rng, np.where(np.isnat(termdate), effdate, termdate), ctx.now, 7),
+    }
+
+
+def gen_claim(ctx: Context, rng: np.random.Generator, lo: int, hi: int) -> Columns:
+    n = hi - lo
+    enrollment = rng.integers(0, ctx.counts["enrollkeys"], n)
+    start = ctx.now.astype("datetime64[D]") - rng.integers(0, 400, n).astype("timedelta64[D]")
+    start = start.astype("datetime64[us]")
+    end = start + rng.integers(0, 5, n).astype("timedelta64[D]")
+    amt = rng.lognormal(6, 1.2, n)
+    recent = start > ctx.now - PENDING_DAYS * DAY
+    status = np.where(
+        recent,
+        choice(rng, ["paid", "pending", "denied"], n, p=[0.35, NEW_PENDING, 0.05]),
+        choice(rng, ["paid", "denied"], n, p=[0.93, 0.07]),
+    )
+    # Pending claims were last touched on receipt, the others when adjudicated after the service ended
+    touched = np.where(status == "pending", start + DAY, end + rng.integers(1, 15, n).astype("timedelta64[D]"))
+    return {
+        "claimid": table_ids(ctx, "claim", "CLM", 8, np.arange(lo, hi)),
+        "enrollid": table_ids(ctx, "enrollkeys", "E", 8, enrollment),
+        "memid": table_ids(ctx, "member", "M", 6, enrollment_member(ctx, enrollment)),
+        "provid": table_ids(ctx, "provider", "P", 5, rng.integers(0, ctx.counts["provider"], n)),
+        "planid": table_ids(ctx, "benefitplan", "PLAN", 5, enrollment_plan(ctx, enrollment)),
+        "startdate": start,
+        "enddate": end,
+        "totalamt": np.round(amt, 2),
+        "eligibleamt": np.round(amt * rng.uniform(0.7, 1.0, n), 2),
+        "totalpaid": np.round(amt * rng.uniform(0.5, 0.95, n), 2),
+        "status": status,
+        "createdate": start,
+        "lastupdate": updated(rng, touched, ctx.now, 1),
+    }
+
+
+def gen_referral(ctx: Context, rng: np.random.Generator, lo: int, hi: int) -> Columns:
+    n = hi - lo
+    enrollment = rng.integers(0, ctx.counts["enrollkeys"], n)
+    effdate = datetimes(rng, ctx.now - 2 * YEAR, ctx.now, n)
+    n_prov = ctx.counts["provider"]
+    termdate = nullable(rng, after(rng, effdate, ctx.now), 0.8)
+    return {
+        "referralid": table_ids(ctx, "referral", "REF", 7, np.arange(lo, hi)),
+        "enrollid": table_ids(ctx, "enrollkeys", "E", 8, enrollment),
+        "memid": table_ids(ctx, "member", "M", 6, enrollment_member(ctx, enrollment)),
+        "referto": table_ids(ctx, "provider", "P", 5, rng.integers(0, n_prov, n)),
+        "referfrom": table_ids(ctx, "provider", "P", 5, rng.integers(0, n_prov, n)),
+        "effdate": effdate,
+        "termdate": termdate,
+        "status": choice(rng, ["approved", "pending", "completed"], n, p=[0.5, 0.2, 0.3]),
+        "createdate": effdate - rng.integers(0, 14 * 86_400, n).astype("timedelta64[s]"),
+        "lastupdate": updated(rng, np.where(np.isnat(termdate), effdate, termdate), ctx.now, 7),
+    }
+
+
+# Written in this order; the position is part of every chunk's seed
+TABLES: dict[str, Callable[[Context, np.random.Generator, int, int], Columns]] = {
+    "carrier": gen_carrier,
+    "benefitplan": gen_benefitplan,
+    "member": gen_member,
+    "provider": gen_provider,
+    "enrollkeys": gen_enrollkeys,
+    "claim": gen_claim,
+    "referral": gen_referral,
+}
+
+
+# -----------------------------------------------------------------------------
+# Daily delta: rows added or changed on one day, [start, end)
+# -----------------------------------------------------------------------------
+def delta_enrollkeys(ctx: Context, rng: np.random.Generator, lo: int, hi: int, start: np.datetime64, end: np.datetime64) -> Columns:
+    """Enrollments lo..hi received during the day, effective the first of the next month."""
+    n = hi - lo
+    i = np.arange(lo, hi)
+    created = datetimes(rng, start, end, n)
+    return {
+        "enrollid": table_ids(ctx, "enrollkeys", "E", 8, i),
+        "planid": table_ids(ctx, "benefitplan", "PLAN", 5, enrollment_plan(ctx, i)),
+        "memid": table_ids(ctx, "member", "M", 6, enrollment_member(ctx, i)),
+        "effdate": (created.astype("datetime64[M]") + 1).astype("datetime64[us]"),
+        "termdate": np.full(n, np.datetime64("NaT", "us")),
+        "enrollmenttype": choice(rng, ["New", "Renewal", "Transfer"], n, p=[0.3, 0.5, 0.2]),
+        "createdate": created,
+        "lastupdate": created,
+    }
+
+
+def delta_claim(ctx: Context, rng: np.random.Generator, lo: int, hi: int, start: np.datetime64, end: np.datetime64) -> Columns:
+    """Claims lo..hi received during the day for services in the two weeks before."""
+    n = hi - lo
+    enrollment = rng.integers(0, ctx.counts["enrollkeys"], n)
+    received = datetimes(rng, start, end, n)
+    service = received.astype("datetime64[D]") - rng.integers(1, 15, n).astype("timedelta64[D]")
+    service = service.astype("datetime64[us]")
+    amt = rng.lognormal(6, 1.2, n)
+    return {
+        "claimid": table_ids(ctx, "claim", "CLM", 8, np.arange(lo, hi)),
+        "enrollid": table_ids(ctx, "enrollkeys", "E", 8, enrollment),
+        "memid": table_ids(ctx, "member", "M", 6, enrollment_member(ctx, enrollment)),
+        "provid": table_ids(ctx, "provider", "P", 5, rng.integers(0, ctx.counts["provider"], n)),
+        "planid": table_ids(ctx, "benefitplan", "PLAN", 5, enrollment_plan(ctx, enrollment)),
+        "startdate": service,
+        "enddate": np.minimum(service + rng.integers(0, 5, n).astype("timedelta64[D]"), received),
+        "totalamt": np.round(amt, 2),
+        "eligibleamt": np.round(amt * rng.uniform(0.7, 1.0, n), 2),
+        "totalpaid": np.round(amt * rng.uniform(0.5, 0.95, n), 2),
+        "status": choice(rng, ["pending", "paid", "denied"], n, p=[NEW_PENDING, 0.35, 0.05]),
+        "createdate": received,
+        "lastupdate": received,
+    }
+
+
+# -----------------------------------------------------------------------------
+# Chunked, parallel generation
+# -----------------------------------------------------------------------------
+_worker_ctx: Context | None = None
+
+
+def _init_worker(ctx: Context) -> None:
+    global _worker_ctx
+    _worker_ctx = ctx
+
+
+def generate_chunk(ctx: Context, table: str, lo: int, hi: int) -> Columns:
+    rng = np.random.default_rng([SEED, list(TABLES).index(table), lo])
+    return TABLES[table](ctx, rng, lo, hi)
+
+
+def _worker_chunk(table: str, lo: int, hi: int) -> Columns:
+    assert _worker_ctx is not None
+    return generate_chunk(_worker_ctx, table, lo, hi)
+
+
+def generate(
+    ctx: Context, table: str, *, chunk_rows: int, pool: ProcessPoolExecutor | None, max_pending: int
+) -> Iterator[Columns]:
+    """Chunks of the table in order; at most max_pending chunks are generated ahead of the consumer."""
+    n = ctx.counts[table]
+    bounds = [(lo, min(lo + chunk_rows, n)) for lo in range(0, n, chunk_rows)]
+    if pool is None or len(bounds) == 1:
+        for lo, hi in bounds:
+            yield generate_chunk(ctx, table, lo, hi)
+        return
+    pending = deque()
+    for lo, hi in bounds:
+        pending.append(pool.submit(_worker_chunk, table, lo, hi))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+# -----------------------------------------------------------------------------
+# Output: Spark tables (Databricks) or local Parquet files
+# -----------------------------------------------------------------------------
 def full_name(table: str) -> str:
     return f"{CATALOG}.{SCHEMA}.{table}"
 
 
-def write_table(df: pd.DataFrame, table: str, mode: str = "overwrite") -> None:
-    spark_df = spark.createDataFrame(df)
-    # Overwrite schema so our generated columns replace any existing table schema (e.g. NOT NULL cosgroupid)
-    # Retry on concurrent update (e.g. another run or retry writing to same table)
-    last_err = None
-    for attempt in range(4):
+def get_spark():
+    try:
+        from pyspark.sql import SparkSession
+        return SparkSession.builder.getOrCreate()
+    except Exception:
+        return None
+
+
+def to_pandas(cols: Columns) -> pd.DataFrame:
+    """DataFrame for spark.createDataFrame; day-resolution columns become dates (DateType)."""
+    return pd.DataFrame({k: pd.to_datetime(v).date if v.dtype == "datetime64[D]" else v for k, v in cols.items()})
+
+
+def from_pandas(df: pd.DataFrame) -> Columns:
+    return {k: df[k].to_numpy() for k in df.columns}
+
+
+class SparkOutput:
+    """Delta tables in CATALOG.SCHEMA: the first chunk overwrites the table, the rest append.
+
+    A daily delta is merged on the table's key (MERGE INTO), so Delta rewrites only the files that
+    hold changed rows.
+    """
+
+    def __init__(self) -> None:
+        self.spark = get_spark()
+        if self.spark is None:
+            raise RuntimeError(
+                "Spark is required for --output spark. Run this script on Databricks or a Spark environment, "
+                "or write local files with --output parquet."
+            )
+        print(f"Using catalog.schema: {CATALOG}.{SCHEMA}")
+        print("Creating schema if not exists...")
+        self.spark.sql(f"CREATE SCHEMA IF NOT EXISTS {CATALOG}.{SCHEMA}")
+
+    @property
+    def location(self) -> str:
+        return full_name("") + "*"
+
+    def write_table(self, df: pd.DataFrame, table: str, mode: str = "overwrite") -> None:
+        spark_df = self.spark.createDataFrame(df)
+        writer = spark_df.write.mode(mode)
+        if mode == "overwrite":
+            # Overwrite schema so our generated columns replace any existing table schema (e.g. NOT NULL cosgroupid)
+            writer = writer.option("overwriteSchema", "true")
+        # Retry on concurrent update (e.g. another run or retry writing to same table)
+        last_err = None
+        for attempt in range(4):
+            try:
+                writer.saveAsTable(full_name(table))
+                return
+            except Exception as e:
+                last_err = e
+                if "ConcurrentAppendException" in type(e).__name__ or "DELTA_CONCURRENT" in str(e):
+                    if attempt < 3:
+                        time.sleep(2 ** attempt)
+                        continue
+                raise last_err
+        raise last_err
+
+    def write(self, table: str, chunks: Iterator[Columns]) -> int:
+        rows = 0
+        for k, cols in enumerate(chunks):
+            df = to_pandas(cols)
+            self.write_table(df, table, "overwrite" if k == 0 else "append")
+            rows += len(df)
+        return rows
+
+    def key_count(self, table: str, key: str, prefix: str) -> int:
+        """Rows in the table's key range (ids prefix0..prefixN-1), from its largest id."""
+        top = self.spark.sql(
+            f"SELECT max(CAST(substring({key}, {len(prefix) + 1}) AS BIGINT)) FROM {full_name(table)}"
+        ).first()[0]
+        return 0 if top is None else top + 1
+
+    def current(
+        self, table: str, column: str, value: str | None, *, limit: int, seed: int,
+        since: tuple[str, np.datetime64] | None = None,
+    ) -> Columns:
+        """Up to limit random rows where column == value (IS NULL for None) and since[0] >= since[1]."""
+        from pyspark.sql import functions as F
+
+        cond = F.col(column).isNull() if value is None else F.col(column) == value
+        if since is not None:
+            cond = cond & (F.col(since[0]) >= F.lit(since[1].astype(datetime)))
+        df = self.spark.table(full_name(table)).where(cond).orderBy(F.rand(seed)).limit(limit)
+        return from_pandas(df.toPandas())
+
+    def merge(self, table: str, key: str, chunks: Iterator[Columns], tag: str) -> int:
+        rows = 0
+        for cols in chunks:
+            df = to_pandas(cols)
+            if df.empty:
+                continue
+            view = f"{table}_{tag.replace('-', '_')}"
+            self.spark.createDataFrame(df).createOrReplaceTempView(view)
+            self.spark.sql(
+                f"MERGE INTO {full_name(table)} t USING {view} s ON t.{key} = s.{key} "
+                "WHEN MATCHED THEN UPDATE SET * WHEN NOT MATCHED THEN INSERT *"
+            )
+            rows += len(df)
+        return rows
+
+
+# Hive-style partition column of the Parquet output, and the timestamp column whose month it is
+PARQUET_PARTITIONS = {"claim": ("claim_month", "startdate")}
+
+
+class ParquetOutput:
+    """Parquet files under root/<table>/, in claim_month=YYYY-MM/ directories for partitioned tables.
+
+    Each partition has one open ParquetWriter; chunk slices are buffered per partition only until they
+    fill a row group, so memory stays flat however large the table. A table's directory is replaced.
+
+    Parquet files cannot be updated in place, so a daily delta is appended as delta-<day>.parquet
+    files next to the full load, holding new rows and the new versions of changed ones: the current
+    state of a row is its version with the latest lastupdate.
+    """
+
+    def __init__(self, root: Path, *, row_group_rows: int, compression: str) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa, self.pq = pa, pq
+        self.root = root
+        self.row_group_rows = row_group_rows
+        self.compression = compression
+
+    @property
+    def location(self) -> str:
+        return str(self.root)
+
+    def write(self, table: str, chunks: Iterator[Columns], *, file: str = "part-00000", replace: bool = True) -> int:
+        out = self.root / table
+        if replace and out.exists():
+            shutil.rmtree(out)
+        out.mkdir(parents=True, exist_ok=True)
+        writers: dict[str, object] = {}
+        buffers: dict[str, list] = {}
+        rows = 0
+
+        def flush(part: str) -> None:
+            data = self.pa.concat_tables(buffers.pop(part))
+            if part not in writers:
+                path = out / part / f"{file}.parquet"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                writers[part] = self.pq.ParquetWriter(path, data.schema, compression=self.compression)
+            writers[part].write_table(data, row_group_size=self.row_group_rows)
+
         try:
-            spark_df.write.mode(mode).option("overwriteSchema", "true").saveAsTable(full_name(table))
-            return
-        except Exception as e:
-            last_err = e
-            if "ConcurrentAppendException" in type(e).__name__ or "DELTA_CONCURRENT" in str(e):
-                if attempt < 3:
-                    time.sleep(2 ** attempt)
+            for cols in chunks:
+                data = self.pa.table(cols)
+                if not data.num_rows:
                     continue
-            raise last_err
-    raise last_err
-
-
-def run_sql(sql: str) -> None:
-    spark.sql(sql)
-
-
-def main() -> None:
-    print(f"Using catalog.schema: {CATALOG}.{SCHEMA}")
-    print("Creating schema if not exists...")
-    run_sql(f"CREATE SCHEMA IF NOT EXISTS {CATALOG}.{SCHEMA}")
-
-    # ----- Carriers -----
-    print("Generating carriers...")
-    carriers = pd.DataFrame({
-        "carrierid": [f"C{i:04d}" for i in range(N_CARRIERS)],
-        "description": [fake.company() for _ in range(N_CARRIERS)],
-        "carriertype": np.random.choice(["PPO", "HMO", "EPO"], N_CARRIERS, p=[0.5, 0.35, 0.15]),
-        "fullname": [fake.company() for _ in range(N_CARRIERS)],
-        "createdate": [fake.date_time_between(start_date="-2y", end_date="-1y") for _ in range(N_CARRIERS)],
-        "lastupdate": datetime.now(),
-    })
-    write_table(carriers, "carrier")
-
-    # ----- Benefit plans -----
-    print("Generating benefit plans...")
-    plans = pd.DataFrame({
-        "planid": [f"PLAN{i:05d}" for i in range(N_PLANS)],
-        "programid": np.random.choice(["MED", "DENT", "VISION"], N_PLANS, p=[0.7, 0.2, 0.1]),
-        "description": [f"Plan {i} - {fake.catch_phrase()}" for i in range(N_PLANS)],
-        "plantype": np.random.choice(["Standard", "Premium", "Basic"], N_PLANS, p=[0.5, 0.3, 0.2]),
-        "status": np.random.choice(["active", "inactive"], N_PLANS, p=[0.9, 0.1]),
-        "lifetimemax": np.round(np.random.lognormal(12, 0.5, N_PLANS), 2),
-        "familydeductible": np.round(np.random.lognormal(8, 0.6, N_PLANS), 2),
-        "maxoutofpocket": np.round(np.random.lognormal(9, 0.5, N_PLANS), 2),
-        "createdate": [fake.date_time_between(start_date="-2y", end_date="-6m") for _ in range(N_PLANS)],
-        "lastupdate": datetime.now(),
-    })
-    write_table(plans, "benefitplan")
-
-    # ----- Members -----
-    print("Generating members...")
-    members = pd.DataFrame({
-        "memid": [f"M{i:06d}" for i in range(N_MEMBERS)],
-        "entityid": [f"ENT{i:06d}" for i in range(N_MEMBERS)],
-        "status": np.random.choice(["active", "inactive", "terminated"], N_MEMBERS, p=[0.85, 0.05, 0.1]),
-        "sex": np.random.choice(["M", "F"], N_MEMBERS, p=[0.48, 0.52]),
-        "fullname": [fake.name() for _ in range(N_MEMBERS)],
-        "dob": [fake.date_of_birth(minimum_age=18, maximum_age=85) for _ in range(N_MEMBERS)],
-        "createdate": [fake.date_time_between(start_date="-3y", end_date="-1y") for _ in range(N_MEMBERS)],
-        "lastupdate": datetime.now(),
-    })
-    write_table(members, "member")
-
-    # ----- Providers -----
-    print("Generating providers...")
-    providers = pd.DataFrame({
-        "provid": [f"P{i:05d}" for i in range(N_PROVIDERS)],
-        "entityid": [f"PE{i:05d}" for i in range(N_PROVIDERS)],
-        "fullname": [fake.name() for _ in range(N_PROVIDERS)],
-        "specialtycode": np.random.choice(["IM", "PED", "CAR", "ORTH", "PSY"], N_PROVIDERS, p=[0.25, 0.2, 0.2, 0.2, 0.15]),
-        "provtype": np.random.choice(["MD", "DO", "NP", "PA"], N_PROVIDERS, p=[0.5, 0.2, 0.2, 0.1]),
-        "status": np.random.choice(["active", "inactive"], N_PROVIDERS, p=[0.92, 0.08]),
-        "createdate": [fake.date_time_between(start_date="-3y", end_date="-6m") for _ in range(N_PROVIDERS)],
-        "lastupdate": datetime.now(),
-    })
-    write_table(providers, "provider")
-
-    # ----- Enrollments (enrollkeys) -----
-    print("Generating enrollments...")
-    mem_ids = members["memid"].tolist()
-    plan_ids = plans["planid"].tolist()
-    eff_end = datetime.now()
-    eff_start = eff_end - timedelta(days=365 * 2)
-    enrolls = []
-    for i in range(N_ENROLLMENTS):
-        enrolls.append({
-            "enrollid": f"E{i:08d}",
-            "planid": np.random.choice(plan_ids),
-            "memid": np.random.choice(mem_ids),
-            "effdate": fake.date_time_between(start_date=eff_start, end_date=eff_end),
-            "termdate": np.random.choice([None, fake.date_time_between(start_date=eff_start, end_date=eff_end)], p=[0.85, 0.15]),
-            "enrollmenttype": np.random.choice(["New", "Renewal", "Transfer"], p=[0.3, 0.5, 0.2]),
-            "createdate": fake.date_time_between(start_date=eff_start, end_date=eff_end),
-            "lastupdate": datetime.now(),
-        })
-    enroll_df = pd.DataFrame(enrolls)
-    write_table(enroll_df, "enrollkeys")
-
-    # ----- Claims (subset of columns) -----
-    print("Generating claims...")
-    enroll_ids = enroll_df["enrollid"].tolist()
-    prov_ids = providers["provid"].tolist()
-    claim_dates = pd.date_range(end=datetime.now(), periods=400, freq="D")
-    claims = []
-    for i in range(N_CLAIMS):
-        dt = pd.Timestamp(np.random.choice(claim_dates))
-        amt = float(np.random.lognormal(6, 1.2))
-        claims.append({
-            "claimid": f"CLM{i:08d}",
-            "enrollid": np.random.choice(enroll_ids),
-            "memid": np.random.choice(mem_ids),
-            "provid": np.random.choice(prov_ids),
-            "planid": np.random.choice(plan_ids),
-            "startdate": dt,
-            "enddate": dt + timedelta(days=int(np.random.randint(0, 5))),
-            "totalamt": round(amt, 2),
-            "eligibleamt": round(amt * np.random.uniform(0.7, 1.0), 2),
-            "totalpaid": round(amt * np.random.uniform(0.5, 0.95), 2),
-            "status": np.random.choice(["paid", "pending", "denied"], p=[0.75, 0.2, 0.05]),
-            "createdate": dt,
-            "lastupdate": datetime.now(),
-        })
-    write_table(pd.DataFrame(claims), "claim")
-
-    # ----- Referrals (subset) -----
-    print("Generating referrals...")
-    refs = []
-    for i in range(N_REFERRALS):
-        refs.append({
-            "referralid": f"REF{i:07d}",
-            "enrollid": np.random.choice(enroll_ids),
-            "memid": np.random.choice(mem_ids),
-            "referto": np.random.choice(prov_ids),
-            "referfrom": np.random.choice(prov_ids),
-            "effdate": fake.date_time_between(start_date=eff_start, end_date=eff_end),
-            "termdate": np.random.choice([None, fake.date_time_between(start_date=eff_start, end_date=eff_end)], p=[0.8, 0.2]),
-            "status": np.random.choice(["approved", "pending", "completed"], p=[0.5, 0.2, 0.3]),
-            "createdate": fake.date_time_between(start_date=eff_start, end_date=eff_end),
-            "lastupdate": datetime.now(),
-        })
-    write_table(pd.DataFrame(refs), "referral")
-
-    print("Done. Tables written to " + full_name("") + "*")
+                rows += data.num_rows
+                for part, piece in self._partitions(table, data, cols):
+                    buffers.setdefault(part, []).append(piece)
+                    if sum(t.num_rows for t in buffers[part]) >= self.row_group_rows:
+                        flush(part)
+            for part in list(buffers):
+                flush(part)
+        finally:
+            for w in writers.values():
+                w.close()
+        return rows
+
+    def _partitions(self, table: str, data, cols: Columns) -> Iterator[tuple[str, object]]:
+        spec = PARQUET_PARTITIONS.get(table)
+        if spec is None:
+            yield "", data
+            return
+        name, column = spec
+        keys, inverse = np.unique(cols[column].astype("datetime64[M]"), return_inverse=True)
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+        data = data.take(order)
+        for k, key in enumerate(keys):
+            yield f"{name}={np.datetime_as_string(key)}", data.slice(bounds[k], bounds[k + 1] - bounds[k])
+
+    def _dataset(self, table: str):
+        import pyarrow.dataset as ds
+
+        path = self.root / table
+        if not path.is_dir():
+            raise SystemExit(f"{path} does not exist; run a full load before --delta")
+        spec = PARQUET_PARTITIONS.get(table)
+        partitioning = ds.partitioning(self.pa.schema([(spec[0], self.pa.string())]), flavor="hive") if spec else None
+        return ds.dataset(path, format="parquet", partitioning=partitioning)
+
+    def _latest(self, data, key: str):
+        """The newest version (latest lastupdate) of each key."""
+        keys = data[key].to_numpy(zero_copy_only=False).astype(str)
+        order = np.lexsort((data["lastupdate"].to_numpy(), keys))
+        keys = keys[order]
+        last = np.ones(len(keys), dtype=bool)
+        last[:-1] = keys[1:] != keys[:-1]
+        return data.take(order[last])
+
+    def key_count(self, table: str, key: str, prefix: str) -> int:
+        """Rows in the table's key range, from the id statistics in the file footers (no data read)."""
+        top = -1
+        for path in self._dataset(table).files:
+            meta = self.pq.read_metadata(path)
+            column = meta.schema.to_arrow_schema().get_field_index(key)
+            for g in range(meta.num_row_groups):
+                stats = meta.row_group(g).column(column).statistics
+                if stats is not None and stats.has_min_max:
+                    top = max(top, int(stats.max[len(prefix):]))
+        return top + 1
+
+    def current(
+        self, table: str, column: str, value: str | None, *, limit: int, seed: int,
+        since: tuple[str, np.datetime64] | None = None,
+    ) -> Columns:
+        """Up to limit random rows whose current version has column == value (null for None).
+
+        Only the key, column and lastupdate are read to find them (and, with since, only partitions
+        and rows from that date); then the full rows of the chosen keys.
+        """
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        dataset = self._dataset(table)
+        key = KEYS[table][0]
+        where = None
+        if since is not None:
+            where = ds.field(since[0]) >= self.pa.scalar(since[1].astype(datetime), self.pa.timestamp("us"))
+            spec = PARQUET_PARTITIONS.get(table)
+            if spec is not None and spec[1] == since[0]:
+                where = where & (ds.field(spec[0]) >= np.datetime_as_string(since[1].astype("datetime64[M]")))
+        state = self._latest(dataset.to_table(columns=[key, column, "lastupdate"], filter=where), key)
+        match = pc.is_null(state[column]) if value is None else pc.equal(state[column], value)
+        candidates = state.filter(match)[key].to_numpy(zero_copy_only=False)
+        rng = np.random.default_rng(seed)
+        chosen = candidates[rng.choice(len(candidates), min(limit, len(candidates)), replace=False)]
+        names = [f for f in dataset.schema.names if f not in {spec[0] for spec in PARQUET_PARTITIONS.values()}]
+        rows = dataset.to_table(columns=names, filter=ds.field(key).isin(self.pa.array(chosen, self.pa.string())))
+        rows = self._latest(rows, key)
+        return {name: rows[name].to_numpy(zero_copy_only=False) for name in names}
+
+    def merge(self, table: str, key: str, chunks: Iterator[Columns], tag: str) -> int:
+        return self.write(table, chunks, file=tag, replace=False)
+
+
+def write_delta(ctx: Context, output, tables: list[str], args: argparse.Namespace) -> None:
+    """Append or merge one day's changes to claims and enrollments, after the existing key ranges.
+
+    New rows get ids after the largest existing one and FKs into the existing ranges; pending claims
+    are resolved and active enrollments terminated by sampling their current rows. Every row written
+    carries a lastupdate during the day (up to now for today), so the rest of the data is unchanged.
+    """
+    day = np.datetime64(args.as_of, "D")
+    start = day.astype("datetime64[us]")
+    end = start + DAY
+    if start < ctx.now < end:
+        end = ctx.now
+    tag = f"delta-{day}"
+    scale = args.scale_factor
+    counts = dict(ctx.counts)
+    for table, (key, prefix) in KEYS.items():
+        counts[table] = output.key_count(table, key, prefix)
+    print(f"Delta for {day}: existing " + ", ".join(f"{t} {n:,}" for t, n in counts.items() if t in KEYS))
+    ctx = replace(ctx, counts=counts)
+    rng = np.random.default_rng([SEED, len(TABLES), int(day.astype(np.int64))])
+
+    def size(value: int | None, default: float) -> int:
+        return value if value is not None else max(int(round(default * scale)), 1)
+
+    if "enrollkeys" in tables:
+        t0 = time.perf_counter()
+        n = size(args.new_enrollments, DELTA_ENROLLMENTS)
+        lo = counts["enrollkeys"]
+        added = delta_enrollkeys(ctx, rng, lo, lo + n, start, end)
+        ended = output.current(
+            "enrollkeys", "termdate", None, limit=size(args.terminations, DELTA_TERMINATIONS), seed=int(rng.integers(2**31))
+        )
+        stamp = datetimes(rng, start, end, len(ended["enrollid"]))
+        ended["termdate"], ended["lastupdate"] = stamp, stamp
+        rows = output.merge("enrollkeys", KEYS["enrollkeys"][0], iter([added, ended]), tag)
+        counts["enrollkeys"] += n
+        print(f"  enrollkeys: {n:,} new, {len(stamp):,} terminated ({rows:,} rows in {time.perf_counter() - t0:.1f}s)")
+
+    if "claim" in tables:
+        t0 = time.perf_counter()
+        n = size(args.new_claims, DELTA_CLAIMS)
+        lo = counts["claim"]
+        added = delta_claim(replace(ctx, counts=counts), rng, lo, lo + n, start, end)
+        # Claims older than the adjudication window are never pending, so only recent rows are read
+        resolved = output.current(
+            "claim", "status", "pending", limit=size(args.resolved_claims, NEW_PENDING * DELTA_CLAIMS),
+            seed=int(rng.integers(2**31)), since=("startdate", start - 3 * PENDING_DAYS * DAY),
+        )
+        k = len(resolved["claimid"])
+        resolved["status"] = choice(rng, ["paid", "denied"], k, p=[0.9, 0.1])
+        resolved["lastupdate"] = datetimes(rng, start, end, k)
+        rows = output.merge("claim", KEYS["claim"][0], iter([added, resolved]), tag)
+        print(f"  claim: {n:,} new, {k:,} pending resolved ({rows:,} rows in {time.perf_counter() - t0:.1f}s)")
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate synthetic plandata tables.")
+    parser.add_argument("--scale-factor", type=float, default=1.0, help="multiplier for the row counts (1 = demo size)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="generator processes for large tables")
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000, help="rows generated and written per chunk")
+    parser.add_argument("--tables", default=",".join(TABLES), help="comma-separated subset of tables to write")
+    parser.add_argument("--output", choices=["spark", "parquet"], default="spark", help="Delta tables via Spark, or local Parquet")
+    parser.add_argument("--output-dir", type=Path, default=Path("plandata"), help="root directory for --output parquet")
+    parser.add_argument("--row-group-rows", type=int, default=1 << 20, help="Parquet row group size")
+    parser.add_argument("--compression", default="zstd", help="Parquet compression codec")
+    delta = parser.add_argument_group("daily delta", "defaults scale with --scale-factor")
+    delta.add_argument("--delta", action="store_true", help="add one day of changes to the existing tables instead of a full load")
+    delta.add_argument("--as-of", default=str(np.datetime64(datetime.now(), "D")), help="day of the delta, YYYY-MM-DD (default today)")
+    delta.add_argument("--new-claims", type=int, help="claims received that day")
+    delta.add_argument("--resolved-claims", type=int, help="pending claims paid or denied that day")
+    delta.add_argument("--new-enrollments", type=int, help="enrollments received that day")
+    delta.add_argument("--terminations", type=int, help="active enrollments terminated that day")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    tables = [t.strip() for t in args.tables.split(",") if t.strip()]
+    unknown = set(tables) - set(TABLES)
+    if unknown:
+        raise SystemExit(f"Unknown tables: {', '.join(sorted(unknown))}")
+    if args.output == "parquet":
+        output = ParquetOutput(args.output_dir, row_group_rows=args.row_group_rows, compression=args.compression)
+    else:
+        output = SparkOutput()
+
+    ctx = make_context(args.scale_factor)
+    if args.delta:
+        write_delta(ctx, output, tables, args)
+        print("Done. Delta written to " + output.location)
+        return
+    largest = max(ctx.counts[t] for t in tables)
+    pool = None
+    if args.workers > 1 and largest > args.chunk_rows:
+        pool = ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(ctx,))
+    try:
+        for table in tables:
+            print(f"Generating {table} ({ctx.counts[table]:,} rows)...")
+            t0 = time.perf_counter()
+            chunks = generate(ctx, table, chunk_rows=args.chunk_rows, pool=pool, max_pending=2 * args.workers)
+            rows = output.write(table, chunks)
+            print(f"  {rows:,} rows in {time.perf_counter() - t0:.1f}s")
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    print("Done. Tables written to " + output.location)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,84 @@
+"""
+Wall-clock time of a batch of questions (/api/ask/batch) against the same questions asked one by one.
+
+Run from src/app:  python -m benchmarks.bench_batch [--questions 30] [--parallelism 8]
+
+The app runs in-process against the fake Genie backend (benchmarks/fake_genie.py), as in bench_load.
+The questions are first sent one after another to /api/ask, then (reworded, so the answer cache does
+not help) as one batch, polled until done. Ideally the batch takes
+ceil(questions / parallelism) question times instead of one per question.
+"""
+import argparse
+import asyncio
+import math
+import os
+import time
+
+import httpx
+
+from benchmarks.fake_genie import FakeGenieSettings, FakeWorkspaceClient
+
+HEADERS = {"X-Forwarded-Access-Token": "bench-token", "X-Forwarded-User": "bench-user"}
+
+
+async def run(args: argparse.Namespace, settings: FakeGenieSettings) -> None:
+    from gainwell_genie_app.backend.app import app
+    from gainwell_genie_app.backend.dependencies import get_obo_ws
+
+    fake = FakeWorkspaceClient(settings)
+    app.dependency_overrides[get_obo_ws] = lambda: fake
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=HEADERS, timeout=None) as client:
+            t0 = time.perf_counter()
+            for i in range(args.questions):
+                resp = await client.post("/api/ask", json={"question": f"sequential question {i}", "refresh": True})
+                resp.raise_for_status()
+            sequential = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            body = {"questions": [{"question": f"batch question {i}", "refresh": True} for i in range(args.questions)],
+                    "parallelism": args.parallelism}
+            resp = await client.post("/api/ask/batch", json=body)
+            resp.raise_for_status()
+            batch_id = resp.json()["batch_id"]
+            # Poll: httpx's ASGI transport only hands over a streamed body once it is complete
+            first = None
+            while True:
+                summary = (await client.get(f"/api/ask/batch/{batch_id}")).json()
+                if first is None and summary["finished"]:
+                    first = time.perf_counter() - t0
+                if summary["status"] != "running":
+                    break
+                await asyncio.sleep(0.05)
+            batch = time.perf_counter() - t0
+    app.dependency_overrides.pop(get_obo_ws, None)
+
+    print(f"{args.questions} questions one by one  {sequential:7.2f} s  ({sequential / args.questions:.2f} s per question)")
+    print(f"one batch, parallelism {summary['parallelism']:<3}  {batch:7.2f} s  (first answer after {first:.2f} s, "
+          f"{summary['failed']} failed)")
+    waves = math.ceil(args.questions / summary["parallelism"])
+    print(f"speed-up {sequential / batch:.1f}x; ideal {args.questions / waves:.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--parallelism", type=int, default=8)
+    parser.add_argument("--generation-latency", type=float, default=0.5)
+    parser.add_argument("--execution-latency", type=float, default=0.25)
+    args = parser.parse_args()
+
+    # Poll the fake quickly, and let the whole batch run at once if asked to
+    os.environ.setdefault("GENIE_SPACE_ID", "bench-space")
+    os.environ.setdefault("GAINWELL_GENIE_APP_GENIE_POLL_INITIAL_SECONDS", "0.05")
+    os.environ.setdefault("GAINWELL_GENIE_APP_GENIE_POLL_MAX_SECONDS", "0.25")
+    os.environ.setdefault("GAINWELL_GENIE_APP_GENIE_BATCH_MAX_PARALLEL", str(args.parallelism))
+    os.environ.setdefault("GAINWELL_GENIE_APP_GENIE_MAX_CONCURRENT", str(max(args.parallelism, 8)))
+
+    settings = FakeGenieSettings(generation_latency=args.generation_latency, execution_latency=args.execution_latency)
+    asyncio.run(run(args, settings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare payload size and encode time of the /api/ask result formats.
+
+Run from src/app:  python -m benchmarks.bench_formats [--rows 50000] [--repeat 5]
+
+Rows mimic a claim extract (strings as returned by the Statement Execution API's JSON_ARRAY format).
+The row format is timed through the same pydantic path FastAPI uses for AskResponse.
+"""
+import argparse
+import random
+import time
+
+from gainwell_genie_app.backend.formats import encode_arrow, encode_columnar
+from gainwell_genie_app.backend.models import AskResponse
+
+COLUMNS = ["claimid", "planid", "memid", "startdate", "status", "totalamt", "eligibleamt", "totalpaid", "linecount"]
+TYPES = ["STRING", "STRING", "STRING", "DATE", "STRING", "DECIMAL", "DECIMAL", "DOUBLE", "INT"]
+
+
+def make_rows(n: int, seed: int = 42) -> list[list]:
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        amt = rnd.lognormvariate(6, 1.2)
+        rows.append([
+            f"CLM{i:08d}",
+            f"PLAN{rnd.randrange(50):05d}",
+            f"M{rnd.randrange(800):06d}",
+            f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+            rnd.choice(["paid", "pending", "denied"]),
+            f"{amt:.2f}",
+            f"{amt * 0.85:.2f}",
+            f"{amt * 0.7:.2f}",
+            str(rnd.randint(1, 9)),
+        ])
+    return rows
+
+
+def best_of(repeat: int, fn) -> tuple[float, bytes]:
+    best, out = float("inf"), b""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    resp = AskResponse(question="claims", columns=COLUMNS, column_types=TYPES, data=rows, row_count=len(rows))
+    metadata = resp.model_dump(exclude={"columns", "column_types", "data"})
+
+    cases = {
+        "rows (application/json)": lambda: AskResponse.model_validate(resp.model_dump()).model_dump_json().encode(),
+        "columnar json": lambda: encode_columnar(COLUMNS, TYPES, rows, metadata),
+    }
+    try:
+        import pyarrow  # noqa: F401
+        cases["arrow ipc stream"] = lambda: encode_arrow(COLUMNS, TYPES, rows, metadata)
+    except ImportError:
+        print("pyarrow not installed; skipping Arrow")
+
+    print(f"{args.rows} rows x {len(COLUMNS)} columns, best of {args.repeat}")
+    print(f"{'format':<26}{'bytes':>14}{'encode ms':>12}")
+    for name, fn in cases.items():
+        seconds, payload = best_of(args.repeat, fn)
+        print(f"{name:<26}{len(payload):>14,}{seconds * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
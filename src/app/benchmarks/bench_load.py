@@ -0,0 +1,198 @@
+"""
+Load-test the FastAPI app in-process against the fake Genie backend (benchmarks/fake_genie.py).
+
+Run from src/app:  python -m benchmarks.bench_load [--concurrency 1,8,32,64] [--requests 200]
+
+Each concurrency level sends --requests questions from --users users through httpx's ASGI transport
+(no sockets), with the WorkspaceClient dependency replaced by FakeWorkspaceClient. Reports
+throughput, latency percentiles, peak RSS and bytes per response, and writes them to
+benchmarks/results/ named after the current commit. Pass --compare <file> to print the change against an earlier run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+import httpx
+
+from benchmarks.fake_genie import FakeGenieSettings, FakeWorkspaceClient
+
+RESULTS_DIR = Path(__file__).parent / "results"
+ENDPOINTS = {"ask": "/api/ask", "stream": "/api/ask/stream"}
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def git_commit() -> tuple[str, bool]:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip())
+        return sha, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+async def run_level(
+    client: httpx.AsyncClient, path: str, concurrency: int, total: int, distinct: int, users: int, tag: str
+) -> dict:
+    latencies: list[float] = []
+    sizes: list[int] = []
+    statuses: dict[str, int] = {}
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            question = f"[{tag}] how many paid claims per plan, variant {i % distinct}"
+            t0 = time.perf_counter()
+            user = f"bench-{i % users}@example.com"
+            resp = await client.post(path, json={"question": question}, headers={"X-Forwarded-User": user})
+            body = resp.content
+            latencies.append(time.perf_counter() - t0)
+            sizes.append(len(body))
+            statuses[str(resp.status_code)] = statuses.get(str(resp.status_code), 0) + 1
+            failed = b'"error":' in body and b'"error":null' not in body if path == ENDPOINTS["ask"] else b"event: error" in body
+            errors += resp.status_code >= 400 or failed
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "req_per_s": round(total / elapsed, 2),
+        "latency_ms": {f"p{p}": round(percentile(latencies, p) * 1000, 1) for p in (50, 90, 95, 99)}
+        | {"max": round(latencies[-1] * 1000, 1) if latencies else 0.0},
+        "bytes_per_response": round(sum(sizes) / len(sizes)) if sizes else 0,
+        "errors": errors,
+        "statuses": statuses,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+async def run(args: argparse.Namespace, settings: FakeGenieSettings) -> list[dict]:
+    from gainwell_genie_app.backend.app import app
+    from gainwell_genie_app.backend.dependencies import get_obo_ws
+
+    fake = FakeWorkspaceClient(settings)
+    app.dependency_overrides[get_obo_ws] = lambda: fake
+    transport = httpx.ASGITransport(app=app)
+    headers = {"X-Forwarded-Access-Token": "bench-token"}
+    levels = []
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers, timeout=None) as client:
+            for concurrency in args.concurrency:
+                distinct = args.distinct or args.requests
+                level = await run_level(
+                    client, ENDPOINTS[args.endpoint], concurrency, args.requests, distinct, args.users,
+                    f"c{concurrency}-{time.time_ns()}",
+                )
+                levels.append(level)
+                lat = level["latency_ms"]
+                print(
+                    f"c={concurrency:<4} {level['req_per_s']:>8.1f} req/s  p50 {lat['p50']:>8.1f} ms  "
+                    f"p95 {lat['p95']:>8.1f} ms  p99 {lat['p99']:>8.1f} ms  "
+                    f"{level['bytes_per_response']:>9,} B/resp  rss {level['peak_rss_mb']:>7.1f} MB  errors {level['errors']}",
+                    flush=True,
+                )
+    app.dependency_overrides.pop(get_obo_ws, None)
+    return levels
+
+
+def compare(levels: list[dict], baseline_path: Path) -> None:
+    baseline = {lvl["concurrency"]: lvl for lvl in json.loads(baseline_path.read_text())["levels"]}
+    print(f"\nvs {baseline_path.name}:")
+    for lvl in levels:
+        old = baseline.get(lvl["concurrency"])
+        if old is None:
+            continue
+
+        def delta(new: float, before: float) -> str:
+            return f"{(new - before) / before * 100:+.1f}%" if before else "n/a"
+
+        print(
+            f"c={lvl['concurrency']:<4} req/s {delta(lvl['req_per_s'], old['req_per_s'])}  "
+            f"p95 {delta(lvl['latency_ms']['p95'], old['latency_ms']['p95'])}  "
+            f"B/resp {delta(lvl['bytes_per_response'], old['bytes_per_response'])}  "
+            f"rss {delta(lvl['peak_rss_mb'], old['peak_rss_mb'])}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")], default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="ask")
+    parser.add_argument("--distinct", type=int, default=0, help="distinct questions per level (0: all distinct, no cache hits)")
+    parser.add_argument("--users", type=int, default=16, help="distinct X-Forwarded-User values, round-robin")
+    parser.add_argument("--api-latency", type=float, default=0.02, help="seconds per fake SDK call")
+    parser.add_argument("--generation-latency", type=float, default=0.5)
+    parser.add_argument("--execution-latency", type=float, default=0.25)
+    parser.add_argument("--result-rows", type=int, default=1_000)
+    parser.add_argument("--chunks", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-fetch-rate", type=float, default=0.0, help="share of result fetches that are slow")
+    parser.add_argument("--slow-fetch-latency", type=float, default=2.0)
+    parser.add_argument("--out", type=Path, default=None, help="result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier result file to diff against")
+    args = parser.parse_args()
+
+    # Poll the fake quickly: its latencies are a fraction of real Genie's.
+    os.environ.setdefault("GENIE_SPACE_ID", "bench-space")
+    os.environ.setdefault("GAINWELL_GENIE_APP_GENIE_POLL_INITIAL_SECONDS", "0.05")
+    os.environ.setdefault("GAINWELL_GENIE_APP_GENIE_POLL_MAX_SECONDS", "0.25")
+
+    settings = FakeGenieSettings(
+        api_latency=args.api_latency,
+        generation_latency=args.generation_latency,
+        execution_latency=args.execution_latency,
+        result_rows=args.result_rows,
+        chunk_count=args.chunks,
+        error_rate=args.error_rate,
+        slow_fetch_rate=args.slow_fetch_rate,
+        slow_fetch_latency=args.slow_fetch_latency,
+    )
+    levels = asyncio.run(run(args, settings))
+
+    commit, dirty = git_commit()
+    out = args.out or RESULTS_DIR / f"{commit}{'-dirty' if dirty else ''}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "endpoint": ENDPOINTS[args.endpoint],
+        "distinct_questions": args.distinct or args.requests,
+        "users": args.users,
+        "fake_genie": asdict(settings),
+        "levels": levels,
+    }, indent=2))
+    print(f"\nwrote {out}")
+    if args.compare:
+        compare(levels, args.compare)
+
+
+if __name__ == "__main__":
+    main()
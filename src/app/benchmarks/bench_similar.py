@@ -0,0 +1,112 @@
+"""
+Lookup latency and recall of the near-duplicate question index at 100k stored questions.
+
+Run from src/app:  python -m benchmarks.bench_similar [--questions 100000] [--lookups 2000]
+
+Questions are built from metric x dimension x filter x year vocabularies (all distinct). The index
+is filled in a temporary SQLite file, then queried with paraphrases of stored questions (reordered
+words, by/per, plurals, punctuation: should match) and with questions for a different year (must
+not match).
+"""
+import argparse
+import itertools
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from gainwell_genie_app.backend.similar import QuestionIndex
+
+METRICS = [
+    "paid claims", "denied claims", "pending claims", "total paid amount", "eligible amount", "claim lines",
+    "members enrolled", "terminated enrollments", "average paid per claim", "claims over 10000",
+    "readmissions", "emergency visits", "pharmacy claims", "dental claims", "vision claims",
+    "outpatient claims", "inpatient stays", "prior authorizations", "provider count", "new members",
+]
+DIMENSIONS = [
+    "plan", "month", "county", "provider", "provider specialty", "diagnosis group", "member age band",
+    "gender", "program", "eligibility category", "claim type", "place of service", "quarter", "region",
+    "network status", "procedure code", "drug class", "facility", "payer", "benefit plan",
+    "enrollment channel", "language", "race", "tribe", "managed care org",
+]
+FILTERS = [
+    "", "for children", "for adults", "for seniors", "in rural counties", "in urban counties",
+    "for medicaid expansion", "for chip members", "for dual eligibles", "for behavioral health",
+    "for maternity", "for long term care", "for home health", "for telehealth", "for specialty drugs",
+    "for out of network", "for high cost members", "for foster care", "for disability", "for waiver programs",
+]
+YEARS = [str(y) for y in range(2016, 2026)]
+
+
+def questions(n: int) -> list[tuple[str, str, str, str]]:
+    combos = itertools.product(METRICS, DIMENSIONS, FILTERS, YEARS)
+    return list(itertools.islice(combos, n))
+
+
+def phrase(m: str, d: str, f: str, y: str) -> str:
+    return " ".join(p for p in (m, "by", d, f, "in", y) if p)
+
+
+def paraphrase(rnd: random.Random, m: str, d: str, f: str, y: str) -> str:
+    d = d + "s" if rnd.random() < 0.5 and not d.endswith("s") else d
+    parts = [m, rnd.choice(["per", "by", "for each"]), d, f, y]
+    if rnd.random() < 0.5:
+        parts = [y, m, rnd.choice(["per", "by"]), d, f]
+    text = " ".join(p for p in parts if p)
+    return rnd.choice(["{}", "{}?", "Show {}", "What are {}?"]).format(text.capitalize() if rnd.random() < 0.5 else text)
+
+
+def timed(fn, items) -> tuple[list[float], list]:
+    times, out = [], []
+    for item in items:
+        t = time.perf_counter()
+        out.append(fn(item))
+        times.append(time.perf_counter() - t)
+    return times, out
+
+
+def report(name: str, times: list[float]) -> None:
+    ms = sorted(t * 1000 for t in times)
+    p = lambda q: ms[min(int(q * len(ms)), len(ms) - 1)]
+    print(f"{name:<22} p50 {p(0.5):6.2f} ms  p95 {p(0.95):6.2f} ms  p99 {p(0.99):6.2f} ms  mean {statistics.fmean(ms):6.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=2_000)
+    parser.add_argument("--threshold", type=float, default=0.6)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+    stored = questions(args.questions)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "questions.sqlite3"
+        index = QuestionIndex(path, max_entries=args.questions)
+        t = time.perf_counter()
+        for i, q in enumerate(stored):
+            index.add("space\x1fuser", phrase(*q), f"SELECT {i}")
+        build = time.perf_counter() - t
+        print(f"indexed {len(index):,} questions in {build:.1f}s ({len(index) / build:,.0f}/s), "
+              f"{path.stat().st_size / 2**20:.1f} MiB on disk")
+
+        sample = rnd.sample(range(len(stored)), min(args.lookups, len(stored)))
+        hits = [(i, paraphrase(rnd, *stored[i])) for i in sample]
+        times, found = timed(lambda h: index.similar("space\x1fuser", h[1], threshold=args.threshold), hits)
+        recall = sum(bool(f) and f[0].sql == f"SELECT {i}" for (i, _), f in zip(hits, found)) / len(hits)
+        report("paraphrase lookup", times)
+
+        other_year = []
+        for i in sample:
+            m, d, f, y = stored[i]
+            other_year.append(phrase(m, d, f, str(int(y) + 100)))
+        times, wrong = timed(lambda q: index.similar("space\x1fuser", q, threshold=args.threshold), other_year)
+        report("other-year lookup", times)
+        print(f"paraphrase recall {recall:.1%}, other-year false matches {sum(bool(w) for w in wrong) / len(wrong):.1%}")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
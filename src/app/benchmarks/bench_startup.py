@@ -0,0 +1,108 @@
+"""
+Measure cold start: app import time and time to the first successful requests.
+
+Run from src/app:  python -m benchmarks.bench_startup [--runs 5] [--target 5.0]
+
+Every run uses fresh interpreters. Import time is measured in a child that only imports the app.
+Time to first request starts uvicorn in a child (WorkspaceClient replaced by the fake from
+benchmarks/fake_genie.py, still behind the SDK readiness gate) and polls from process start until
+/api/version (app serving) and /api/current-user (SDK loaded, first WorkspaceClient route) answer
+200. With --target, exits non-zero when the median time to /api/current-user exceeds it.
+"""
+import argparse
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import gainwell_genie_app.backend.app; "
+    "print(time.perf_counter() - t)"
+)
+ENDPOINTS = ("/api/version", "/api/current-user")
+HEADERS = {"X-Forwarded-Access-Token": "bench-token", "X-Forwarded-User": "bench@example.com"}
+
+
+def serve(port: int) -> None:
+    import uvicorn
+
+    from gainwell_genie_app.backend.app import app
+    from gainwell_genie_app.backend.dependencies import RuntimeDep, get_obo_ws
+
+    async def bench_ws(runtime: RuntimeDep):
+        await runtime.ready()
+        from benchmarks.fake_genie import FakeWorkspaceClient
+
+        return FakeWorkspaceClient()
+
+    app.dependency_overrides[get_obo_ws] = bench_ws
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def ok(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=HEADERS), timeout=5) as resp:
+            return resp.status == 200
+    except (urllib.error.URLError, ConnectionError, TimeoutError):
+        return False
+
+
+def time_to_first_requests(timeout: float) -> dict[str, float]:
+    port = free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "benchmarks.bench_startup", "--serve", str(port)])
+    out: dict[str, float] = {}
+    try:
+        for path in ENDPOINTS:
+            while not ok(f"http://127.0.0.1:{port}{path}"):
+                if proc.poll() is not None:
+                    raise RuntimeError(f"server exited with {proc.returncode}")
+                if time.perf_counter() - t0 > timeout:
+                    raise TimeoutError(f"{path} not ready after {timeout}s")
+                time.sleep(0.01)
+            out[path] = time.perf_counter() - t0
+    finally:
+        proc.terminate()
+        proc.wait()
+    return out
+
+
+def import_time() -> float:
+    return float(subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True).stdout)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--target", type=float, default=None, help="max median seconds to the first /api/current-user")
+    parser.add_argument("--serve", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve is not None:
+        serve(args.serve)
+        return
+
+    imports = [import_time() for _ in range(args.runs)]
+    firsts = [time_to_first_requests(args.timeout) for _ in range(args.runs)]
+    print(f"app import             median {statistics.median(imports):6.3f}s  min {min(imports):6.3f}s")
+    for path in ENDPOINTS:
+        values = [f[path] for f in firsts]
+        print(f"first 200 {path:<18} median {statistics.median(values):6.3f}s  min {min(values):6.3f}s")
+    if args.target is not None:
+        median = statistics.median(f[ENDPOINTS[-1]] for f in firsts)
+        if median > args.target:
+            print(f"cold start {median:.3f}s exceeds target {args.target:.3f}s")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+Local stand-in for the parts of WorkspaceClient the backend uses (genie, statement_execution,
+current_user), for benchmarks and local runs without a workspace.
+
+Latency model: every call sleeps api_latency (one HTTP round trip). A message reports ASKING_AI for
+generation_latency seconds after submission, then EXECUTING_QUERY for execution_latency, then
+COMPLETED. Results have result_rows rows split into chunk_count chunks; only chunk 0 is inline,
+like the real API. error_rate is the probability that submitting a question fails with a 429;
+slow_fetch_rate the probability that a query result fetch takes slow_fetch_latency longer (a tail).
+
+Statements run with execute_statement report PENDING, then RUNNING until execution_latency has
+passed, then SUCCEEDED. Their chunks are EXTERNAL_LINKS served by a local HTTP server (127.0.0.1,
+started on first use) as JSON_ARRAY or ARROW_STREAM bytes, like presigned cloud storage URLs.
+"""
+import datetime as dt
+import io
+import itertools
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, replace
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from databricks.sdk.errors import NotFound, TooManyRequests
+from databricks.sdk.service._internal import Wait
+from databricks.sdk.service.dashboards import (
+    GenieAttachment,
+    GenieGetMessageQueryResultResponse,
+    GenieMessage,
+    GenieQueryAttachment,
+    MessageStatus,
+    TextAttachment,
+)
+from databricks.sdk.service.iam import User
+from databricks.sdk.service.sql import (
+    BaseChunkInfo,
+    ColumnInfo,
+    ColumnInfoTypeName,
+    ExternalLink,
+    Format,
+    ResultData,
+    ResultManifest,
+    ResultSchema,
+    StatementResponse,
+    StatementState,
+    StatementStatus,
+)
+
+COLUMNS = [
+    ("planid", ColumnInfoTypeName.STRING),
+    ("claim_month", ColumnInfoTypeName.DATE),
+    ("status", ColumnInfoTypeName.STRING),
+    ("claims", ColumnInfoTypeName.LONG),
+    ("totalpaid", ColumnInfoTypeName.DECIMAL),
+]
+# (precision, scale) of totalpaid, as in the manifest and the Arrow chunks
+DECIMAL = (12, 2)
+SQL = "SELECT planid, date_trunc('month', startdate) AS claim_month, status, count(*) AS claims, sum(totalpaid) AS totalpaid FROM claim GROUP BY ALL"
+
+
+@dataclass
+class FakeGenieSettings:
+    api_latency: float = 0.02
+    generation_latency: float = 2.0
+    execution_latency: float = 1.0
+    result_rows: int = 1_000
+    chunk_count: int = 1
+    error_rate: float = 0.0
+    slow_fetch_rate: float = 0.0
+    slow_fetch_latency: float = 2.0
+    seed: int = 7
+
+
+def _row(i: int) -> list:
+    return [
+        f"PLAN{i % 50:05d}",
+        f"2025-{i % 12 + 1:02d}-01",
+        ("paid", "pending", "denied")[i % 3],
+        str(1 + i % 97),
+        f"{(i * 37.31) % 25_000:.2f}",
+    ]
+
+
+class FakeGenieAPI:
+    def __init__(self, settings: FakeGenieSettings) -> None:
+        self.s = settings
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._rng = random.Random(settings.seed)
+        self._submitted: dict[str, tuple[float, str, str]] = {}  # message_id -> (t, conversation_id, content)
+        self.calls: dict[str, int] = {}
+
+    def _rtt(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        time.sleep(self.s.api_latency)
+
+    def _submit(self, space_id: str, conversation_id: str | None, content: str) -> Wait:
+        self._rtt("submit")
+        with self._lock:
+            if self._rng.random() < self.s.error_rate:
+                raise TooManyRequests("fake Genie: rate limit exceeded")
+            n = next(self._ids)
+            conversation_id = conversation_id or f"conv-{n}"
+            message_id = f"msg-{n}"
+            self._submitted[message_id] = (time.monotonic(), conversation_id, content)
+        return Wait(None, conversation_id=conversation_id, message_id=message_id, space_id=space_id)
+
+    def start_conversation(self, space_id: str, content: str, **_) -> Wait:
+        return self._submit(space_id, None, content)
+
+    def create_message(self, space_id: str, conversation_id: str, content: str, **_) -> Wait:
+        return self._submit(space_id, conversation_id, content)
+
+    def get_message(self, space_id: str, conversation_id: str, message_id: str) -> GenieMessage:
+        self._rtt("get_message")
+        if message_id not in self._submitted:
+            raise NotFound(f"fake Genie: no message {message_id}")
+        submitted_at, conv_id, content = self._submitted[message_id]
+        elapsed = time.monotonic() - submitted_at
+        if elapsed < self.s.generation_latency:
+            status, attachments = MessageStatus.ASKING_AI, []
+        else:
+            attachments = [
+                GenieAttachment(attachment_id=f"{message_id}-q", query=GenieQueryAttachment(id=f"{message_id}-q", query=SQL)),
+                GenieAttachment(attachment_id=f"{message_id}-t", text=TextAttachment(content=f"Answer to: {content}")),
+            ]
+            done = elapsed >= self.s.generation_latency + self.s.execution_latency
+            status = MessageStatus.COMPLETED if done else MessageStatus.EXECUTING_QUERY
+        return GenieMessage(
+            space_id=space_id, conversation_id=conv_id, content=content, message_id=message_id,
+            status=status, attachments=attachments,
+        )
+
+    def get_message_attachment_query_result(
+        self, space_id: str, conversation_id: str, message_id: str, attachment_id: str
+    ) -> GenieGetMessageQueryResultResponse:
+        self._rtt("query_result")
+        with self._lock:
+            slow = self._rng.random() < self.s.slow_fetch_rate
+        if slow:
+            time.sleep(self.s.slow_fetch_latency)
+        return GenieGetMessageQueryResultResponse(statement_response=statement_response(self.s, f"stmt-{message_id}"))
+
+
+def _chunk_bounds(s: FakeGenieSettings, index: int) -> tuple[int, int]:
+    size = -(-s.result_rows // max(s.chunk_count, 1))
+    lo = index * size
+    return lo, min(lo + size, s.result_rows)
+
+
+def _column(position: int, name: str, type_name: ColumnInfoTypeName) -> ColumnInfo:
+    if type_name == ColumnInfoTypeName.DECIMAL:
+        precision, scale = DECIMAL
+        return ColumnInfo(name=name, type_name=type_name, type_text=f"DECIMAL({precision},{scale})", position=position,
+                          type_precision=precision, type_scale=scale)
+    return ColumnInfo(name=name, type_name=type_name, type_text=type_name.value, position=position)
+
+
+def result_chunk(s: FakeGenieSettings, index: int) -> ResultData:
+    lo, hi = _chunk_bounds(s, index)
+    last = hi >= s.result_rows
+    return ResultData(
+        chunk_index=index, row_offset=lo, row_count=hi - lo,
+        data_array=[_row(i) for i in range(lo, hi)],
+        next_chunk_index=None if last else index + 1,
+    )
+
+
+def statement_response(s: FakeGenieSettings, statement_id: str, fmt: Format | None = None) -> StatementResponse:
+    chunks = []
+    for i in range(max(s.chunk_count, 1)):
+        lo, hi = _chunk_bounds(s, i)
+        if hi > lo or i == 0:
+            chunks.append(BaseChunkInfo(chunk_index=i, row_offset=lo, row_count=hi - lo))
+    return StatementResponse(
+        statement_id=statement_id,
+        manifest=ResultManifest(
+            schema=ResultSchema(
+                column_count=len(COLUMNS),
+                columns=[_column(i, n, t) for i, (n, t) in enumerate(COLUMNS)],
+            ),
+            format=fmt,
+            total_row_count=s.result_rows,
+            total_chunk_count=len(chunks),
+            chunks=chunks,
+        ),
+        result=result_chunk(s, 0),
+    )
+
+
+def encode_chunk(s: FakeGenieSettings, index: int, fmt: str) -> bytes:
+    rows = [_row(i) for i in range(*_chunk_bounds(s, index))]
+    if fmt != Format.ARROW_STREAM.value:
+        return json.dumps(rows).encode()
+    import pyarrow as pa
+
+    columns = list(zip(*rows)) or [()] * len(COLUMNS)
+    table = pa.table({
+        "planid": pa.array(columns[0], pa.string()),
+        "claim_month": pa.array([dt.date.fromisoformat(v) for v in columns[1]], pa.date32()),
+        "status": pa.array(columns[2], pa.string()),
+        "claims": pa.array([int(v) for v in columns[3]], pa.int64()),
+        "totalpaid": pa.array([Decimal(v) for v in columns[4]], pa.decimal128(*DECIMAL)),
+    })
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+class _LinkServer:
+    """Serves /<statement_id>/<chunk_index> for the statements the fake has run."""
+
+    def __init__(self, api: "FakeStatementExecutionAPI") -> None:
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                try:
+                    _, statement_id, index = self.path.split("/")
+                    s, fmt = api._links[statement_id]
+                    body = encode_chunk(s, int(index), fmt)
+                except (KeyError, ValueError):
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+class FakeStatementExecutionAPI:
+    def __init__(self, settings: FakeGenieSettings, genie: FakeGenieAPI) -> None:
+        self.s = settings
+        self._genie = genie
+        self._ids = itertools.count(1)
+        self._statements: dict[str, tuple[float, FakeGenieSettings, Format, str]] = {}  # id -> (t, settings, format, state)
+        self._links: dict[str, tuple[FakeGenieSettings, str]] = {}
+        self._server: _LinkServer | None = None
+        self.statements: list[str] = []  # SQL of every executed statement
+
+    def _link_url(self) -> str:
+        with self._genie._lock:
+            if self._server is None:
+                self._server = _LinkServer(self)
+            return self._server.url
+
+    def _external(self, statement_id: str, s: FakeGenieSettings, index: int) -> ResultData:
+        lo, hi = _chunk_bounds(s, index)
+        next_index = None if hi >= s.result_rows else index + 1
+        link = ExternalLink(
+            chunk_index=index, row_offset=lo, row_count=hi - lo, next_chunk_index=next_index,
+            external_link=f"{self._link_url()}/{statement_id}/{index}",
+        )
+        return ResultData(chunk_index=index, row_offset=lo, row_count=hi - lo, next_chunk_index=next_index, external_links=[link])
+
+    def execute_statement(
+        self, statement: str, warehouse_id: str, *, format: Format | None = None, row_limit: int | None = None, **_
+    ) -> StatementResponse:
+        self._genie._rtt("execute_statement")
+        s = replace(self.s, result_rows=min(self.s.result_rows, row_limit or self.s.result_rows))
+        statement_id = f"run-{next(self._ids)}"
+        fmt = format or Format.JSON_ARRAY
+        with self._genie._lock:
+            self.statements.append(statement)
+            self._statements[statement_id] = (time.monotonic(), s, fmt, "")
+            self._links[statement_id] = (s, fmt.value)
+        return StatementResponse(statement_id=statement_id, status=StatementStatus(state=StatementState.PENDING))
+
+    def get_statement(self, statement_id: str) -> StatementResponse:
+        self._genie._rtt("get_statement")
+        started, s, fmt, forced = self._statements[statement_id]
+        elapsed = time.monotonic() - started
+        if forced:
+            state = StatementState(forced)
+        elif elapsed < self.s.api_latency:
+            state = StatementState.PENDING
+        elif elapsed < self.s.execution_latency:
+            state = StatementState.RUNNING
+        else:
+            state = StatementState.SUCCEEDED
+        if state != StatementState.SUCCEEDED:
+            return StatementResponse(statement_id=statement_id, status=StatementStatus(state=state))
+        resp = statement_response(s, statement_id, fmt)
+        resp.status = StatementStatus(state=state)
+        resp.result = self._external(statement_id, s, 0)
+        return resp
+
+    def cancel_execution(self, statement_id: str) -> None:
+        self._genie._rtt("cancel_execution")
+        with self._genie._lock:
+            started, s, fmt, _ = self._statements[statement_id]
+            self._statements[statement_id] = (started, s, fmt, StatementState.CANCELED.value)
+
+    def get_statement_result_chunk_n(self, statement_id: str, chunk_index: int) -> ResultData:
+        self._genie._rtt("result_chunk")
+        if statement_id in self._statements:
+            return self._external(statement_id, self._statements[statement_id][1], chunk_index)
+        return result_chunk(self.s, chunk_index)
+
+
+class FakeCurrentUserAPI:
+    def me(self) -> User:
+        return User(id="1", user_name="bench@example.com", display_name="Bench User")
+
+
+class FakeWorkspaceClient:
+    def __init__(self, settings: FakeGenieSettings | None = None) -> None:
+        self.settings = settings or FakeGenieSettings()
+        self.genie = FakeGenieAPI(self.settings)
+        self.statement_execution = FakeStatementExecutionAPI(self.settings, self.genie)
+        self.current_user = FakeCurrentUserAPI()
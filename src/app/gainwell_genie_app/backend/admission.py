@@ -0,0 +1,210 @@
+"""
+Admission control for Genie calls.
+
+At most max_concurrent Genie questions run at once, at most max_per_user of them for one user, and
+(optionally) no more than max_per_minute start per minute. Waiting questions queue per user and are
+admitted round-robin across users, so one user with many questions cannot starve the others. When
+the queue (or a user's share of it) is full, callers are rejected immediately with a Retry-After
+estimate instead of waiting for Genie's own rate limit to fail them. A queue may allow more than
+max_per_user questions at once (max_active), as the queue of a user's batch questions does.
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from .metrics import ADMISSION_REJECTED, record_stage
+
+
+class QueueFull(Exception):
+    """The Genie queue cannot take another question; retry after retry_after seconds."""
+
+    def __init__(self, retry_after: int, reason: str) -> None:
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """One question's place in the scheduler: queued until granted, then holding a slot until released."""
+
+    def __init__(self, scheduler: "GenieScheduler", user: str, max_active: int) -> None:
+        self.user = user
+        self.max_active = max_active
+        self._scheduler = scheduler
+        self._granted: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._enqueued_at = time.monotonic()
+        self._started_at: float | None = None
+        self._released = False
+
+    @property
+    def granted(self) -> bool:
+        return self._granted.done()
+
+    @property
+    def position(self) -> int:
+        """1-based position in the admission order; 0 once admitted."""
+        return 0 if self.granted else self._scheduler.position(self)
+
+    async def wait(self) -> None:
+        try:
+            await asyncio.shield(self._granted)
+        except asyncio.CancelledError:
+            self.release()
+            raise
+        await self._admitted()
+
+    async def positions(self, interval: float | None = 1.0) -> AsyncIterator[int]:
+        """Yield the queue position whenever it changes while waiting; returns once admitted."""
+        last = None
+        try:
+            while not self.granted:
+                position = self.position
+                if position != last:
+                    last = position
+                    yield position
+                await asyncio.wait({self._granted}, timeout=interval)
+        except BaseException:
+            self.release()
+            raise
+        await self._admitted()
+
+    async def _admitted(self) -> None:
+        record_stage("queue", time.monotonic() - self._enqueued_at)
+        await self._scheduler.pace()
+        self._started_at = time.monotonic()
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._scheduler.release(self)
+
+
+class GenieScheduler:
+    def __init__(
+        self,
+        *,
+        max_concurrent: int,
+        max_per_user: int,
+        max_queued: int,
+        max_queued_per_user: int,
+        max_per_minute: float = 0,
+    ) -> None:
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self.max_per_minute = max_per_minute
+        # user -> waiting tickets; iteration order is the round-robin order (served users move to the end)
+        self._queues: OrderedDict[str, deque[Ticket]] = OrderedDict()
+        self._active: dict[str, int] = {}
+        self._next_start = 0.0
+        self._mean_hold = 10.0  # seconds per Genie question, smoothed
+
+    @property
+    def active(self) -> int:
+        return sum(self._active.values())
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def active_for(self, user: str) -> int:
+        return self._active.get(user, 0)
+
+    def queued_for(self, user: str) -> int:
+        return len(self._queues.get(user, ()))
+
+    def retry_after(self) -> int:
+        per_second = self.max_concurrent / self._mean_hold
+        if self.max_per_minute:
+            per_second = min(per_second, self.max_per_minute / 60)
+        return max(1, math.ceil((self.queued + 1) / per_second))
+
+    def check(self, user: str, *, max_active: int | None = None) -> None:
+        """Raise QueueFull if a question from user would be rejected right now."""
+        limit = max_active or self.max_per_user
+        if self.active < self.max_concurrent and self.active_for(user) < limit and not self.queued:
+            return
+        if self.queued >= self.max_queued:
+            reason = "Genie is busy: too many questions are waiting"
+        elif self.queued_for(user) >= self.max_queued_per_user:
+            reason = "You already have the maximum number of questions waiting for Genie"
+        else:
+            return
+        ADMISSION_REJECTED.inc()
+        raise QueueFull(self.retry_after(), reason)
+
+    def enqueue(self, user: str, *, max_active: int | None = None) -> Ticket:
+        """Queue a question; max_active overrides max_per_user for this user's queue."""
+        self.check(user, max_active=max_active)
+        ticket = Ticket(self, user, max_active or self.max_per_user)
+        self._queues.setdefault(user, deque()).append(ticket)
+        self._dispatch()
+        return ticket
+
+    @asynccontextmanager
+    async def slot(self, user: str, *, max_active: int | None = None) -> AsyncIterator[Ticket]:
+        ticket = self.enqueue(user, max_active=max_active)
+        try:
+            await ticket.wait()
+            yield ticket
+        finally:
+            ticket.release()
+
+    def position(self, ticket: Ticket) -> int:
+        """Admission order under round-robin: everyone ahead in the ticket's own queue, plus as many
+        of each other user's tickets as rounds pass before this one."""
+        own = self._queues.get(ticket.user)
+        if not own or ticket not in own:
+            return 0
+        rounds = own.index(ticket)
+        ahead = rounds
+        for user, q in self._queues.items():
+            if user == ticket.user:
+                continue
+            ahead += min(len(q), rounds + 1)
+        return ahead + 1
+
+    async def pace(self) -> None:
+        """Space question starts evenly when a per-minute limit is set."""
+        if not self.max_per_minute:
+            return
+        now = time.monotonic()
+        start = max(now, self._next_start)
+        self._next_start = start + 60 / self.max_per_minute
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def release(self, ticket: Ticket) -> None:
+        if ticket.granted and not ticket._granted.cancelled():
+            self._active[ticket.user] -= 1
+            if not self._active[ticket.user]:
+                del self._active[ticket.user]
+            if ticket._started_at is not None:
+                hold = time.monotonic() - ticket._started_at
+                self._mean_hold = 0.8 * self._mean_hold + 0.2 * max(hold, 0.1)
+        else:
+            q = self._queues.get(ticket.user)
+            if q is not None and ticket in q:
+                q.remove(ticket)
+                if not q:
+                    del self._queues[ticket.user]
+            ticket._granted.cancel()
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self.active < self.max_concurrent:
+            user = next((u for u, q in self._queues.items() if self.active_for(u) < q[0].max_active), None)
+            if user is None:
+                return
+            q = self._queues[user]
+            ticket = q.popleft()
+            if q:
+                self._queues.move_to_end(user)
+            else:
+                del self._queues[user]
+            self._active[user] = self.active_for(user) + 1
+            ticket._granted.set_result(None)
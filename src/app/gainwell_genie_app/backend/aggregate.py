@@ -0,0 +1,150 @@
+"""
+Server-side aggregation for the chart view.
+
+The result is scanned chunk by chunk; each chunk is reduced with NumPy (np.unique + np.bincount) to
+per-group sums and counts that are merged into a running table, so memory grows with the number of
+groups, not rows. Only the aggregated series is returned to the browser.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from .formats import is_numeric_type
+from .models import AggregateRequest
+
+NULL_KEY = "(null)"
+_DATE_TYPES = {"DATE", "TIMESTAMP"}
+
+
+class AggregateError(ValueError):
+    """The aggregation spec does not fit the result's columns."""
+
+
+@dataclass
+class _Plan:
+    key_index: int
+    key_type: str
+    value_index: int | None
+
+
+def _plan(spec: AggregateRequest, names: list[str], types: list[str | None]) -> _Plan:
+    def index_of(col: str) -> int:
+        try:
+            return names.index(col)
+        except ValueError:
+            raise AggregateError(f"unknown column {col!r}; result columns are {names}")
+
+    key_index = index_of(spec.group_by)
+    key_type = (types[key_index] or "STRING").upper()
+    if spec.bin_width is not None and not is_numeric_type(key_type):
+        raise AggregateError(f"bin_width needs a numeric group_by column; {spec.group_by} is {key_type}")
+    if spec.date_unit is not None and key_type not in _DATE_TYPES:
+        raise AggregateError(f"date_unit needs a DATE/TIMESTAMP group_by column; {spec.group_by} is {key_type}")
+    value_index = None
+    if spec.value is not None:
+        value_index = index_of(spec.value)
+        if not is_numeric_type(types[value_index]):
+            raise AggregateError(f"{spec.value} is {types[value_index]}, not a numeric column")
+    elif spec.agg != "count":
+        raise AggregateError(f"agg={spec.agg} needs a value column")
+    return _Plan(key_index, key_type, value_index)
+
+
+def _numbers(col: list) -> np.ndarray:
+    arr = np.array(col, dtype=object)
+    arr[np.equal(arr, None)] = "nan"
+    return arr.astype(np.float64)
+
+
+def _date_keys(col: list, unit: str) -> np.ndarray:
+    # ISO dates/timestamps: the first 10 characters are the calendar day.
+    arr = np.array([v[:10] if v else "NaT" for v in col], dtype="datetime64[D]")
+    missing = np.isnat(arr)
+    if unit == "week":
+        days = arr.astype(np.int64)
+        # 1970-01-01 was a Thursday; shift to the Monday starting each week.
+        arr = (days - (days + 3) % 7).astype("datetime64[D]")
+        arr[missing] = np.datetime64("NaT")
+    elif unit == "month":
+        arr = arr.astype("datetime64[M]").astype("datetime64[D]")
+    elif unit == "year":
+        arr = arr.astype("datetime64[Y]").astype("datetime64[D]")
+    out = arr.astype(str).astype(object)
+    out[missing] = NULL_KEY
+    return out.astype(str)
+
+
+def _keys(col: list, spec: AggregateRequest) -> np.ndarray:
+    if spec.bin_width is not None:
+        nums = _numbers(col)
+        binned = np.floor(nums / spec.bin_width) * spec.bin_width
+        out = binned.astype(str).astype(object)
+        out[np.isnan(nums)] = NULL_KEY
+        return out.astype(str)
+    if spec.date_unit is not None:
+        return _date_keys(col, spec.date_unit)
+    arr = np.array(col, dtype=object)
+    arr[np.equal(arr, None)] = NULL_KEY
+    return arr.astype(str)
+
+
+class Aggregator:
+    """Running group-by over result chunks."""
+
+    def __init__(self, spec: AggregateRequest, names: list[str], types: list[str | None], *, max_groups: int) -> None:
+        self.spec = spec
+        self.max_groups = max_groups
+        self._plan = _plan(spec, names, types)
+        self._sums: dict[str, float] = {}
+        self._counts: dict[str, int] = {}
+        self.rows_scanned = 0
+
+    def add(self, rows: list[list]) -> None:
+        if not rows:
+            return
+        cols = list(zip(*rows))
+        keys = _keys(list(cols[self._plan.key_index]), self.spec)
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        if self._plan.value_index is not None:
+            values = _numbers(list(cols[self._plan.value_index]))
+            present = ~np.isnan(values)
+            sums = np.bincount(inverse, weights=np.where(present, values, 0.0), minlength=len(uniq))
+            counts = np.bincount(inverse, weights=present, minlength=len(uniq)).astype(np.int64)
+        else:
+            counts = np.bincount(inverse, minlength=len(uniq))
+            sums = counts.astype(np.float64)
+        for k, s, c in zip(uniq.tolist(), sums.tolist(), counts.tolist()):
+            self._sums[k] = self._sums.get(k, 0.0) + s
+            self._counts[k] = self._counts.get(k, 0) + c
+        if len(self._sums) > self.max_groups:
+            raise AggregateError(f"more than {self.max_groups} groups; use binning or a coarser group_by")
+        self.rows_scanned += len(rows)
+
+    def series(self) -> tuple[list[str], list[float | None], list[int], int]:
+        """(keys, values, counts, total group count), top_k by value or, when binned, ordered by key."""
+        keys = np.array(list(self._sums), dtype=object)
+        sums = np.fromiter(self._sums.values(), dtype=np.float64, count=len(keys))
+        counts = np.fromiter(self._counts.values(), dtype=np.int64, count=len(keys))
+        if self.spec.agg == "avg":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                values = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+        elif self.spec.agg == "count":
+            values = counts.astype(np.float64)
+        else:
+            values = sums
+        if self.spec.bin_width is not None or self.spec.date_unit is not None:
+            if self.spec.bin_width is not None:
+                sort_keys = np.array([np.inf if k == NULL_KEY else float(k) for k in keys])
+            else:
+                sort_keys = np.array(["9999-99-99" if k == NULL_KEY else k for k in keys])
+            order = np.argsort(sort_keys, kind="stable")
+        else:
+            order = np.argsort(-np.nan_to_num(values, nan=-np.inf), kind="stable")
+        if self.spec.top_k is not None:
+            order = order[: self.spec.top_k]
+        return (
+            [str(k) for k in keys[order]],
+            [None if np.isnan(v) else float(v) for v in values[order]],
+            counts[order].tolist(),
+            len(keys),
+        )
@@ -1,16 +1,25 @@
+import asyncio
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse
 
 from .._metadata import app_name, dist_dir
 from .config import AppConfig
 from .router import api
 from .runtime import Runtime
+from .static import StaticUI
 from .utils import add_not_found_handler
 from .logger import logger
+from .metrics import MetricsMiddleware
+
+
+async def _precompress_ui(runtime: Runtime, ui: StaticUI) -> None:
+    # Compress the UI bundle in the background so first page loads get the smallest variant; after
+    # the SDK import so the two do not compete for the CPU during startup.
+    await runtime.ready()
+    await asyncio.to_thread(ui.precompress)
 
 
 @asynccontextmanager
@@ -20,7 +29,15 @@ async def lifespan(app: FastAPI):
     runtime = Runtime(config)
     app.state.config = config
     app.state.runtime = runtime
-    yield
+    # Before anything runs in a thread: asyncio.to_thread (run_blocking) uses the default executor
+    asyncio.get_running_loop().set_default_executor(runtime.executor)
+    runtime.start()
+    if ui is not None:
+        app.state.ui_precompress = asyncio.create_task(_precompress_ui(runtime, ui))
+    try:
+        yield
+    finally:
+        runtime.close()
 
 
 app = FastAPI(title=app_name, lifespan=lifespan)
@@ -30,17 +47,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(MetricsMiddleware)
 app.include_router(api)
 
-# Serve UI: explicit root so "/" always returns HTML; then mount static assets
-_index_html = dist_dir / "index.html"
-if _index_html.exists():
+# Serve UI from memory: explicit root so "/" always returns HTML; then mount the build output
+ui = StaticUI(dist_dir) if (dist_dir / "index.html").exists() else None
+if ui is not None:
+    index = ui.index
+
     @app.get("/", response_class=HTMLResponse, include_in_schema=False)
-    def serve_root():
-        return FileResponse(_index_html, media_type="text/html")
+    def serve_root(request: Request):
+        return index.response(request.headers.get("accept-encoding"), request.headers.get("if-none-match"))
 
-    ui = StaticFiles(directory=str(dist_dir), html=True)
     app.mount("/", ui)
 else:
     logger.warning("UI dist_dir %s not found; run 'apx build' before deploy", dist_dir)
@@ -54,4 +74,4 @@ else:
             status_code=503,
         )
 
-add_not_found_handler(app)
+add_not_found_handler(app, ui)
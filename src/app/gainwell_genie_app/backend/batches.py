@@ -0,0 +1,212 @@
+"""
+Batches of questions for /api/ask/batch.
+
+A batch runs its questions concurrently, at most `parallelism` at a time, each through the same path
+as /api/ask (answer cache, in-flight coalescing, similar-question reuse, admission control, retries),
+so it takes about as long as its slowest questions rather than their sum. The caller gets a batch id
+back at once and polls the batch or streams its items as they finish (batch_events).
+
+Batches live in the memory of the app process. Finished batches can be polled for ttl_seconds; at
+most max_batches are kept, and a new batch is refused (BatchesFull) while that many are still running.
+"""
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable
+
+from .logger import logger
+from .models import AskRequest, AskResponse, BatchItemOut, BatchOut
+from .stream import sse
+
+
+class BatchesFull(Exception):
+    """Too many batches are running to start another one."""
+
+
+@dataclass
+class BatchItem:
+    request: AskRequest
+    status: str = "queued"
+    answer: AskResponse | None = None
+    error: str | None = None
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    def out(self, index: int, *, answer: bool = True) -> BatchItemOut:
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = round((self.finished_at or time.monotonic()) - self.started_at, 3)
+        return BatchItemOut(
+            index=index,
+            question=self.request.question,
+            status=self.status,
+            answer=self.answer if answer else None,
+            error=self.error,
+            elapsed_seconds=elapsed,
+        )
+
+
+class Batch:
+    """The questions of one batch and their progress. Used from the event loop only."""
+
+    def __init__(self, owner: str, requests: list[AskRequest], parallelism: int) -> None:
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.parallelism = parallelism
+        self.items = [BatchItem(r) for r in requests]
+        self.created_at = time.time()
+        self.cancelled = False
+        self.finished_at: float | None = None  # monotonic
+        self._started = time.monotonic()
+        self._finished: list[int] = []  # item indexes in the order they finished
+        self._changed = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def status(self) -> str:
+        if not self.done:
+            return "running"
+        return "cancelled" if self.cancelled else "done"
+
+    def start(self, ask: Callable[[AskRequest], Awaitable[AskResponse]]) -> None:
+        self._task = asyncio.create_task(self._run(ask))
+
+    def cancel(self) -> None:
+        """Stop the questions still queued or running; finished answers are kept."""
+        if self._task is not None and not self.done:
+            self.cancelled = True
+            self._task.cancel()
+
+    async def wait(self) -> None:
+        """Return once no question of the batch is queued or running."""
+        if self._task is not None:
+            await asyncio.wait({self._task})
+
+    async def _run(self, ask: Callable[[AskRequest], Awaitable[AskResponse]]) -> None:
+        limit = asyncio.Semaphore(self.parallelism)
+
+        async def one(index: int) -> None:
+            async with limit:
+                await self._ask(index, ask)
+
+        try:
+            await asyncio.gather(*(one(i) for i in range(len(self.items))))
+        except asyncio.CancelledError:
+            pass
+        finally:
+            for i, item in enumerate(self.items):
+                if item.finished_at is None:
+                    item.status = "cancelled"
+                    item.finished_at = time.monotonic()
+                    self._finished.append(i)
+            self.finished_at = time.monotonic()
+            self._notify()
+
+    async def _ask(self, index: int, ask: Callable[[AskRequest], Awaitable[AskResponse]]) -> None:
+        item = self.items[index]
+        item.status = "running"
+        item.started_at = time.monotonic()
+        try:
+            item.answer = await ask(item.request)
+        except Exception as e:
+            logger.warning("Batch %s question %d failed: %s", self.id, index, e)
+            item.status, item.error = "error", str(e) or type(e).__name__
+        else:
+            item.error = item.answer.error
+            item.status = "error" if item.error else "done"
+        item.finished_at = time.monotonic()
+        self._finished.append(index)
+        self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def finished(self) -> AsyncIterator[int]:
+        """Indexes of finished items in the order they finished (those already finished first), until the batch is done."""
+        sent = 0
+        while True:
+            changed = self._changed
+            while sent < len(self._finished):
+                yield self._finished[sent]
+                sent += 1
+            if self.done:
+                return
+            await changed.wait()
+
+    def out(self, *, answers: bool = True) -> BatchOut:
+        end = self.finished_at or time.monotonic()
+        return BatchOut(
+            batch_id=self.id,
+            status=self.status,
+            created_at=datetime.fromtimestamp(self.created_at, tz=timezone.utc),
+            parallelism=self.parallelism,
+            total=len(self.items),
+            finished=len(self._finished),
+            failed=sum(item.status == "error" for item in self.items),
+            elapsed_seconds=round(end - self._started, 3),
+            items=[item.out(i, answer=answers) for i, item in enumerate(self.items)],
+        )
+
+
+class BatchStore:
+    def __init__(self, *, max_batches: int, ttl_seconds: float) -> None:
+        self.max_batches = max_batches
+        self.ttl_seconds = ttl_seconds
+        self._batches: dict[str, Batch] = {}
+
+    def __len__(self) -> int:
+        return len(self._batches)
+
+    @property
+    def running(self) -> int:
+        return sum(not b.done for b in self._batches.values())
+
+    def start(
+        self,
+        owner: str,
+        requests: list[AskRequest],
+        parallelism: int,
+        ask: Callable[[AskRequest], Awaitable[AskResponse]],
+    ) -> Batch:
+        """Start answering requests with ask(); raises BatchesFull if max_batches are still running."""
+        self._evict(room=1)
+        if len(self._batches) >= self.max_batches:
+            raise BatchesFull(f"{self.max_batches} batches are running; try again when one has finished")
+        batch = Batch(owner, requests, parallelism)
+        batch.start(ask)
+        self._batches[batch.id] = batch
+        return batch
+
+    def get(self, owner: str, batch_id: str) -> Batch | None:
+        """The owner's batch, or None (unknown, expired or someone else's)."""
+        self._evict()
+        batch = self._batches.get(batch_id)
+        return batch if batch is not None and batch.owner == owner else None
+
+    def _evict(self, room: int = 0) -> None:
+        """Drop expired batches, then the oldest finished ones until room more fit."""
+        now = time.monotonic()
+        finished = sorted((b for b in self._batches.values() if b.done), key=lambda b: b.finished_at)
+        over = len(self._batches) + room - self.max_batches
+        for b in finished:
+            if now - b.finished_at > self.ttl_seconds or over > 0:
+                del self._batches[b.id]
+                over -= 1
+
+    def close(self) -> None:
+        for batch in self._batches.values():
+            batch.cancel()
+
+
+async def batch_events(batch: Batch) -> AsyncIterator[bytes]:
+    """SSE: one item event (with its answer) per question as it finishes, then done with the batch summary."""
+    async for index in batch.finished():
+        yield sse("item", batch.items[index].out(index).model_dump())
+    yield sse("done", batch.out(answers=False).model_dump())
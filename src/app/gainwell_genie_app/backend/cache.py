@@ -0,0 +1,182 @@
+"""
+In-process LRU cache with per-entry TTL. Thread-safe: used both from the event loop and from
+sync dependencies that FastAPI runs in its threadpool.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, TypeVar
+
+from .models import AskResponse
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class TTLCache(Generic[K, V]):
+    """Bounded LRU mapping; entries expire ttl_seconds after they were set.
+
+    Optionally bounded by memory too: with max_bytes, sizeof(value) is charged per entry and least
+    recently used entries are evicted until the total fits. A value larger than max_bytes is not stored.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        *,
+        max_bytes: int | None = None,
+        sizeof: Callable[[V], int] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._sizeof = sizeof or (lambda _: 0)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data: OrderedDict[K, tuple[float, int, V]] = OrderedDict()
+        self._bytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.stats.misses += 1
+                return None
+            expires_at, _, value = item
+            if expires_at <= self._clock():
+                self._remove(key)
+                self.stats.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: K, value: V) -> None:
+        size = self._sizeof(value)
+        with self._lock:
+            self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = (self._clock() + self.ttl_seconds, size, value)
+            self._bytes += size
+            self._evict()
+
+    def pop(self, key: K) -> V | None:
+        with self._lock:
+            item = self._remove(key)
+            return item[2] if item else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def purge_expired(self) -> int:
+        """Drop every expired entry; returns how many were removed."""
+        with self._lock:
+            now = self._clock()
+            expired = [k for k, (expires_at, _, _) in self._data.items() if expires_at <= now]
+            for k in expired:
+                self._remove(k)
+            return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _remove(self, key: K) -> tuple[float, int, V] | None:
+        item = self._data.pop(key, None)
+        if item is not None:
+            self._bytes -= item[1]
+        return item
+
+    def _over_budget(self) -> bool:
+        if len(self._data) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self._bytes > self.max_bytes
+
+    def _evict(self) -> None:
+        # Caller holds the lock. Expired entries go first, then least recently used.
+        now = self._clock()
+        while self._data:
+            key, (expires_at, _, _) = next(iter(self._data.items()))
+            if expires_at <= now or self._over_budget():
+                self._remove(key)
+                self.stats.evictions += 1
+                continue
+            break
+
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Case/whitespace/trailing-punctuation insensitive form of a question, used in cache keys."""
+    return _WS.sub(" ", question).strip().rstrip("?.! ").casefold()
+
+
+def _rows_size(rows: list[list]) -> float:
+    # Samples up to 100 rows rather than walking all of them
+    sample = rows[:100]
+    per_row = (sum(len(str(v)) + 16 for row in sample for v in row) / len(sample)) if sample else 0
+    return per_row * len(rows)
+
+
+def estimate_response_size(resp: AskResponse) -> int:
+    """Approximate in-memory size of a response: its rows and those of every attachment result."""
+    text = len(resp.question) + len(resp.sql or "") + len(resp.text_response) + sum(len(c) for c in resp.columns)
+    size = 512 + text + _rows_size(resp.data)
+    for r in resp.results:
+        size += 256 + len(r.sql or "") + sum(len(c) for c in r.columns) + _rows_size(r.data)
+    return int(size)
+
+
+class AnswerCache:
+    """Cache of first-turn Genie answers.
+
+    Keyed by space, normalized question and caller identity, so a user never sees rows that
+    another user's permissions produced.
+    """
+
+    def __init__(self, *, max_entries: int, ttl_seconds: float, max_bytes: int) -> None:
+        self._cache: TTLCache[tuple[str, str, str], AskResponse] = TTLCache(
+            max_entries, ttl_seconds, max_bytes=max_bytes, sizeof=estimate_response_size
+        )
+
+    @staticmethod
+    def key(space_id: str, question: str, identity: str) -> tuple[str, str, str]:
+        return (space_id, normalize_question(question), identity)
+
+    @property
+    def stats(self) -> CacheStats:
+        return self._cache.stats
+
+    @property
+    def nbytes(self) -> int:
+        return self._cache.nbytes
+
+    def get(self, key: tuple[str, str, str]) -> AskResponse | None:
+        return self._cache.get(key)
+
+    def put(self, key: tuple[str, str, str], resp: AskResponse) -> None:
+        if resp.error:
+            return
+        self._cache.set(key, resp)
+
+    def __len__(self) -> int:
+        return len(self._cache)
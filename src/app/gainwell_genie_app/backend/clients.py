@@ -0,0 +1,106 @@
+"""
+Pooled WorkspaceClients.
+
+Config() resolution and a fresh HTTP session per request are expensive (auth/host lookup, new TLS
+handshakes). The pool resolves the workspace host once, keeps one client per user token (keyed by a
+hash of the token, never the token itself) in a bounded LRU/TTL cache, and mounts a single shared
+keep-alive HTTPAdapter on every client so all users reuse the same connections to the workspace.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from typing import TYPE_CHECKING
+
+import requests
+
+from .cache import TTLCache
+
+if TYPE_CHECKING:
+    from databricks.sdk import WorkspaceClient
+    from databricks.sdk.core import Config
+
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class WorkspaceClientPool:
+    def __init__(
+        self,
+        *,
+        max_clients: int = 256,
+        ttl_seconds: float = 1800.0,
+        pool_maxsize: int = 64,
+        retry_timeout_seconds: int | None = None,
+    ) -> None:
+        self._adapter = requests.adapters.HTTPAdapter(
+            pool_connections=4, pool_maxsize=pool_maxsize, pool_block=True
+        )
+        self._clients: TTLCache[str, WorkspaceClient] = TTLCache(max_clients, ttl_seconds)
+        self._retry_timeout_seconds = retry_timeout_seconds
+        self._lock = threading.Lock()
+        self._config: Config | None = None
+        self._service: WorkspaceClient | None = None
+
+    @property
+    def config(self) -> Config:
+        """App (service principal) config, resolved once."""
+        if self._config is None:
+            with self._lock:
+                if self._config is None:
+                    from databricks.sdk.core import Config
+
+                    self._config = Config()
+        return self._config
+
+    @property
+    def host(self) -> str:
+        return self.config.host
+
+    def service_client(self) -> WorkspaceClient:
+        """Client authenticated as the app itself."""
+        if self._service is None:
+            with self._lock:
+                if self._service is None:
+                    from databricks.sdk import WorkspaceClient
+
+                    self._service = self._share_pool(WorkspaceClient(config=self.config))
+        return self._service
+
+    def for_token(self, token: str) -> WorkspaceClient:
+        """Client acting on behalf of the user who owns token (OBO)."""
+        key = token_key(token)
+        client = self._clients.get(key)
+        if client is None:
+            from databricks.sdk import WorkspaceClient
+            from databricks.sdk.core import Config
+
+            # A short SDK retry budget: its retries sleep in the worker thread; resilience.py retries longer
+            config = Config(host=self.host, token=token, auth_type="pat", retry_timeout_seconds=self._retry_timeout_seconds)
+            client = self._share_pool(WorkspaceClient(config=config))
+            self._clients.set(key, client)
+        return client
+
+    def warm(self) -> None:
+        """Resolve the workspace config and open a keep-alive connection to the host ahead of the first request."""
+        host = self.host
+        # Not closed: closing the session would close the shared adapter and drop the connection.
+        session = requests.Session()
+        session.mount("https://", self._adapter)
+        session.head(host, timeout=10, allow_redirects=False).close()
+
+    def close(self) -> None:
+        self._clients.clear()
+        self._adapter.close()
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def _share_pool(self, client: WorkspaceClient) -> WorkspaceClient:
+        # The SDK gives every client its own requests.Session; swap in the shared adapter so the
+        # urllib3 connection pool is reused. Auth stays per-session (session.auth), so this is safe.
+        session = getattr(getattr(client.api_client, "_api_client", None), "_session", None)
+        if isinstance(session, requests.Session):
+            session.mount("https://", self._adapter)
+        return client
@@ -10,6 +10,8 @@ from .._metadata import app_name, app_slug
 project_root = Path(__file__).resolve().parent.parent.parent
 env_file = project_root / ".env"
 
+# Read .env once, into os.environ: the SDK (DATABRICKS_*) and GENIE_SPACE_ID are read from the
+# environment, and AppConfig picks up its GAINWELL_GENIE_APP_* values from there too.
 try:
     from dotenv import load_dotenv
     if env_file.exists():
@@ -19,10 +21,69 @@ except ImportError:
 
 
 class AppConfig(BaseSettings):
-    model_config: ClassVar[SettingsConfigDict] = SettingsConfigDict(
-        env_file=env_file, env_prefix=f"{app_slug.upper()}_", extra="ignore"
-    )
+    model_config: ClassVar[SettingsConfigDict] = SettingsConfigDict(env_prefix=f"{app_slug.upper()}_", extra="ignore")
     app_name: str = Field(default=app_name)
+    # Genie message polling (seconds): exponential backoff from initial up to max, bounded by timeout
+    genie_poll_initial_seconds: float = Field(default=1.0, gt=0)
+    genie_poll_max_seconds: float = Field(default=10.0, gt=0)
+    genie_poll_multiplier: float = Field(default=1.5, ge=1.0)
+    genie_timeout_seconds: float = Field(default=1200.0, gt=0)
+    # Query attachments of one message fetched in parallel
+    genie_attachment_fetch_concurrency: int = Field(default=4, ge=1)
+    # Identical first-turn questions from the same user share one in-flight Genie call
+    genie_coalesce_in_flight: bool = Field(default=True)
+    # Admission control: concurrent Genie questions (overall / per user), queue sizes, optional start rate
+    genie_max_concurrent: int = Field(default=8, ge=1)
+    genie_max_concurrent_per_user: int = Field(default=2, ge=1)
+    genie_max_queued: int = Field(default=64, ge=0)
+    genie_max_queued_per_user: int = Field(default=8, ge=0)
+    genie_max_questions_per_minute: float = Field(default=0, ge=0)
+    # Genie call resilience: attempts per call for 429/5xx (full-jitter exponential backoff), deadline of one
+    # /api/ask request, circuit breaker (consecutive failures to open, seconds before a probe), hedged result
+    # fetches after this quantile of recent fetch latencies (unset = never), and the SDK's own retry budget
+    genie_retry_attempts: int = Field(default=3, ge=1)
+    genie_retry_initial_seconds: float = Field(default=0.5, gt=0)
+    genie_retry_max_seconds: float = Field(default=8.0, gt=0)
+    genie_request_timeout_seconds: float = Field(default=600.0, gt=0)
+    genie_breaker_failures: int = Field(default=5, ge=1)
+    genie_breaker_reset_seconds: float = Field(default=30.0, gt=0)
+    genie_hedge_quantile: float | None = Field(default=0.95, gt=0, lt=1)
+    genie_hedge_min_samples: int = Field(default=20, ge=1)
+    sdk_retry_timeout_seconds: int = Field(default=30, ge=1)
+    # Batches (/api/ask/batch): questions per batch, questions of one user's batches running at once
+    # (admitted in their own queue, still within genie_max_concurrent), batches kept in memory and how
+    # long a finished batch can still be polled
+    genie_batch_max_questions: int = Field(default=50, ge=1)
+    genie_batch_max_parallel: int = Field(default=8, ge=1)
+    genie_batch_max_kept: int = Field(default=256, ge=1)
+    genie_batch_ttl_seconds: float = Field(default=3600.0, gt=0)
+    # Per-user WorkspaceClient cache (keyed by token hash) sharing one keep-alive connection pool
+    obo_client_cache_size: int = Field(default=256, ge=1)
+    obo_client_ttl_seconds: float = Field(default=1800.0, gt=0)
+    http_pool_maxsize: int = Field(default=64, ge=1)
+    # Threads for blocking SDK calls; unset = 2 x http_pool_maxsize, so calls sleeping in SDK retries or
+    # downloading external links (outside the pool) do not keep the pooled connections idle
+    blocking_max_threads: int | None = Field(default=None, ge=1)
+    # Answer cache for first-turn questions (per space, normalized question and user)
+    answer_cache_max_entries: int = Field(default=1024, ge=1)
+    answer_cache_ttl_seconds: float = Field(default=900.0, gt=0)
+    answer_cache_max_bytes: int = Field(default=256 * 1024 * 1024, ge=0)
+    # Conversation history (SQLite); rows kept per stored answer
+    conversation_store_path: Path = Field(default=Path.home() / ".gainwell_genie_app" / "conversations.sqlite3")
+    conversation_store_max_rows: int = Field(default=1_000, ge=0)
+    # Near-duplicate question index: suggest earlier SQL above threshold, and answer /api/ask by re-running
+    # it on the warehouse above reuse_threshold (unset = never); shared = match other users' questions too
+    similar_questions_path: Path = Field(default=Path.home() / ".gainwell_genie_app" / "questions.sqlite3")
+    similar_questions_max_entries: int = Field(default=100_000, ge=1)
+    similar_questions_threshold: float = Field(default=0.6, ge=0, le=1)
+    similar_questions_reuse_threshold: float | None = Field(default=None, ge=0, le=1)
+    similar_questions_shared: bool = Field(default=False)
+    # Re-running Genie SQL on DATABRICKS_WAREHOUSE_ID: statement polling backoff and timeout (seconds)
+    sql_poll_initial_seconds: float = Field(default=0.25, gt=0)
+    sql_poll_max_seconds: float = Field(default=2.0, gt=0)
+    sql_timeout_seconds: float = Field(default=600.0, gt=0)
+    # Server-side chart aggregation: refuse group-bys with more distinct keys than this
+    aggregate_max_groups: int = Field(default=100_000, ge=1)
 
     @property
     def static_assets_path(self) -> Path:
@@ -0,0 +1,136 @@
+"""
+Server-side history of Genie conversations (SQLite).
+
+Every answered question is stored per user and conversation: the question, SQL, text, result
+columns and ids (to page through the full result with /api/results), and the first max_rows rows so
+a past answer renders without asking Genie again. Answers are stored as zlib-compressed JSON; the
+listing queries only touch the indexed metadata columns.
+"""
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+
+from .models import AskResponse
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    user TEXT NOT NULL,
+    conversation_id TEXT NOT NULL,
+    space_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user, conversation_id)
+);
+CREATE INDEX IF NOT EXISTS conversations_by_user_time ON conversations (user, updated_at DESC);
+CREATE TABLE IF NOT EXISTS messages (
+    user TEXT NOT NULL,
+    conversation_id TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    question TEXT NOT NULL,
+    sql TEXT,
+    created_at REAL NOT NULL,
+    response BLOB NOT NULL,
+    PRIMARY KEY (user, conversation_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS messages_by_conversation_time ON messages (user, conversation_id, created_at);
+CREATE INDEX IF NOT EXISTS messages_by_user_time ON messages (user, created_at DESC);
+"""
+
+
+def _truncate(resp: AskResponse, max_rows: int) -> AskResponse:
+    results = [
+        r.model_copy(update={"data": r.data[:max_rows], "row_count": min(r.row_count, max_rows)}) for r in resp.results
+    ]
+    return resp.model_copy(
+        update={"data": resp.data[:max_rows], "row_count": min(resp.row_count, max_rows), "results": results, "cached": False}
+    )
+
+
+class ConversationStore:
+    def __init__(self, path: str | Path, *, max_rows: int) -> None:
+        self.path = Path(path)
+        self.max_rows = max_rows
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        # One connection shared by the worker threads that call into the store; sqlite3 serializes
+        # statements per connection, the lock keeps multi-statement writes atomic.
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def record(self, user: str, space_id: str, resp: AskResponse) -> None:
+        """Store an answered question; answers without a conversation or with an error are skipped."""
+        if resp.error or not resp.conversation_id or not resp.message_id:
+            return
+        now = time.time()
+        blob = zlib.compress(_truncate(resp, self.max_rows).model_dump_json().encode("utf-8"))
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                cur = self._db.execute(
+                    "INSERT OR IGNORE INTO messages (user, conversation_id, message_id, question, sql, created_at, response)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (user, resp.conversation_id, resp.message_id, resp.question, resp.sql, now, blob),
+                )
+                if cur.rowcount:
+                    self._db.execute(
+                        "INSERT INTO conversations (user, conversation_id, space_id, title, created_at, updated_at, message_count)"
+                        " VALUES (?, ?, ?, ?, ?, ?, 1)"
+                        " ON CONFLICT (user, conversation_id)"
+                        " DO UPDATE SET updated_at = excluded.updated_at, message_count = message_count + 1",
+                        (user, resp.conversation_id, space_id, resp.question[:200], now, now),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def conversations(self, user: str, *, offset: int, limit: int) -> tuple[list[dict], int]:
+        """Page of the user's conversations, most recently updated first, and the user's total."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT conversation_id, space_id, title, created_at, updated_at, message_count FROM conversations"
+                " WHERE user = ? ORDER BY updated_at DESC LIMIT ? OFFSET ?",
+                (user, limit, offset),
+            ).fetchall()
+            total = self._db.execute("SELECT count(*) FROM conversations WHERE user = ?", (user,)).fetchone()[0]
+        return [dict(r) for r in rows], total
+
+    def messages(
+        self, user: str, conversation_id: str, *, offset: int, limit: int
+    ) -> tuple[list[tuple[float, AskResponse]], int] | None:
+        """Page of a conversation's answers, oldest first, and its message count; None if the user has no such conversation."""
+        with self._lock:
+            conv = self._db.execute(
+                "SELECT message_count FROM conversations WHERE user = ? AND conversation_id = ?", (user, conversation_id)
+            ).fetchone()
+            if conv is None:
+                return None
+            rows = self._db.execute(
+                "SELECT created_at, response FROM messages WHERE user = ? AND conversation_id = ?"
+                " ORDER BY created_at LIMIT ? OFFSET ?",
+                (user, conversation_id, limit, offset),
+            ).fetchall()
+        out = [(r["created_at"], AskResponse.model_validate_json(zlib.decompress(r["response"]))) for r in rows]
+        return out, conv["message_count"]
+
+    def answer(self, user: str, conversation_id: str, message_id: str) -> AskResponse | None:
+        """A stored answer of the user, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response FROM messages WHERE user = ? AND conversation_id = ? AND message_id = ?",
+                (user, conversation_id, message_id),
+            ).fetchone()
+        return AskResponse.model_validate_json(zlib.decompress(row["response"])) if row else None
@@ -1,11 +1,14 @@
-from typing import Annotated
+from typing import TYPE_CHECKING, Annotated, Any
 
-from databricks.sdk import WorkspaceClient
-from databricks.sdk.core import Config
 from fastapi import Depends, Header, Request
 
+from .clients import token_key
 from .config import AppConfig
 from .runtime import Runtime
+from .utils import run_blocking
+
+if TYPE_CHECKING:
+    from databricks.sdk import WorkspaceClient
 
 
 def get_config(request: Request) -> AppConfig:
@@ -32,13 +35,37 @@ def get_runtime(request: Request) -> Runtime:
 RuntimeDep = Annotated[Runtime, Depends(get_runtime)]
 
 
-def get_obo_ws(
+async def get_obo_ws(
+    runtime: RuntimeDep,
     token: Annotated[str | None, Header(alias="X-Forwarded-Access-Token")] = None,
-) -> WorkspaceClient:
+) -> "WorkspaceClient":
     if not token:
         raise ValueError(
             "User token is required. When running in Databricks Apps, enable user authorization "
             "and add scopes 'dashboards.genie' and 'sql' so the app can call Genie on your behalf."
         )
-    cfg = Config()
-    return WorkspaceClient(host=cfg.host, token=token, auth_type="pat")
+    await runtime.ready()
+    return await run_blocking(runtime.clients.for_token, token)
+
+
+# The SDK is imported lazily (see Runtime.start), so routes cannot name WorkspaceClient at import
+# time; FastAPI only needs the dependency, type checkers get the real type.
+if TYPE_CHECKING:
+    OboWsDep = Annotated[WorkspaceClient, Depends(get_obo_ws)]
+else:
+    OboWsDep = Annotated[Any, Depends(get_obo_ws)]
+
+
+def get_user_identity(
+    user: Annotated[str | None, Header(alias="X-Forwarded-User")] = None,
+    token: Annotated[str | None, Header(alias="X-Forwarded-Access-Token")] = None,
+) -> str:
+    """Stable id of the caller for per-user state: the Apps proxy's user header, else a token hash."""
+    if user:
+        return f"user:{user}"
+    if token:
+        return f"token:{token_key(token)}"
+    return "anonymous"
+
+
+IdentityDep = Annotated[str, Depends(get_user_identity)]
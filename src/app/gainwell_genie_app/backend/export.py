@@ -0,0 +1,101 @@
+"""
+Streaming export of a Genie query result as CSV or Parquet.
+
+Rows are read chunk by chunk from the statement result (see results.StatementResult) and encoded
+as they arrive, so server memory stays at roughly one chunk regardless of result size. Encoding runs
+in a worker thread to keep large chunks off the event loop.
+"""
+from __future__ import annotations
+
+import csv
+import io
+from typing import TYPE_CHECKING, AsyncIterator
+
+from .formats import arrow_batch, arrow_schema
+from .logger import logger
+from .results import StatementResult
+from .utils import run_blocking
+
+if TYPE_CHECKING:
+    from databricks.sdk import WorkspaceClient
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def content_disposition(filename: str) -> str:
+    return f'attachment; filename="{filename}"'
+
+
+def _csv_bytes(rows: list[list], header: list[str] | None = None) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header is not None:
+        writer.writerow(header)
+    writer.writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
+
+async def stream_csv(result: StatementResult, w: WorkspaceClient) -> AsyncIterator[bytes]:
+    yield _csv_bytes([], header=result.column_names)
+    try:
+        async for rows in result.iter_chunks(w):
+            yield await run_blocking(_csv_bytes, rows)
+    except Exception:
+        logger.exception("CSV export of statement %s failed mid-stream", result.statement_id)
+        raise
+
+
+class _Drain(io.RawIOBase):
+    """Write-only file that hands written bytes back to the caller instead of keeping them."""
+
+    def __init__(self) -> None:
+        self._parts: list[bytes] = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        data = bytes(b)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def take(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts.clear()
+        return out
+
+
+async def stream_parquet(result: StatementResult, w: WorkspaceClient) -> AsyncIterator[bytes]:
+    """One Parquet row group per result chunk; the footer is emitted after the last chunk."""
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema(result.column_names, result.column_types, result.column_decimals)
+    types = result.column_types
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+
+    def write(rows: list[list]) -> bytes:
+        writer.write_batch(arrow_batch(schema, types, rows))
+        return sink.take()
+
+    def close() -> bytes:
+        writer.close()
+        return sink.take()
+
+    try:
+        async for rows in result.iter_chunks(w):
+            data = await run_blocking(write, rows)
+            if data:
+                yield data
+        yield await run_blocking(close)
+    except Exception:
+        logger.exception("Parquet export of statement %s failed mid-stream", result.statement_id)
+        raise
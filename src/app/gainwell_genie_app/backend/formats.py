@@ -0,0 +1,228 @@
+"""
+Result encodings chosen by the Accept header.
+
+- application/json (default): the existing row-oriented AskResponse / ResultPage JSON.
+- application/vnd.gainwell.columnar+json: one typed array per column, types from the statement manifest.
+- application/vnd.apache.arrow.stream: Arrow IPC stream; response metadata travels in the schema
+  metadata under the "gainwell" key. Needs the optional pyarrow dependency (406 without it).
+
+DECIMAL columns stay exact: strings in the columnar JSON, Arrow decimal128 (precision and scale from
+the manifest when known, else inferred from the values).
+
+In both columnar layouts the metadata keeps every attachment's columns and ids but no rows: only the
+primary result is encoded; page other attachments with /api/results?attachment_id=...
+"""
+from decimal import Decimal
+from typing import Any, Callable
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+from .metrics import stage
+
+ROWS = "application/json"
+COLUMNAR = "application/vnd.gainwell.columnar+json"
+ARROW = "application/vnd.apache.arrow.stream"
+
+# OpenAPI "responses" entry for endpoints that negotiate the result format.
+NEGOTIATED_RESPONSES: dict[int | str, dict[str, Any]] = {
+    200: {
+        "content": {
+            COLUMNAR: {"schema": {"type": "object"}},
+            ARROW: {"schema": {"type": "string", "format": "binary"}},
+        }
+    }
+}
+
+_INT_TYPES = {"BYTE", "SHORT", "INT", "LONG"}
+_FLOAT_TYPES = {"FLOAT", "DOUBLE"}
+# Not parsed as floats: claim amounts would lose cents. See arrow_type.
+_DECIMAL = "DECIMAL"
+
+
+def negotiate(accept: str | None) -> str:
+    """Pick the best supported media type from an Accept header (q-values respected)."""
+    best, best_q = ROWS, 0.0
+    for part in (accept or "").split(","):
+        media, _, params = part.strip().partition(";")
+        media = media.strip().lower()
+        q = 1.0
+        for p in params.split(";"):
+            k, _, v = p.strip().partition("=")
+            if k == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        if media in (COLUMNAR, ARROW, ROWS) and q > best_q:
+            best, best_q = media, q
+    return best
+
+
+def _to_int(v: str | None) -> int | None:
+    return None if v is None else int(v)
+
+
+def _to_float(v: str | None) -> float | None:
+    return None if v is None else float(v)
+
+
+def _to_decimal(v: str | None) -> Decimal | None:
+    return None if v is None else Decimal(v)
+
+
+def _to_bool(v: str | None) -> bool | None:
+    return None if v is None else v.lower() == "true"
+
+
+def is_numeric_type(type_name: str | None) -> bool:
+    t = (type_name or "").upper()
+    return t in _INT_TYPES or t in _FLOAT_TYPES or t == _DECIMAL
+
+
+def converter(type_name: str | None) -> Callable[[str | None], Any] | None:
+    """Parser for a manifest type name; None when values stay strings (DECIMAL too, to stay exact in JSON)."""
+    t = (type_name or "").upper()
+    if t in _INT_TYPES:
+        return _to_int
+    if t in _FLOAT_TYPES:
+        return _to_float
+    if t == "BOOLEAN":
+        return _to_bool
+    return None
+
+
+def to_columns(rows: list[list], types: list[str | None], ncols: int) -> list[list]:
+    """Transpose rows into typed columns. Unparseable values fall back to the raw string column."""
+    columns = [list(c) for c in zip(*rows)] if rows else [[] for _ in range(ncols)]
+    for i, col in enumerate(columns):
+        conv = converter(types[i] if i < len(types) else None)
+        if conv is None:
+            continue
+        try:
+            columns[i] = [conv(v) for v in col]
+        except (TypeError, ValueError):
+            pass
+    return columns
+
+
+def require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise HTTPException(status_code=406, detail="Arrow and Parquet output require pyarrow on the server")
+    return pyarrow
+
+
+def arrow_type(pa, type_name: str | None, decimal: tuple[int, int] | None = None):
+    """Arrow type for a manifest type name (strings for anything without a closer match).
+
+    decimal is the column's (precision, scale) from the manifest; a DECIMAL without it stays a string.
+    """
+    t = (type_name or "").upper()
+    if t in _INT_TYPES:
+        return pa.int64()
+    if t in _FLOAT_TYPES:
+        return pa.float64()
+    if t == _DECIMAL and decimal is not None:
+        return pa.decimal128(*decimal)
+    if t == "BOOLEAN":
+        return pa.bool_()
+    if t == "DATE":
+        return pa.date32()
+    if t == "TIMESTAMP":
+        return pa.timestamp("us", tz="UTC")
+    return pa.string()
+
+
+def arrow_schema(names: list[str], types: list[str | None], decimals: list[tuple[int, int] | None] | None = None):
+    pa = require_pyarrow()
+    decimals = (decimals or []) + [None] * len(names)
+    return pa.schema([
+        pa.field(n, arrow_type(pa, t, d)) for n, t, d in zip(names, types + [None] * len(names), decimals)
+    ])
+
+
+def arrow_batch(schema, types: list[str | None], rows: list[list]):
+    """Record batch with exactly the given schema; raises if a value does not parse as its column type."""
+    pa = require_pyarrow()
+    columns = [list(c) for c in zip(*rows)] if rows else [[] for _ in schema]
+    arrays = []
+    for f, t, col in zip(schema, types + [None] * len(schema), columns):
+        if pa.types.is_date32(f.type) or pa.types.is_timestamp(f.type):
+            arrays.append(pa.array(col, type=pa.string()).cast(f.type))
+            continue
+        conv = _to_decimal if pa.types.is_decimal(f.type) else converter(t)
+        arrays.append(pa.array([conv(v) for v in col] if conv else col, type=f.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def arrow_table(names: list[str], types: list[str | None], rows: list[list], metadata: dict[str, Any]):
+    pa = require_pyarrow()
+    arrays = []
+    for name, col, t in zip(names, to_columns(rows, types, len(names)), types + [None] * len(names)):
+        arr = pa.array(col)
+        target = arrow_type(pa, t)
+        if (t or "").upper() == _DECIMAL:
+            # No precision/scale here: let Arrow infer the narrowest decimal128 holding every value
+            try:
+                arr = pa.array([_to_decimal(v) for v in col])
+            except (ArithmeticError, pa.ArrowInvalid):
+                pass
+        elif pa.types.is_date32(target) or pa.types.is_timestamp(target):
+            try:
+                arr = arr.cast(target)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                pass
+        elif pa.types.is_string(arr.type) and len(arr) > 0:
+            # Status/plan-style columns repeat a few values: dictionary-encode them.
+            encoded = arr.dictionary_encode()
+            if len(encoded.dictionary) <= len(arr) // 2:
+                arr = encoded
+        arrays.append(arr)
+    meta = {b"gainwell": to_json(metadata, fallback=str)}
+    return pa.Table.from_arrays(arrays, names=names).replace_schema_metadata(meta)
+
+
+def encode_arrow(names: list[str], types: list[str | None], rows: list[list], metadata: dict[str, Any]) -> bytes:
+    pa = require_pyarrow()
+    table = arrow_table(names, types, rows, metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_columnar(names: list[str], types: list[str | None], rows: list[list], metadata: dict[str, Any]) -> bytes:
+    body = dict(metadata)
+    body["columns"] = [{"name": n, "type": t} for n, t in zip(names, types + [None] * len(names))]
+    # One array per entry of columns, in the same order: a dict keyed by name would drop repeated names
+    body["data"] = to_columns(rows, types, len(names))
+    return to_json(body, fallback=str)
+
+
+def negotiated_response(model: BaseModel, media_type: str) -> Response:
+    """Encode model as row JSON, or its columns/data in the requested columnar layout.
+
+    model must have columns, column_types and data fields; everything else is metadata.
+    Encoding happens here (timed as the serialize stage) rather than in FastAPI's response handling.
+    """
+    with stage("serialize"):
+        return _encode(model, media_type)
+
+
+def _encode(model: BaseModel, media_type: str) -> Response:
+    if media_type == ROWS:
+        return Response(model.model_dump_json().encode("utf-8"), media_type=ROWS)
+    # Rows only travel in the columnar body: other attachments' rows stay at /api/results (see stream._summary)
+    metadata = model.model_dump(
+        exclude={"data": True, "columns": True, "column_types": True, "results": {"__all__": {"data"}}}
+    )
+    names: list[str] = list(getattr(model, "columns"))
+    types: list[str | None] = list(getattr(model, "column_types"))
+    rows: list[list] = getattr(model, "data")
+    if media_type == ARROW:
+        return Response(encode_arrow(names, types, rows, metadata), media_type=ARROW)
+    return Response(encode_columnar(names, types, rows, metadata), media_type=COLUMNAR)
@@ -1,93 +1,325 @@
 """
 Genie client: ask questions and return SQL + result data using Databricks SDK.
 Uses GENIE_SPACE_ID and a WorkspaceClient (caller's identity) so Genie runs with user permissions.
+
+The client is async: the SDK's blocking calls are only used for single HTTP requests (run in a
+worker thread), while waiting for Genie to finish is done with asyncio.sleep on the event loop.
+A request therefore does not hold a threadpool worker for the whole Genie round trip.
+
+Every Genie request goes through a GuardedCalls (see resilience.py): retried when it fails
+transiently, rejected while the circuit breaker is open, and bounded by the request's deadline.
 """
+from __future__ import annotations
+
+import asyncio
 import os
-from databricks.sdk import WorkspaceClient
+import random
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, AsyncIterator, Iterator
+
+from .logger import logger
+from .metrics import record_stage, stage
+from .models import AskResponse, AttachmentResult
+from .resilience import UNGUARDED, CircuitOpen, DeadlineExceeded, GuardedCalls
+from .results import StatementResult, load_result, query_attachment_ids
+
+if TYPE_CHECKING:
+    from databricks.sdk import WorkspaceClient
+    from databricks.sdk.service.dashboards import GenieMessage
+
+# MessageStatus values; compared by value so this module does not import the SDK at startup.
+_DONE_STATES = ("COMPLETED",)
+_FAILED_STATES = ("FAILED", "CANCELLED")
+# Once Genie reports one of these, SQL generation is over and the warehouse is working.
+_EXECUTING_STATES = ("PENDING_WAREHOUSE", "EXECUTING_QUERY")
+
+
+def message_status(msg: GenieMessage) -> str | None:
+    return msg.status.value if msg.status else None
+
+
+@dataclass(frozen=True)
+class PollBackoff:
+    """How often to poll Genie for message status: exponential backoff with jitter, capped."""
+    initial: float = 1.0
+    maximum: float = 10.0
+    multiplier: float = 1.5
+    jitter: float = 0.25
+    timeout: float = 1200.0
+
+    def delays(self) -> Iterator[float]:
+        delay = self.initial
+        while True:
+            yield delay + random.uniform(0, self.jitter * delay)
+            delay = min(delay * self.multiplier, self.maximum)
+
+
+def genie_space_id() -> str:
+    return os.environ.get("GENIE_SPACE_ID", "").strip()
+
+
+async def submit_question(
+    w: WorkspaceClient,
+    space_id: str,
+    question: str,
+    conversation_id: str | None = None,
+    *,
+    calls: GuardedCalls = UNGUARDED,
+) -> tuple[str, str]:
+    """Start a conversation (or add a follow-up); returns (conversation_id, message_id) without waiting."""
+    # Not idempotent: retried only on 429/503, which Genie returns before creating the message
+    if not conversation_id:
+        waiter = await calls.run(w.genie.start_conversation, space_id=space_id, content=question, idempotent=False)
+    else:
+        waiter = await calls.run(
+            w.genie.create_message,
+            space_id=space_id, conversation_id=conversation_id, content=question, idempotent=False,
+        )
+    return waiter.conversation_id, waiter.message_id
+
+
+async def poll_message(
+    w: WorkspaceClient,
+    space_id: str,
+    conversation_id: str,
+    message_id: str,
+    *,
+    backoff: PollBackoff,
+    calls: GuardedCalls = UNGUARDED,
+) -> AsyncIterator[GenieMessage]:
+    """Yield the message after every poll; stops after yielding it COMPLETED.
+
+    Raises on FAILED/CANCELLED, after backoff.timeout, or DeadlineExceeded at the request deadline.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + backoff.timeout
+    bounded_by_request = calls.deadline is not None and calls.deadline.when < deadline
+    if bounded_by_request:
+        deadline = calls.deadline.when
+    status = None
+    for delay in backoff.delays():
+        msg = await calls.run(
+            w.genie.get_message,
+            space_id=space_id,
+            conversation_id=conversation_id,
+            message_id=message_id,
+        )
+        status = message_status(msg)
+        if status in _FAILED_STATES:
+            from databricks.sdk.errors import OperationFailed
+
+            detail = getattr(msg.error, "error", None) if msg.error else None
+            raise OperationFailed(f"failed to reach COMPLETED, got {status}: {detail or 'no error detail'}")
+        yield msg
+        if status in _DONE_STATES:
+            return
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        await asyncio.sleep(min(delay, remaining))
+    if bounded_by_request:
+        raise calls.deadline.exceeded(f"Genie message {message_id} (status {status})")
+    raise TimeoutError(f"timed out after {backoff.timeout}s: current status: {status}")
+
+
+class StageClock:
+    """Splits the wait for a message into generation and execution stages from observed statuses."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.executing_since: float | None = None
+
+    def observe(self, msg: GenieMessage) -> None:
+        if self.executing_since is None and message_status(msg) in _EXECUTING_STATES:
+            self.executing_since = time.perf_counter()
+
+    def finish(self) -> None:
+        now = time.perf_counter()
+        record_stage("generation", (self.executing_since or now) - self.started)
+        if self.executing_since is not None:
+            record_stage("execution", now - self.executing_since)
+
 
-from .models import AskResponse
+async def wait_for_message(
+    w: WorkspaceClient,
+    space_id: str,
+    conversation_id: str,
+    message_id: str,
+    *,
+    backoff: PollBackoff,
+    calls: GuardedCalls = UNGUARDED,
+) -> GenieMessage:
+    """Poll the message until it is COMPLETED; raise on FAILED/CANCELLED or after backoff.timeout."""
+    clock = StageClock()
+    msg = None
+    async for msg in poll_message(w, space_id, conversation_id, message_id, backoff=backoff, calls=calls):
+        clock.observe(msg)
+    clock.finish()
+    assert msg is not None
+    return msg
+
+
+def parse_attachments(msg: GenieMessage) -> tuple[str | None, str]:
+    """(generated SQL, joined text response) from whatever attachments the message has so far."""
+    sql: str | None = None
+    text_parts: list[str] = []
+    for att in getattr(msg, "attachments", None) or []:
+        if getattr(att, "text", None) and getattr(att.text, "content", None):
+            text_parts.append(att.text.content)
+        if getattr(att, "query", None) and getattr(att.query, "query", None):
+            sql = att.query.query
+    return sql, " ".join(text_parts).strip()
+
+
+@dataclass
+class FetchedResult:
+    """Outcome of fetching one query attachment's result."""
+    attachment_id: str
+    sql: str | None = None
+    result: StatementResult | None = None
+    error: str | None = None
+
+
+async def fetch_results(
+    w: WorkspaceClient, space_id: str, msg: GenieMessage, *, concurrency: int = 4, calls: GuardedCalls = UNGUARDED
+) -> list[FetchedResult]:
+    """Fetch every query attachment's result concurrently (at most concurrency at a time).
+
+    Results keep attachment order; a failed fetch is reported in its entry instead of being dropped.
+    Slow fetches are hedged (see GuardedCalls.hedged); deadline and breaker errors fail the whole call.
+    """
+    conversation_id = getattr(msg, "conversation_id", None)
+    message_id = getattr(msg, "message_id", None) or getattr(msg, "id", None)
+    attachments = getattr(msg, "attachments", None) or []
+    if not (conversation_id and message_id):
+        return []
+    sql_by_id = {
+        (att.attachment_id or att.query.id): att.query.query
+        for att in attachments
+        if getattr(att, "query", None) is not None
+    }
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def fetch(att_id: str) -> FetchedResult:
+        async with semaphore:
+            try:
+                result = await calls.hedged(
+                    lambda: load_result(w, space_id, conversation_id, message_id, att_id), name="load_result"
+                )
+                return FetchedResult(att_id, sql_by_id.get(att_id), result=result)
+            except (DeadlineExceeded, CircuitOpen):
+                raise
+            except Exception as e:
+                logger.warning("Fetching result of attachment %s failed: %s", att_id, e)
+                return FetchedResult(att_id, sql_by_id.get(att_id), error=str(e))
+
+    with stage("result_fetch"):
+        return list(await asyncio.gather(*(fetch(a) for a in query_attachment_ids(attachments))))
+
+
+def primary_result(fetched: list[FetchedResult]) -> StatementResult | None:
+    """The first attachment that produced a result; it fills AskResponse's top-level columns/data."""
+    for f in fetched:
+        if f.result is not None and (f.result.columns or f.result.first is not None):
+            return f.result
+    return None
+
+
+def error_text(err_msg: str) -> str:
+    """User-facing explanation of a failed Genie call."""
+    if "does not have required scopes" in err_msg or "required scopes" in err_msg:
+        return (
+            "Your app session doesn’t have permission to use Genie yet. "
+            "Close this app, open it again from the Databricks Apps menu, and accept the new permissions when prompted. "
+            "If you don’t see a prompt, ask your workspace admin to add scopes “dashboards.genie” and “sql” to the app and grant consent."
+        )
+    return f"Genie request failed: {err_msg}"
 
 
-def ask_genie(
+def not_configured_response(question: str) -> AskResponse:
+    return AskResponse(
+        question=question,
+        text_response="Genie is not configured. Set GENIE_SPACE_ID in the app environment.",
+        error="GENIE_SPACE_ID not set",
+    )
+
+
+async def _attachment_result(f: FetchedResult) -> AttachmentResult:
+    if f.result is None:
+        return AttachmentResult(attachment_id=f.attachment_id, sql=f.sql, error=f.error)
+    data = await f.result.first_rows()
+    total = f.result.total_row_count
+    return AttachmentResult(
+        attachment_id=f.attachment_id,
+        sql=f.sql,
+        columns=f.result.column_names,
+        column_types=f.result.column_types,
+        data=data,
+        row_count=len(data),
+        total_row_count=total if total is not None else len(data),
+    )
+
+
+async def build_response(
+    question: str, msg: GenieMessage, fetched: list[FetchedResult], conversation_id: str | None
+) -> AskResponse:
+    sql, text_response = parse_attachments(msg)
+    results = [await _attachment_result(f) for f in fetched]
+    primary = primary_result(fetched)
+    main = next((r for r in results if primary is not None and r.attachment_id == primary.attachment_id), None)
+    data = main.data if main else []
+    row_count = len(data)
+    total = main.total_row_count if main else row_count
+    if main is not None:
+        # The primary attachment's rows are the top-level data; do not carry them twice
+        results = [r.model_copy(update={"data": []}) if r is main else r for r in results]
+    return AskResponse(
+        question=question,
+        sql=(main.sql if main else None) or sql,
+        columns=main.columns if main else [],
+        column_types=main.column_types if main else [],
+        data=data,
+        row_count=row_count,
+        total_row_count=total,
+        text_response=text_response or ("Query returned %d rows." % total if data else "No rows returned."),
+        conversation_id=getattr(msg, "conversation_id", None) or conversation_id,
+        message_id=getattr(msg, "message_id", None) or getattr(msg, "id", None),
+        attachment_id=main.attachment_id if main else None,
+        results=results,
+    )
+
+
+async def ask_genie(
     question: str,
     conversation_id: str | None = None,
     *,
     workspace_client: WorkspaceClient,
+    backoff: PollBackoff | None = None,
+    fetch_concurrency: int = 4,
+    calls: GuardedCalls = UNGUARDED,
 ) -> AskResponse:
-    space_id = os.environ.get("GENIE_SPACE_ID", "").strip()
+    """Ask and wait for the answer; Genie failures become an AskResponse with error set.
+
+    DeadlineExceeded and CircuitOpen are raised instead, for the route to answer 504 / 503.
+    """
+    space_id = genie_space_id()
     if not space_id:
-        return AskResponse(
-            question=question,
-            text_response="Genie is not configured. Set GENIE_SPACE_ID in the app environment.",
-            error="GENIE_SPACE_ID not set",
-        )
+        return not_configured_response(question)
+    backoff = backoff or PollBackoff()
     try:
         w = workspace_client
-        if not conversation_id:
-            msg = w.genie.start_conversation_and_wait(space_id=space_id, content=question)
-        else:
-            msg = w.genie.create_message_and_wait(
-                space_id=space_id, conversation_id=conversation_id, content=question
-            )
-        conversation_id = getattr(msg, "conversation_id", None) or conversation_id
-        message_id = getattr(msg, "message_id", None) or getattr(msg, "id", None)
-        sql: str | None = None
-        columns: list[str] = []
-        data: list[list] = []
-        text_parts: list[str] = []
-        attachments = getattr(msg, "attachments", None) or []
-        for att in attachments:
-            if getattr(att, "text", None) and getattr(att.text, "content", None):
-                text_parts.append(att.text.content)
-            if getattr(att, "query", None) and getattr(att.query, "query", None):
-                sql = att.query.query
-        text_response = " ".join(text_parts).strip() if text_parts else ""
-        if space_id and conversation_id and message_id and attachments:
-            for att in attachments:
-                att_id = getattr(att, "attachment_id", None) or (
-                    getattr(att, "query", None) and getattr(att.query, "id", None)
-                )
-                if not att_id:
-                    continue
-                try:
-                    result = w.genie.get_message_attachment_query_result(
-                        space_id=space_id,
-                        conversation_id=conversation_id,
-                        message_id=message_id,
-                        attachment_id=att_id,
-                    )
-                    stmt = getattr(result, "statement_response", None)
-                    if stmt:
-                        if getattr(stmt, "manifest", None) and getattr(stmt.manifest, "schema", None) and getattr(stmt.manifest.schema, "columns", None):
-                            columns = [getattr(c, "name", str(c)) for c in stmt.manifest.schema.columns]
-                        if getattr(stmt, "result", None) and getattr(stmt.result, "data_array", None):
-                            data = [list(row) for row in stmt.result.data_array]
-                        if columns or data:
-                            break
-                except Exception:
-                    pass
-        row_count = len(data)
-        return AskResponse(
-            question=question,
-            sql=sql,
-            columns=columns,
-            data=data,
-            row_count=row_count,
-            text_response=text_response or ("Query returned %d rows." % row_count if data else "No rows returned."),
-            conversation_id=conversation_id,
-        )
+        with stage("submit"):
+            conv_id, message_id = await submit_question(w, space_id, question, conversation_id, calls=calls)
+        msg = await wait_for_message(w, space_id, conv_id, message_id, backoff=backoff, calls=calls)
+        fetched = await fetch_results(w, space_id, msg, concurrency=fetch_concurrency, calls=calls)
+        return await build_response(question, msg, fetched, conv_id)
+    except (DeadlineExceeded, CircuitOpen):
+        raise
     except Exception as e:
         err_msg = str(e)
-        if "does not have required scopes" in err_msg or "required scopes" in err_msg:
-            text = (
-                "Your app session doesn’t have permission to use Genie yet. "
-                "Close this app, open it again from the Databricks Apps menu, and accept the new permissions when prompted. "
-                "If you don’t see a prompt, ask your workspace admin to add scopes “dashboards.genie” and “sql” to the app and grant consent."
-            )
-        else:
-            text = f"Genie request failed: {err_msg}"
         return AskResponse(
             question=question,
-            text_response=text,
+            text_response=error_text(err_msg),
             error=err_msg,
         )
@@ -0,0 +1,276 @@
+"""
+Request/stage instrumentation.
+
+- stage(name) times one step of a request. Durations go to the genie_stage_seconds histogram and to
+  the request's Server-Timing header (added by MetricsMiddleware).
+- REGISTRY renders every metric in the Prometheus text format for /api/metrics.
+
+Self-contained on purpose: a handful of counters/histograms does not justify a client library.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, TypeVar
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+ROW_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+
+def _fmt_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        head = f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n"
+        return head + "".join(line + "\n" for line in self.samples())
+
+
+class _Scalar(_Metric):
+    """One value per label set, or a single value read from a callback at scrape time."""
+
+    def __init__(
+        self, name: str, help: str, labelnames: tuple[str, ...] = (), *, callback: Callable[[], float] | None = None
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        if self._callback is not None:
+            return self._callback()
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterator[str]:
+        if self._callback is not None:
+            yield f"{self.name} {_fmt_value(self._callback())}"
+            return
+        for key, v in sorted(self._values.items()):
+            yield f"{self.name}{_fmt_labels(self.labelnames, key)} {_fmt_value(v)}"
+
+
+class Counter(_Scalar):
+    kind = "counter"
+
+
+class Gauge(_Scalar):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labelnames: tuple[str, ...] = (), *, buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: dict[tuple[str, ...], tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels: str) -> int:
+        item = self._values.get(self._key(labels))
+        return sum(item[0]) if item else 0
+
+    def samples(self) -> Iterator[str]:
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = 'le="' + _fmt_value(bound) + '"'
+                yield f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_value(total)}"
+            yield f"{self.name}_count{_fmt_labels(self.labelnames, key)} {cumulative}"
+
+
+M = TypeVar("M", bound=_Metric)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: M) -> M:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "".join(m.render() for m in self._metrics.values())
+
+
+def _threadpool_stat(attr: str) -> Callable[[], float]:
+    # Starlette runs sync endpoints and dependencies on anyio's default limiter (40 threads).
+    def read() -> float:
+        from anyio.to_thread import current_default_thread_limiter
+
+        try:
+            return getattr(current_default_thread_limiter(), attr)
+        except RuntimeError:
+            return 0
+
+    return read
+
+
+REGISTRY = Registry()
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status")
+))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency until the last body byte.", ("route", "method")
+))
+HTTP_RESPONSE_BYTES = REGISTRY.register(Histogram(
+    "http_response_bytes", "Response body size.", ("route",), buckets=SIZE_BUCKETS
+))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge("http_requests_in_flight", "Requests currently being handled."))
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "genie_stage_seconds",
+    "Time per request stage: queue, submit, generation, execution, result_fetch, serialize.",
+    ("stage",),
+))
+RESULT_ROWS = REGISTRY.register(Histogram(
+    "genie_result_rows", "Total rows in the primary result of an answered question.", buckets=ROW_BUCKETS
+))
+COALESCED_REQUESTS = REGISTRY.register(Counter(
+    "genie_coalesced_requests_total", "Questions answered by joining an identical request already in flight."
+))
+SIMILAR_REUSED = REGISTRY.register(Counter(
+    "genie_similar_sql_reused_total", "Questions answered by re-running the SQL of a near-duplicate earlier question."
+))
+ADMISSION_REJECTED = REGISTRY.register(Counter(
+    "genie_admission_rejected_total", "Questions rejected with 429 because the Genie queue was full."
+))
+GENIE_RETRIES = REGISTRY.register(Counter(
+    "genie_call_retries_total", "Genie calls repeated after a transient failure (429, 5xx, connection).", ("call",)
+))
+CIRCUIT_REJECTED = REGISTRY.register(Counter(
+    "genie_circuit_rejected_total", "Genie calls rejected without trying because the circuit breaker was open."
+))
+HEDGED_FETCHES = REGISTRY.register(Counter(
+    "genie_hedged_fetches_total", "Slow result fetches that got a duplicate request, by which one answered first.", ("winner",)
+))
+BLOCKING_IN_FLIGHT = REGISTRY.register(Gauge(
+    "blocking_calls_in_flight", "SDK HTTP calls currently running in worker threads."
+))
+REGISTRY.register(Gauge(
+    "threadpool_borrowed_threads", "Starlette threadpool threads in use.", callback=_threadpool_stat("borrowed_tokens")
+))
+REGISTRY.register(Gauge(
+    "threadpool_total_threads", "Starlette threadpool capacity.", callback=_threadpool_stat("total_tokens")
+))
+
+_timings: ContextVar[list[tuple[str, float]] | None] = ContextVar("server_timings", default=None)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    STAGE_LATENCY.observe(seconds, stage=name)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - t0)
+
+
+def server_timing(timings: list[tuple[str, float]], total: float) -> str:
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """Counts and times HTTP requests and adds a Server-Timing header with the recorded stages."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings: list[tuple[str, float]] = []
+        token = _timings.set(timings)
+        t0 = time.perf_counter()
+        status = 500
+        body_bytes = 0
+        HTTP_IN_FLIGHT.inc()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, body_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                value = server_timing(timings, time.perf_counter() - t0)
+                headers.append((b"server-timing", value.encode("latin-1")))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                body_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            _timings.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope.get("method", "")
+            HTTP_REQUESTS.inc(route=route, method=method, status=str(status))
+            HTTP_LATENCY.observe(time.perf_counter() - t0, route=route, method=method)
+            HTTP_RESPONSE_BYTES.observe(body_bytes, route=route)
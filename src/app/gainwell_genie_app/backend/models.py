@@ -1,4 +1,7 @@
-from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 from .. import __version__
 
@@ -11,10 +14,80 @@ class VersionOut(BaseModel):
         return cls(version=__version__)
 
 
+class ComplexValueOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    display: str | None = None
+    primary: bool | None = None
+    ref: str | None = None
+    type: str | None = None
+    value: str | None = None
+
+
+class NameOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    family_name: str | None = None
+    given_name: str | None = None
+
+
+class UserOut(BaseModel):
+    """Workspace user; same fields as the SDK's iam.User, which is not imported at startup."""
+    model_config = ConfigDict(from_attributes=True)
+    active: bool | None = None
+    display_name: str | None = None
+    emails: list[ComplexValueOut] | None = None
+    entitlements: list[ComplexValueOut] | None = None
+    external_id: str | None = None
+    groups: list[ComplexValueOut] | None = None
+    id: str | None = None
+    name: NameOut | None = None
+    roles: list[ComplexValueOut] | None = None
+    schemas: list[str] | None = None
+    user_name: str | None = None
+
+    @field_validator("schemas", mode="before")
+    @classmethod
+    def _enum_values(cls, v):
+        return [getattr(s, "value", s) for s in v] if v is not None else None
+
+
 class AskRequest(BaseModel):
     """Request body for asking Genie a question."""
     question: str = Field(..., min_length=1, description="Natural language question about the data")
     conversation_id: str | None = Field(None, description="For follow-up questions in the same conversation")
+    refresh: bool = Field(False, description="Bypass the answer cache and ask Genie again")
+    timeout_seconds: float | None = Field(
+        None, gt=0, description="Give up with 504 after this many seconds (at most the server's request timeout)"
+    )
+
+
+class AttachmentResult(BaseModel):
+    """Result of one query attachment (first chunk); error is set when it could not be fetched.
+
+    In AskResponse.results the primary attachment (attachment_id of the response) has no data: its rows
+    are the response's data.
+    """
+    attachment_id: str
+    sql: str | None = None
+    columns: list[str] = Field(default_factory=list)
+    column_types: list[str | None] = Field(default_factory=list)
+    data: list[list] = Field(default_factory=list)
+    row_count: int = 0
+    total_row_count: int = 0
+    error: str | None = None
+
+
+class SimilarQuestion(BaseModel):
+    """An earlier question whose generated SQL may answer a new one."""
+    question: str
+    sql: str
+    score: float = Field(description="Jaccard similarity of the questions' word 3-grams")
+    conversation_id: str | None = None
+    message_id: str | None = None
+
+
+class SimilarQuestionsOut(BaseModel):
+    question: str
+    matches: list[SimilarQuestion] = Field(default_factory=list)
 
 
 class AskResponse(BaseModel):
@@ -22,8 +95,152 @@ class AskResponse(BaseModel):
     question: str
     sql: str | None = None
     columns: list[str] = Field(default_factory=list)
+    column_types: list[str | None] = Field(default_factory=list, description="Manifest type name per column, e.g. STRING, DOUBLE")
     data: list[list] = Field(default_factory=list)
-    row_count: int = 0
+    row_count: int = Field(0, description="Rows included in data (the first result chunk)")
+    total_row_count: int = Field(0, description="Rows in the full result; page through them with /api/results")
     text_response: str = ""
     conversation_id: str | None = None
+    message_id: str | None = None
+    attachment_id: str | None = None
+    error: str | None = None
+    cached: bool = False
+    results: list[AttachmentResult] = Field(
+        default_factory=list,
+        description="Every query attachment's result; the primary one's (attachment_id) rows are in data above, not repeated",
+    )
+    statement_id: str | None = Field(None, description="Set when the SQL was re-run on the warehouse; page with /api/sql/statements")
+    reused_from: SimilarQuestion | None = Field(None, description="Earlier question whose SQL answered this one, without Genie")
+
+
+class BatchAskRequest(BaseModel):
+    """Questions to answer concurrently, each like a /api/ask body."""
+    questions: list[AskRequest] = Field(..., min_length=1, description="At most the server's batch size limit")
+    parallelism: int | None = Field(
+        None, ge=1, description="Questions running at once (at most the server's batch parallelism, the default)"
+    )
+
+
+class BatchItemOut(BaseModel):
+    """One question of a batch; answer is set once it finished."""
+    index: int
+    question: str
+    status: Literal["queued", "running", "done", "error", "cancelled"]
+    answer: AskResponse | None = None
     error: str | None = None
+    elapsed_seconds: float | None = Field(None, description="Time from start to answer; None while queued")
+
+
+class BatchOut(BaseModel):
+    """A batch of questions and the status of each."""
+    batch_id: str
+    status: Literal["running", "done", "cancelled"]
+    created_at: datetime
+    parallelism: int
+    total: int
+    finished: int = Field(description="Questions done, failed or cancelled")
+    failed: int
+    elapsed_seconds: float = Field(description="Wall-clock time of the batch so far")
+    items: list[BatchItemOut] = Field(default_factory=list)
+
+
+class ResultPage(BaseModel):
+    """One page of a Genie query result, or of a statement re-run with /api/sql/rerun."""
+    conversation_id: str | None = None
+    message_id: str | None = None
+    attachment_id: str | None = None
+    statement_id: str | None = None
+    columns: list[str] = Field(default_factory=list)
+    column_types: list[str | None] = Field(default_factory=list)
+    data: list[list] = Field(default_factory=list)
+    offset: int = 0
+    limit: int = 0
+    total_row_count: int | None = None
+    next_offset: int | None = None
+
+
+class SqlRerunRequest(BaseModel):
+    """Run the SQL of an earlier Genie answer again on the SQL warehouse, without asking Genie."""
+    conversation_id: str
+    message_id: str
+    attachment_id: str | None = Field(None, description="Query attachment to re-run; the first one by default")
+    limit: int = Field(500, ge=1, le=10_000, description="Rows in the first page; page on with /api/sql/statements")
+    row_limit: int | None = Field(None, ge=1, description="Cap on the rows the warehouse returns")
+
+
+class ConversationOut(BaseModel):
+    """A stored conversation of the current user."""
+    conversation_id: str
+    space_id: str
+    title: str = Field(description="First question of the conversation")
+    created_at: datetime
+    updated_at: datetime
+    message_count: int
+
+
+class ConversationPage(BaseModel):
+    conversations: list[ConversationOut] = Field(default_factory=list)
+    offset: int = 0
+    limit: int = 0
+    total: int = 0
+    next_offset: int | None = None
+
+
+class ConversationMessage(BaseModel):
+    """A stored answer; data holds at most the store's row limit, the full result is at /api/results."""
+    created_at: datetime
+    answer: AskResponse
+
+
+class ConversationMessagePage(BaseModel):
+    conversation_id: str
+    messages: list[ConversationMessage] = Field(default_factory=list)
+    offset: int = 0
+    limit: int = 0
+    total: int = 0
+    next_offset: int | None = None
+
+
+class CacheStatsOut(BaseModel):
+    """Answer cache counters."""
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    bytes: int
+
+
+class QueueStatusOut(BaseModel):
+    """Genie admission queue as seen by the caller."""
+    active: int
+    queued: int
+    max_concurrent: int
+    user_active: int
+    user_queued: int
+    max_per_user: int
+    retry_after: int
+
+
+class AggregateRequest(BaseModel):
+    """Group-by over a Genie query result, computed on the server."""
+    conversation_id: str
+    message_id: str
+    attachment_id: str | None = None
+    group_by: str = Field(..., description="Column to group on (binned when bin_width or date_unit is set)")
+    value: str | None = Field(None, description="Numeric column to aggregate; not needed for count")
+    agg: Literal["sum", "count", "avg"] = "sum"
+    bin_width: float | None = Field(None, gt=0, description="Bucket width for a numeric group_by column")
+    date_unit: Literal["day", "week", "month", "year"] | None = Field(None, description="Bucket for a DATE/TIMESTAMP group_by column")
+    top_k: int | None = Field(20, ge=1, le=10_000, description="Largest groups by value (first buckets when binned)")
+
+
+class AggregateResponse(BaseModel):
+    """Aggregated series for charting."""
+    group_by: str
+    value: str | None = None
+    agg: str
+    keys: list[str] = Field(default_factory=list)
+    values: list[float | None] = Field(default_factory=list)
+    counts: list[int] = Field(default_factory=list)
+    groups_total: int = 0
+    rows_scanned: int = 0
@@ -0,0 +1,292 @@
+"""
+Resilient Genie calls: retries, a per-request deadline, a circuit breaker and hedged result fetches.
+
+- Transient failures (429, 500, 503, 504, connection errors) are retried on the event loop with
+  full-jitter exponential backoff, waiting at least the server's Retry-After. Calls that create
+  something (a new message) are retried only on 429/503, which Genie returns before doing any work.
+- The route fixes a Deadline for the request. Every attempt and every backoff sleep is bounded by it,
+  so a request that cannot finish in time gives up (504) instead of holding a slot and a thread.
+- The CircuitBreaker opens after a run of consecutive transient failures and then rejects calls
+  (CircuitOpen, 503 with Retry-After) until reset_seconds have passed; one probe call is then let
+  through, and its success closes the breaker again.
+- A result fetch that takes longer than a quantile of recent fetch latencies gets one duplicate
+  request; the first to answer wins and the other is cancelled.
+
+The SDK retries throttled requests itself, sleeping inside the blocking call (in a worker thread);
+WorkspaceClientPool caps that budget so longer waits happen here instead, without holding a thread.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import math
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, TypeVar
+
+import requests
+
+from .logger import logger
+from .metrics import CIRCUIT_REJECTED, GENIE_RETRIES, HEDGED_FETCHES
+from .utils import run_blocking
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline passed before the Genie call finished."""
+
+
+class CircuitOpen(RuntimeError):
+    """Genie calls are failing; new calls are rejected for retry_after seconds."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"Genie is failing repeatedly; not sending new requests for {retry_after}s")
+        self.retry_after = retry_after
+
+
+def retryable(e: BaseException, *, idempotent: bool = True) -> bool:
+    """Whether a failed call may succeed when repeated (only 429/503 unless the call is idempotent)."""
+    from databricks.sdk.errors import DeadlineExceeded as GatewayTimeout
+    from databricks.sdk.errors import InternalError, TemporarilyUnavailable, TooManyRequests
+
+    if isinstance(e, TimeoutError) and not isinstance(e, DeadlineExceeded) and e.__cause__ is not None:
+        # The SDK's own retry ran out of time: judge by the error it was retrying
+        return retryable(e.__cause__, idempotent=idempotent)
+    if isinstance(e, (TooManyRequests, TemporarilyUnavailable)):
+        return True
+    return idempotent and isinstance(e, (InternalError, GatewayTimeout, requests.ConnectionError, requests.Timeout))
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """attempts in total per call; backoff before attempt n+1 is uniform in [0, initial * multiplier**n], capped."""
+    attempts: int = 3
+    initial: float = 0.5
+    maximum: float = 8.0
+    multiplier: float = 2.0
+
+    def delay(self, attempt: int, error: BaseException) -> float:
+        cap = min(self.initial * self.multiplier ** attempt, self.maximum)
+        retry_after = getattr(error, "retry_after_secs", None) or getattr(error.__cause__, "retry_after_secs", None)
+        return max(random.uniform(0, cap), retry_after or 0)
+
+
+@dataclass(frozen=True)
+class Deadline:
+    """The event loop time by which a request must be answered."""
+    when: float
+    seconds: float
+
+    @classmethod
+    def after(cls, seconds: float) -> Deadline:
+        return cls(asyncio.get_running_loop().time() + seconds, seconds)
+
+    def remaining(self) -> float:
+        return self.when - asyncio.get_running_loop().time()
+
+    def exceeded(self, what: str) -> DeadlineExceeded:
+        return DeadlineExceeded(f"{what} did not finish within the {self.seconds:g}s request deadline")
+
+
+class CircuitBreaker:
+    """Closed, open after `failures` consecutive transient failures, half-open reset_seconds later.
+
+    Used from the event loop only, so it needs no lock.
+    """
+
+    def __init__(self, *, failures: int, reset_seconds: float) -> None:
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self._consecutive = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self._opened_at >= self.reset_seconds else "open"
+
+    def retry_after(self) -> int:
+        if self._opened_at is None:
+            return 0
+        return max(math.ceil(self._opened_at + self.reset_seconds - time.monotonic()), 1)
+
+    def check(self) -> None:
+        """Raise CircuitOpen while the breaker is open (does not take the half-open probe)."""
+        if self.state == "open":
+            CIRCUIT_REJECTED.inc()
+            raise CircuitOpen(self.retry_after())
+
+    def acquire(self) -> bool:
+        """Admit a call or raise CircuitOpen; True when the call is the half-open probe."""
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        CIRCUIT_REJECTED.inc()
+        raise CircuitOpen(self.retry_after())
+
+    def record(self, ok: bool, probe: bool) -> None:
+        """Outcome of an admitted call: ok unless it failed transiently."""
+        if probe:
+            self._probing = False
+        if ok:
+            if self._opened_at is not None:
+                logger.info("Genie circuit breaker closed")
+            self._consecutive = 0
+            self._opened_at = None
+            return
+        self._consecutive += 1
+        if probe or (self._opened_at is None and self._consecutive >= self.failures):
+            logger.warning("Genie circuit breaker open for %gs after %d failures", self.reset_seconds, self._consecutive)
+            self._opened_at = time.monotonic()
+
+    def release(self, probe: bool) -> None:
+        """An admitted call ended without telling anything about Genie (cancelled, deadline)."""
+        if probe:
+            self._probing = False
+
+
+class LatencyWindow:
+    """Durations of the last `size` successful calls."""
+
+    def __init__(self, size: int = 200) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float:
+        ordered = sorted(self._samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class GenieGuard:
+    """State shared by all requests: retry policy, circuit breaker and recent result fetch latencies."""
+
+    def __init__(
+        self,
+        *,
+        retry: RetryPolicy,
+        breaker: CircuitBreaker,
+        hedge_quantile: float | None = None,
+        hedge_min_samples: int = 20,
+    ) -> None:
+        self.retry = retry
+        self.breaker = breaker
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.fetch_latency = LatencyWindow()
+
+    def hedge_delay(self) -> float | None:
+        """Seconds after which a result fetch gets a duplicate; None until enough fetches were seen."""
+        if self.hedge_quantile is None or len(self.fetch_latency) < self.hedge_min_samples:
+            return None
+        return self.fetch_latency.quantile(self.hedge_quantile)
+
+    def calls(self, deadline: Deadline | None = None) -> GuardedCalls:
+        return GuardedCalls(self, deadline)
+
+
+@dataclass(frozen=True)
+class GuardedCalls:
+    """The Genie calls of one request: retried, gated by the shared breaker, bounded by its deadline.
+
+    Without a guard (the default) calls run once, with no breaker, only bounded by the deadline.
+    """
+    guard: GenieGuard | None = None
+    deadline: Deadline | None = None
+
+    async def run(self, fn: Callable[..., T], /, *args: Any, idempotent: bool = True, **kwargs: Any) -> T:
+        """One blocking SDK request (see run_blocking), guarded like call()."""
+        return await self.call(lambda: run_blocking(fn, *args, **kwargs), name=fn.__name__, idempotent=idempotent)
+
+    async def call(self, attempt: Callable[[], Awaitable[T]], *, name: str, idempotent: bool = True) -> T:
+        """Await attempt(), again after a backoff while it fails transiently and time and attempts are left."""
+        guard = self.guard
+        for n in itertools.count():
+            probe = guard.breaker.acquire() if guard else False
+            try:
+                result = await self._bounded(attempt(), name)
+            except DeadlineExceeded:
+                if guard:
+                    guard.breaker.release(probe)
+                raise
+            except Exception as e:
+                if guard is None:
+                    raise
+                guard.breaker.record(not retryable(e), probe)
+                if n + 1 >= guard.retry.attempts or not retryable(e, idempotent=idempotent):
+                    raise
+                delay = guard.retry.delay(n, e)
+                if self.deadline is not None and delay >= self.deadline.remaining():
+                    raise
+                GENIE_RETRIES.inc(call=name)
+                logger.info("Genie %s failed (%s); retry %d in %.2fs", name, e, n + 1, delay)
+                await asyncio.sleep(delay)
+            except BaseException:
+                if guard:
+                    guard.breaker.release(probe)
+                raise
+            else:
+                if guard:
+                    guard.breaker.record(True, probe)
+                return result
+        raise AssertionError("unreachable")
+
+    async def hedged(self, attempt: Callable[[], Awaitable[T]], *, name: str) -> T:
+        """call(), plus one duplicate if the first has not answered after the guard's hedge delay."""
+        guard = self.guard
+        delay = guard.hedge_delay() if guard else None
+
+        async def timed() -> T:
+            t0 = time.perf_counter()
+            result = await self.call(attempt, name=name)
+            if guard:
+                guard.fetch_latency.add(time.perf_counter() - t0)
+            return result
+
+        if delay is None:
+            return await timed()
+        original = asyncio.ensure_future(timed())
+        tasks = {original}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            hedge = None
+            if not done:
+                hedge = asyncio.ensure_future(timed())
+                tasks.add(hedge)
+            while True:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((t for t in done if t.exception() is None), None)
+                if winner is not None or not tasks:
+                    winner = winner or done.pop()
+                    if hedge is not None:
+                        HEDGED_FETCHES.inc(winner="hedge" if winner is hedge else "original")
+                    return winner.result()
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    async def _bounded(self, aw: Awaitable[T], name: str) -> T:
+        if self.deadline is None:
+            return await aw
+        try:
+            async with asyncio.timeout_at(self.deadline.when) as scope:
+                return await aw
+        except TimeoutError:
+            if scope.expired():
+                raise self.deadline.exceeded(f"Genie {name}") from None
+            raise
+
+
+UNGUARDED = GuardedCalls()
@@ -0,0 +1,212 @@
+"""
+Chunked access to the SQL result behind a Genie query attachment.
+
+Genie returns only the first chunk of a statement result inline. Further chunks are read on demand
+through the Statement Execution API, one chunk at a time, so the backend holds at most the chunks
+that overlap the page (or export slice) being served, never the whole result.
+
+Rows are lists of strings (or None) as in the JSON_ARRAY format. Statements run with the
+ARROW_STREAM format (see statements.py) are converted to that shape when their chunks are read, so
+paging, export and aggregation treat both formats alike.
+"""
+from __future__ import annotations
+
+import base64
+import datetime as dt
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, AsyncIterator
+
+import requests
+
+from .utils import run_blocking
+
+if TYPE_CHECKING:
+    from databricks.sdk import WorkspaceClient
+    from databricks.sdk.service.sql import ColumnInfo, ResultData, StatementResponse
+
+
+class ResultNotFound(LookupError):
+    """The message has no query attachment with a statement result."""
+
+
+@dataclass(frozen=True)
+class ChunkInfo:
+    index: int
+    row_offset: int
+    row_count: int
+
+
+@dataclass
+class StatementResult:
+    """Statement result of one query attachment, read lazily chunk by chunk."""
+    attachment_id: str | None
+    statement_id: str | None
+    columns: list[ColumnInfo] = field(default_factory=list)
+    total_row_count: int | None = None
+    chunks: list[ChunkInfo] = field(default_factory=list)
+    first: ResultData | None = None
+    format: str | None = None
+
+    @classmethod
+    def from_statement(cls, stmt: StatementResponse, attachment_id: str | None = None) -> "StatementResult":
+        manifest = stmt.manifest
+        columns = list(manifest.schema.columns or []) if manifest and manifest.schema else []
+        chunks = [
+            ChunkInfo(c.chunk_index, c.row_offset or 0, c.row_count or 0)
+            for c in (manifest.chunks or [] if manifest else [])
+            if c.chunk_index is not None
+        ]
+        return cls(
+            attachment_id=attachment_id,
+            statement_id=stmt.statement_id,
+            columns=columns,
+            total_row_count=manifest.total_row_count if manifest else None,
+            chunks=sorted(chunks, key=lambda c: c.index),
+            first=stmt.result,
+            format=manifest.format.value if manifest and manifest.format else None,
+        )
+
+    @property
+    def column_names(self) -> list[str]:
+        return [c.name or str(c.position) for c in self.columns]
+
+    @property
+    def column_types(self) -> list[str | None]:
+        return [c.type_name.value if c.type_name else None for c in self.columns]
+
+    @property
+    def column_decimals(self) -> list[tuple[int, int] | None]:
+        """(precision, scale) of each DECIMAL column, None for other columns or when the manifest lacks them."""
+        return [
+            (c.type_precision, c.type_scale or 0) if c.type_precision and c.type_name and c.type_name.value == "DECIMAL" else None
+            for c in self.columns
+        ]
+
+    async def first_rows(self) -> list[list]:
+        """Rows of the chunk Genie returned inline."""
+        return await _rows_async(self.first, self.format) if self.first else []
+
+    async def fetch_chunk(self, w: WorkspaceClient, index: int) -> ResultData:
+        if self.first is not None and (self.first.chunk_index or 0) == index:
+            return self.first
+        if not self.statement_id:
+            raise ResultNotFound(f"chunk {index} requested but the result has no statement id")
+        return await run_blocking(
+            w.statement_execution.get_statement_result_chunk_n,
+            statement_id=self.statement_id,
+            chunk_index=index,
+        )
+
+    async def iter_chunks(self, w: WorkspaceClient) -> AsyncIterator[list[list]]:
+        """Yield the rows of every chunk in order, fetching the next one only when asked."""
+        index: int | None = (self.first.chunk_index or 0) if self.first else 0
+        while index is not None:
+            chunk = await self.fetch_chunk(w, index)
+            rows = await _rows_async(chunk, self.format)
+            yield rows
+            index = chunk.next_chunk_index
+
+    async def page(self, w: WorkspaceClient, offset: int, limit: int) -> list[list]:
+        """Rows [offset, offset + limit) of the result."""
+        end = offset + limit
+        out: list[list] = []
+        if self.chunks:
+            for c in self.chunks:
+                if c.row_offset + c.row_count <= offset or c.row_offset >= end:
+                    continue
+                rows = await _rows_async(await self.fetch_chunk(w, c.index), self.format)
+                out.extend(rows[max(offset - c.row_offset, 0): end - c.row_offset])
+            return out
+        # No chunk map in the manifest: walk chunks in order, keeping only the current one.
+        row_offset = 0
+        async for rows in self.iter_chunks(w):
+            if row_offset + len(rows) > offset:
+                out.extend(rows[max(offset - row_offset, 0): end - row_offset])
+            row_offset += len(rows)
+            if row_offset >= end:
+                break
+        return out
+
+
+def _text(v: object) -> str | None:
+    """A value decoded from Arrow, rendered the way the JSON_ARRAY format renders it."""
+    if v is None or isinstance(v, str):
+        return v
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    if isinstance(v, dt.datetime):
+        if v.tzinfo is not None:
+            v = v.astimezone(dt.timezone.utc).replace(tzinfo=None)
+            return v.isoformat(timespec="milliseconds") + "Z"
+        return v.isoformat()
+    if isinstance(v, dt.date):
+        return v.isoformat()
+    if isinstance(v, bytes):
+        return base64.b64encode(v).decode("ascii")
+    return str(v)
+
+
+def _arrow_rows(data: bytes) -> list[list]:
+    import pyarrow as pa
+
+    table = pa.ipc.open_stream(data).read_all()
+    columns = [[_text(v) for v in col.to_pylist()] for col in table.columns]
+    return [list(r) for r in zip(*columns)]
+
+
+def _rows(chunk: ResultData, fmt: str | None = None) -> list[list]:
+    if chunk.data_array is not None:
+        return chunk.data_array
+    rows: list[list] = []
+    for link in chunk.external_links or []:
+        # Presigned cloud storage URLs: no workspace auth header, only the headers the API returned.
+        resp = requests.get(link.external_link, headers=link.http_headers or {}, timeout=60)
+        resp.raise_for_status()
+        rows.extend(_arrow_rows(resp.content) if fmt == "ARROW_STREAM" else resp.json())
+    return rows
+
+
+async def _rows_async(chunk: ResultData, fmt: str | None = None) -> list[list]:
+    if chunk.data_array is not None:
+        return chunk.data_array
+    return await run_blocking(_rows, chunk, fmt)
+
+
+def query_attachment_ids(attachments) -> list[str]:
+    ids = []
+    for att in attachments or []:
+        if getattr(att, "query", None) is None:
+            continue
+        att_id = getattr(att, "attachment_id", None) or getattr(att.query, "id", None)
+        if att_id:
+            ids.append(att_id)
+    return ids
+
+
+async def load_result(
+    w: WorkspaceClient,
+    space_id: str,
+    conversation_id: str,
+    message_id: str,
+    attachment_id: str | None = None,
+) -> StatementResult:
+    """Statement result of a message's query attachment (the first one unless attachment_id is given)."""
+    if not attachment_id:
+        msg = await run_blocking(
+            w.genie.get_message,
+            space_id=space_id, conversation_id=conversation_id, message_id=message_id,
+        )
+        ids = query_attachment_ids(msg.attachments)
+        if not ids:
+            raise ResultNotFound(f"message {message_id} has no query attachment")
+        attachment_id = ids[0]
+    result = await run_blocking(
+        w.genie.get_message_attachment_query_result,
+        space_id=space_id,
+        conversation_id=conversation_id,
+        message_id=message_id,
+        attachment_id=attachment_id,
+    )
+    if result.statement_response is None:
+        raise ResultNotFound(f"attachment {attachment_id} has no statement result")
+    return StatementResult.from_statement(result.statement_response, attachment_id)
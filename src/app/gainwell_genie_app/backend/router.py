@@ -1,13 +1,53 @@
-from typing import Annotated
+import asyncio
+import sqlite3
+from datetime import datetime, timezone
+from functools import partial
+from typing import TYPE_CHECKING, Annotated, Literal
 
-from databricks.sdk import WorkspaceClient
-from databricks.sdk.service.iam import User as UserOut
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 
 from .._metadata import api_prefix
-from .dependencies import get_obo_ws
-from .models import AskRequest, AskResponse, VersionOut
-from .genie_client import ask_genie
+from .admission import QueueFull
+from .aggregate import AggregateError, Aggregator
+from .batches import Batch, BatchesFull, batch_events
+from .cache import AnswerCache
+from .config import AppConfig
+from .dependencies import ConfigDep, IdentityDep, OboWsDep, RuntimeDep
+from .export import EXPORT_MEDIA_TYPES, content_disposition, stream_csv, stream_parquet
+from .formats import NEGOTIATED_RESPONSES, negotiate, negotiated_response, require_pyarrow
+from .genie_client import PollBackoff, ask_genie, genie_space_id
+from .logger import logger
+from .metrics import COALESCED_REQUESTS, REGISTRY, RESULT_ROWS, SIMILAR_REUSED, Counter, Gauge
+from .models import (
+    AggregateRequest,
+    AggregateResponse,
+    AskRequest,
+    AskResponse,
+    BatchAskRequest,
+    BatchOut,
+    CacheStatsOut,
+    ConversationMessage,
+    ConversationMessagePage,
+    ConversationOut,
+    ConversationPage,
+    QueueStatusOut,
+    ResultPage,
+    SimilarQuestion,
+    SimilarQuestionsOut,
+    SqlRerunRequest,
+    UserOut,
+    VersionOut,
+)
+from .resilience import CircuitOpen, Deadline
+from .results import ResultNotFound, StatementResult, load_result
+from .singleflight import ClientDisconnected, until_disconnected
+from .statements import StatementFailed, execute_statement, genie_sql, load_statement, warehouse_id
+from .stream import SSE_HEADERS, admitted_events, ask_events, cached_events
+from .utils import run_blocking
+
+if TYPE_CHECKING:
+    from databricks.sdk import WorkspaceClient
 
 api = APIRouter(prefix=api_prefix)
 
@@ -18,8 +58,8 @@ async def version():
 
 
 @api.get("/current-user", response_model=UserOut, operation_id="currentUser")
-def me(obo_ws: Annotated[WorkspaceClient, Depends(get_obo_ws)]):
-    return obo_ws.current_user.me()
+def me(obo_ws: OboWsDep):
+    return UserOut.model_validate(obo_ws.current_user.me())
 
 
 @api.post(
@@ -27,11 +67,772 @@ def me(obo_ws: Annotated[WorkspaceClient, Depends(get_obo_ws)]):
     response_model=AskResponse,
     operation_id="askGenie",
     summary="Ask Genie a natural language question",
-    description="Sends the question to Genie (NL-to-SQL), returns SQL, columns, data, and a text summary.",
+    description=(
+        "Sends the question to Genie (NL-to-SQL), returns SQL, columns, data, and a text summary. "
+        "First-turn answers are cached per user; set refresh to bypass the cache. Identical questions "
+        "from the same user that arrive while one is in flight share its Genie call. Returns 429 with "
+        "Retry-After when the Genie queue is full, 503 with Retry-After while Genie is failing repeatedly, "
+        "and 504 when there is no answer within the request deadline (timeout_seconds). "
+        "Send Accept: application/vnd.gainwell.columnar+json or application/vnd.apache.arrow.stream "
+        "for a columnar result instead of row JSON."
+    ),
+    responses=NEGOTIATED_RESPONSES,
 )
-def ask_genie_route(body: AskRequest, obo_ws: Annotated[WorkspaceClient, Depends(get_obo_ws)]) -> AskResponse:
-    return ask_genie(
+async def ask_genie_route(
+    request: Request,
+    body: AskRequest,
+    obo_ws: OboWsDep,
+    config: ConfigDep,
+    runtime: RuntimeDep,
+    identity: IdentityDep,
+    accept: Annotated[str | None, Header()] = None,
+) -> AskResponse | Response:
+    deadline = _deadline(config, body)
+    try:
+        async with asyncio.timeout_at(deadline.when):
+            resp = await until_disconnected(request, _ask(body, obo_ws, config, runtime, identity, deadline))
+    except ClientDisconnected:
+        return Response(status_code=499)
+    except QueueFull as e:
+        raise _queue_full(e)
+    except CircuitOpen as e:
+        raise _circuit_open(e)
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e) or f"No answer within the {deadline.seconds:g}s request deadline")
+    if not resp.error and not resp.cached:
+        RESULT_ROWS.observe(resp.total_row_count)
+    return negotiated_response(resp, negotiate(accept))
+
+
+async def _ask(
+    body: AskRequest,
+    obo_ws: "WorkspaceClient",
+    config: ConfigDep,
+    runtime: RuntimeDep,
+    identity: str,
+    deadline: Deadline | None = None,
+    *,
+    batch: bool = False,
+) -> AskResponse:
+    cache_key = None
+    if not body.conversation_id:
+        cache_key = AnswerCache.key(genie_space_id(), body.question, identity)
+        if not body.refresh:
+            hit = runtime.answers.get(cache_key)
+            if hit is not None:
+                return hit.model_copy(update={"question": body.question, "cached": True})
+
+    async def ask(deadline: Deadline | None) -> AskResponse:
+        if cache_key is not None and not body.refresh:
+            reused = await _reuse_similar(body.question, obo_ws, config, runtime, identity)
+            if reused is not None:
+                await _remember(runtime, identity, cache_key, reused)
+                return reused
+        if batch:
+            # A user's batch questions queue apart from their interactive ones, with a wider limit
+            slot = runtime.scheduler.slot(f"{identity}\x1fbatch", max_active=config.genie_batch_max_parallel)
+        else:
+            slot = runtime.scheduler.slot(identity)
+        async with slot:
+            resp = await ask_genie(
+                body.question,
+                conversation_id=body.conversation_id,
+                workspace_client=obo_ws,
+                backoff=_backoff(config),
+                fetch_concurrency=config.genie_attachment_fetch_concurrency,
+                calls=runtime.guard.calls(deadline),
+            )
+        await _remember(runtime, identity, cache_key, resp)
+        return resp
+
+    if cache_key is None or not config.genie_coalesce_in_flight:
+        return await ask(deadline)
+    # The shared call serves callers with different deadlines, so it runs to the server's request deadline
+    # rather than this caller's. Each caller still stops waiting at its own: the routes await _ask inside
+    # timeout_at(deadline.when), and SingleFlight.do shields the call so it goes on for the others.
+    shared_deadline = Deadline.after(config.genie_request_timeout_seconds)
+    resp, shared = await runtime.inflight.do(cache_key, lambda: ask(shared_deadline))
+    if shared:
+        COALESCED_REQUESTS.inc()
+        resp = resp.model_copy(update={"question": body.question})
+    return resp
+
+
+async def _remember(
+    runtime: RuntimeDep, identity: str, cache_key: tuple[str, str, str] | None, resp: AskResponse
+) -> None:
+    """Cache a first-turn answer, index its SQL and add the answer to the user's conversation history."""
+    if cache_key is not None:
+        runtime.answers.put(cache_key, resp)
+    try:
+        await run_blocking(runtime.conversations.record, identity, genie_space_id(), resp)
+        if cache_key is not None and resp.sql and not resp.error and resp.reused_from is None:
+            await run_blocking(
+                runtime.questions.add,
+                _question_scope(runtime.config, identity),
+                resp.question,
+                resp.sql,
+                conversation_id=resp.conversation_id,
+                message_id=resp.message_id,
+            )
+    except sqlite3.Error as e:
+        logger.warning("Storing message %s in the conversation history failed: %s", resp.message_id, e)
+
+
+def _question_scope(config: AppConfig, identity: str) -> str:
+    return genie_space_id() if config.similar_questions_shared else f"{genie_space_id()}\x1f{identity}"
+
+
+async def _reuse_similar(
+    question: str, obo_ws: "WorkspaceClient", config: AppConfig, runtime: RuntimeDep, identity: str
+) -> AskResponse | None:
+    """Answer a first-turn question by re-running the SQL of a near-duplicate earlier question, if enabled.
+
+    Returns None (ask Genie) when nothing scores above the reuse threshold or the statement fails.
+    """
+    from databricks.sdk.errors import DatabricksError
+
+    warehouse = warehouse_id()
+    if config.similar_questions_reuse_threshold is None or not warehouse:
+        return None
+    try:
+        matches = await run_blocking(
+            runtime.questions.similar,
+            _question_scope(config, identity),
+            question,
+            threshold=config.similar_questions_reuse_threshold,
+            limit=1,
+        )
+    except sqlite3.Error as e:
+        logger.warning("Looking up similar questions failed: %s", e)
+        return None
+    if not matches:
+        return None
+    match = matches[0]
+    try:
+        result = await execute_statement(obo_ws, match.sql, warehouse, backoff=_sql_backoff(config))
+        rows = await result.first_rows()
+    except (StatementFailed, TimeoutError, DatabricksError) as e:
+        logger.warning("Re-running the SQL of %r failed, asking Genie instead: %s", match.question, e)
+        return None
+    SIMILAR_REUSED.inc()
+    return AskResponse(
+        question=question,
+        sql=match.sql,
+        columns=result.column_names,
+        column_types=result.column_types,
+        data=rows,
+        row_count=len(rows),
+        total_row_count=result.total_row_count if result.total_row_count is not None else len(rows),
+        statement_id=result.statement_id,
+        reused_from=SimilarQuestion.model_validate(match, from_attributes=True),
+    )
+
+
+def _queue_full(e: QueueFull) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def _circuit_open(e: CircuitOpen) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def _deadline(config: AppConfig, body: AskRequest) -> Deadline:
+    seconds = config.genie_request_timeout_seconds
+    if body.timeout_seconds is not None:
+        seconds = min(seconds, body.timeout_seconds)
+    return Deadline.after(seconds)
+
+
+def _backoff(config: AppConfig) -> PollBackoff:
+    return PollBackoff(
+        initial=config.genie_poll_initial_seconds,
+        maximum=config.genie_poll_max_seconds,
+        multiplier=config.genie_poll_multiplier,
+        timeout=config.genie_timeout_seconds,
+    )
+
+
+def _sql_backoff(config: AppConfig) -> PollBackoff:
+    return PollBackoff(
+        initial=config.sql_poll_initial_seconds,
+        maximum=config.sql_poll_max_seconds,
+        timeout=config.sql_timeout_seconds,
+    )
+
+
+@api.post(
+    "/ask/stream",
+    operation_id="askGenieStream",
+    summary="Ask Genie and stream progress as Server-Sent Events",
+    description=(
+        "Same as /ask, but emits text/event-stream events as Genie progresses: submitted, status, "
+        "sql, text, result, rows (one per result chunk, up to max_rows), then done or error. "
+        "While waiting for a Genie slot it emits queued events with the queue position; "
+        "returns 429 with Retry-After when the queue is full and 503 with Retry-After while Genie is failing "
+        "repeatedly. Genie calls share the request deadline of /ask."
+    ),
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def ask_genie_stream(
+    body: AskRequest,
+    obo_ws: OboWsDep,
+    config: ConfigDep,
+    runtime: RuntimeDep,
+    identity: IdentityDep,
+    max_rows: Annotated[int, Query(ge=0, le=1_000_000)] = 10_000,
+) -> StreamingResponse:
+    cache_key = None
+    if not body.conversation_id:
+        cache_key = AnswerCache.key(genie_space_id(), body.question, identity)
+        hit = None if body.refresh else runtime.answers.get(cache_key)
+        if hit is not None:
+            hit = hit.model_copy(update={"question": body.question, "cached": True})
+            return StreamingResponse(
+                cached_events(hit, max_rows=max_rows), media_type="text/event-stream", headers=SSE_HEADERS
+            )
+    try:
+        runtime.scheduler.check(identity)
+        runtime.guard.breaker.check()
+    except QueueFull as e:
+        raise _queue_full(e)
+    except CircuitOpen as e:
+        raise _circuit_open(e)
+    events = ask_events(
         body.question,
         conversation_id=body.conversation_id,
         workspace_client=obo_ws,
+        backoff=_backoff(config),
+        max_rows=max_rows,
+        fetch_concurrency=config.genie_attachment_fetch_concurrency,
+        on_response=partial(_remember, runtime, identity, cache_key),
+        calls=runtime.guard.calls(_deadline(config, body)),
+    )
+    return StreamingResponse(
+        admitted_events(runtime.scheduler, identity, events), media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+
+async def _ask_batch_item(
+    obo_ws: "WorkspaceClient", config: AppConfig, runtime: RuntimeDep, identity: str, body: AskRequest
+) -> AskResponse:
+    """One question of a batch: like /api/ask, but waits Retry-After instead of failing while Genie is busy."""
+    deadline = _deadline(config, body)
+    try:
+        async with asyncio.timeout_at(deadline.when):
+            while True:
+                try:
+                    return await _ask(body, obo_ws, config, runtime, identity, deadline, batch=True)
+                except (QueueFull, CircuitOpen) as e:
+                    await asyncio.sleep(e.retry_after)
+    except TimeoutError as e:
+        raise deadline.exceeded("The question") from e
+
+
+def _batch_or_404(runtime: RuntimeDep, identity: str, batch_id: str) -> Batch:
+    batch = runtime.batches.get(identity, batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+    return batch
+
+
+@api.post(
+    "/ask/batch",
+    response_model=BatchOut,
+    status_code=202,
+    operation_id="askGenieBatch",
+    summary="Ask Genie a list of questions concurrently",
+    description=(
+        "Starts answering the questions (each an /ask body) at most parallelism at a time and returns the batch "
+        "id with every question queued. Poll /ask/batch/{batch_id} or stream /ask/batch/{batch_id}/stream for "
+        "answers as they finish. Questions go through the answer cache and admission control like /ask; while "
+        "Genie is busy or failing they wait and retry instead of failing. Returns 429 when too many batches "
+        "are running."
+    ),
+)
+async def ask_genie_batch(
+    body: BatchAskRequest,
+    obo_ws: OboWsDep,
+    config: ConfigDep,
+    runtime: RuntimeDep,
+    identity: IdentityDep,
+) -> BatchOut:
+    if len(body.questions) > config.genie_batch_max_questions:
+        raise HTTPException(
+            status_code=422, detail=f"A batch takes at most {config.genie_batch_max_questions} questions"
+        )
+    parallelism = min(body.parallelism or config.genie_batch_max_parallel, config.genie_batch_max_parallel)
+    try:
+        batch = runtime.batches.start(
+            identity, body.questions, parallelism, partial(_ask_batch_item, obo_ws, config, runtime, identity)
+        )
+    except BatchesFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return batch.out()
+
+
+@api.get(
+    "/ask/batch/{batch_id}",
+    response_model=BatchOut,
+    operation_id="getGenieBatch",
+    summary="Status and answers of a batch",
+    description="Every question's status, with its answer once finished. Finished batches expire after a while.",
+)
+async def get_genie_batch(batch_id: str, runtime: RuntimeDep, identity: IdentityDep) -> BatchOut:
+    return _batch_or_404(runtime, identity, batch_id).out()
+
+
+@api.get(
+    "/ask/batch/{batch_id}/stream",
+    operation_id="streamGenieBatch",
+    summary="Stream a batch's answers as Server-Sent Events",
+    description=(
+        "Emits an item event (status and answer) for each question as it finishes, those already finished "
+        "first, then done with the batch summary (without answers)."
+    ),
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def stream_genie_batch(batch_id: str, runtime: RuntimeDep, identity: IdentityDep) -> StreamingResponse:
+    batch = _batch_or_404(runtime, identity, batch_id)
+    return StreamingResponse(batch_events(batch), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@api.delete(
+    "/ask/batch/{batch_id}",
+    response_model=BatchOut,
+    operation_id="cancelGenieBatch",
+    summary="Cancel the questions of a batch that have not finished",
+)
+async def cancel_genie_batch(batch_id: str, runtime: RuntimeDep, identity: IdentityDep) -> BatchOut:
+    batch = _batch_or_404(runtime, identity, batch_id)
+    batch.cancel()
+    await batch.wait()
+    return batch.out()
+
+
+async def _load_result_or_http_error(
+    obo_ws: "WorkspaceClient", conversation_id: str, message_id: str, attachment_id: str | None
+) -> StatementResult:
+    from databricks.sdk.errors import DatabricksError, NotFound, PermissionDenied
+
+    space_id = genie_space_id()
+    if not space_id:
+        raise HTTPException(status_code=503, detail="GENIE_SPACE_ID not set")
+    try:
+        return await load_result(obo_ws, space_id, conversation_id, message_id, attachment_id)
+    except (ResultNotFound, NotFound) as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except PermissionDenied as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except DatabricksError as e:
+        raise HTTPException(status_code=502, detail=f"Genie request failed: {e}")
+
+
+async def _result_page(
+    result: StatementResult, obo_ws: "WorkspaceClient", offset: int, limit: int, **ids: str | None
+) -> ResultPage:
+    from databricks.sdk.errors import DatabricksError
+
+    try:
+        rows = await result.page(obo_ws, offset, limit)
+    except DatabricksError as e:
+        raise HTTPException(status_code=502, detail=f"Result fetch failed: {e}")
+    total = result.total_row_count
+    end = offset + len(rows)
+    has_more = end < total if total is not None else len(rows) == limit
+    return ResultPage(
+        **ids,
+        attachment_id=result.attachment_id,
+        statement_id=result.statement_id,
+        columns=result.column_names,
+        column_types=result.column_types,
+        data=rows,
+        offset=offset,
+        limit=limit,
+        total_row_count=total,
+        next_offset=end if has_more else None,
+    )
+
+
+@api.get(
+    "/results/{conversation_id}/{message_id}",
+    response_model=ResultPage,
+    operation_id="getResultPage",
+    summary="Page through a Genie query result",
+    description=(
+        "Returns rows [offset, offset + limit) of the message's query result, reading only the chunks that cover them. "
+        "Supports the same Accept-based formats as /ask."
+    ),
+    responses=NEGOTIATED_RESPONSES,
+)
+async def result_page(
+    conversation_id: str,
+    message_id: str,
+    obo_ws: OboWsDep,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=10_000)] = 500,
+    attachment_id: str | None = None,
+    accept: Annotated[str | None, Header()] = None,
+) -> ResultPage | Response:
+    result = await _load_result_or_http_error(obo_ws, conversation_id, message_id, attachment_id)
+    page = await _result_page(
+        result, obo_ws, offset, limit, conversation_id=conversation_id, message_id=message_id
+    )
+    return negotiated_response(page, negotiate(accept))
+
+
+@api.get(
+    "/export/{conversation_id}/{message_id}",
+    operation_id="exportResult",
+    summary="Download a full Genie query result",
+    description="Streams the whole result as CSV or Parquet, chunk by chunk, with constant server memory.",
+    response_class=StreamingResponse,
+    responses={200: {"content": {m: {} for m in EXPORT_MEDIA_TYPES.values()}}},
+)
+async def export_result(
+    conversation_id: str,
+    message_id: str,
+    obo_ws: OboWsDep,
+    format: Annotated[Literal["csv", "parquet"], Query()] = "csv",
+    attachment_id: str | None = None,
+) -> StreamingResponse:
+    if format == "parquet":
+        require_pyarrow()
+    result = await _load_result_or_http_error(obo_ws, conversation_id, message_id, attachment_id)
+    stream = stream_parquet if format == "parquet" else stream_csv
+    return StreamingResponse(
+        stream(result, obo_ws),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": content_disposition(f"genie-{message_id}.{format}")},
+    )
+
+
+def _stored_sql(resp: AskResponse | None, attachment_id: str | None) -> tuple[str, str | None] | None:
+    if resp is None:
+        return None
+    for r in resp.results:
+        if r.sql and (attachment_id is None or r.attachment_id == attachment_id):
+            return r.sql, r.attachment_id
+    if resp.sql and attachment_id in (None, resp.attachment_id):
+        return resp.sql, resp.attachment_id
+    return None
+
+
+async def _rerun_sql(
+    obo_ws: "WorkspaceClient", runtime: RuntimeDep, identity: str, body: SqlRerunRequest
+) -> tuple[str, str | None]:
+    """SQL of an earlier answer: from the user's conversation history, else from the Genie message."""
+    from databricks.sdk.errors import DatabricksError, NotFound, PermissionDenied
+
+    try:
+        stored = await run_blocking(runtime.conversations.answer, identity, body.conversation_id, body.message_id)
+    except sqlite3.Error as e:
+        logger.warning("Reading message %s from the conversation history failed: %s", body.message_id, e)
+        stored = None
+    found = _stored_sql(stored, body.attachment_id)
+    if found is not None:
+        return found
+    space_id = genie_space_id()
+    if not space_id:
+        raise HTTPException(status_code=503, detail="GENIE_SPACE_ID not set")
+    try:
+        return await genie_sql(obo_ws, space_id, body.conversation_id, body.message_id, body.attachment_id)
+    except (ResultNotFound, NotFound) as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except PermissionDenied as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except DatabricksError as e:
+        raise HTTPException(status_code=502, detail=f"Genie request failed: {e}")
+
+
+@api.post(
+    "/sql/rerun",
+    response_model=ResultPage,
+    operation_id="rerunSql",
+    summary="Re-run the SQL of an earlier Genie answer on the SQL warehouse",
+    description=(
+        "Runs the answer's SQL again on DATABRICKS_WAREHOUSE_ID as the user, without another NL-to-SQL "
+        "generation, and returns the first page of the fresh result. Page on with /api/sql/statements/{statement_id} "
+        "and download with /api/sql/statements/{statement_id}/export. Returns 504 when the statement does not "
+        "finish within the configured timeout. Supports the same Accept-based formats as /ask."
+    ),
+    responses=NEGOTIATED_RESPONSES,
+)
+async def rerun_sql(
+    body: SqlRerunRequest,
+    obo_ws: OboWsDep,
+    config: ConfigDep,
+    runtime: RuntimeDep,
+    identity: IdentityDep,
+    accept: Annotated[str | None, Header()] = None,
+) -> ResultPage | Response:
+    from databricks.sdk.errors import DatabricksError, PermissionDenied
+
+    warehouse = warehouse_id()
+    if not warehouse:
+        raise HTTPException(status_code=503, detail="DATABRICKS_WAREHOUSE_ID not set")
+    sql, attachment_id = await _rerun_sql(obo_ws, runtime, identity, body)
+    try:
+        result = await execute_statement(obo_ws, sql, warehouse, backoff=_sql_backoff(config), row_limit=body.row_limit)
+    except StatementFailed as e:
+        raise HTTPException(status_code=502, detail=f"Statement failed: {e}")
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except PermissionDenied as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except DatabricksError as e:
+        raise HTTPException(status_code=502, detail=f"Statement request failed: {e}")
+    result.attachment_id = attachment_id
+    page = await _result_page(
+        result, obo_ws, 0, body.limit, conversation_id=body.conversation_id, message_id=body.message_id
+    )
+    RESULT_ROWS.observe(result.total_row_count or 0)
+    return negotiated_response(page, negotiate(accept))
+
+
+async def _load_statement_or_http_error(obo_ws: "WorkspaceClient", statement_id: str) -> StatementResult:
+    from databricks.sdk.errors import DatabricksError, NotFound, PermissionDenied
+
+    try:
+        return await load_statement(obo_ws, statement_id)
+    except (ResultNotFound, NotFound) as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except PermissionDenied as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except DatabricksError as e:
+        raise HTTPException(status_code=502, detail=f"Statement request failed: {e}")
+
+
+@api.get(
+    "/sql/statements/{statement_id}",
+    response_model=ResultPage,
+    operation_id="getStatementPage",
+    summary="Page through the result of a re-run statement",
+    description="Returns rows [offset, offset + limit) of a statement started with /api/sql/rerun.",
+    responses=NEGOTIATED_RESPONSES,
+)
+async def statement_page(
+    statement_id: str,
+    obo_ws: OboWsDep,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=10_000)] = 500,
+    accept: Annotated[str | None, Header()] = None,
+) -> ResultPage | Response:
+    result = await _load_statement_or_http_error(obo_ws, statement_id)
+    page = await _result_page(result, obo_ws, offset, limit)
+    return negotiated_response(page, negotiate(accept))
+
+
+@api.get(
+    "/sql/statements/{statement_id}/export",
+    operation_id="exportStatement",
+    summary="Download the full result of a re-run statement",
+    description="Streams the whole result as CSV or Parquet, chunk by chunk, with constant server memory.",
+    response_class=StreamingResponse,
+    responses={200: {"content": {m: {} for m in EXPORT_MEDIA_TYPES.values()}}},
+)
+async def export_statement(
+    statement_id: str,
+    obo_ws: OboWsDep,
+    format: Annotated[Literal["csv", "parquet"], Query()] = "csv",
+) -> StreamingResponse:
+    if format == "parquet":
+        require_pyarrow()
+    result = await _load_statement_or_http_error(obo_ws, statement_id)
+    stream = stream_parquet if format == "parquet" else stream_csv
+    return StreamingResponse(
+        stream(result, obo_ws),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": content_disposition(f"statement-{statement_id}.{format}")},
+    )
+
+
+@api.post(
+    "/aggregate",
+    response_model=AggregateResponse,
+    operation_id="aggregateResult",
+    summary="Aggregate a Genie query result for charting",
+    description=(
+        "Group-by with sum/count/avg, top-k, and numeric or date binning over the full result, "
+        "computed on the server; returns only the aggregated series."
+    ),
+)
+async def aggregate_result(
+    body: AggregateRequest,
+    obo_ws: OboWsDep,
+    config: ConfigDep,
+) -> AggregateResponse:
+    from databricks.sdk.errors import DatabricksError
+
+    result = await _load_result_or_http_error(obo_ws, body.conversation_id, body.message_id, body.attachment_id)
+    try:
+        agg = Aggregator(body, result.column_names, result.column_types, max_groups=config.aggregate_max_groups)
+        async for rows in result.iter_chunks(obo_ws):
+            await run_blocking(agg.add, rows)
+    except AggregateError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except DatabricksError as e:
+        raise HTTPException(status_code=502, detail=f"Result fetch failed: {e}")
+    keys, values, counts, groups_total = agg.series()
+    return AggregateResponse(
+        group_by=body.group_by,
+        value=body.value,
+        agg=body.agg,
+        keys=keys,
+        values=values,
+        counts=counts,
+        groups_total=groups_total,
+        rows_scanned=agg.rows_scanned,
+    )
+
+
+@api.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    operation_id="metrics",
+    summary="Prometheus metrics",
+    include_in_schema=False,
+)
+async def metrics(runtime: RuntimeDep) -> PlainTextResponse:
+    answers = runtime.answers
+    scheduler = runtime.scheduler
+    extra = (
+        Counter("answer_cache_hits_total", "Answer cache hits.", callback=lambda: answers.stats.hits),
+        Counter("answer_cache_misses_total", "Answer cache misses.", callback=lambda: answers.stats.misses),
+        Counter("answer_cache_evictions_total", "Answer cache evictions.", callback=lambda: answers.stats.evictions),
+        Gauge("answer_cache_bytes", "Estimated answer cache size.", callback=lambda: answers.nbytes),
+        Gauge("blocking_pool_max_threads", "Threads of the pool running blocking SDK calls.", callback=lambda: runtime.executor.max_workers),
+        Gauge("blocking_pool_busy_threads", "Pool threads running a blocking call.", callback=lambda: runtime.executor.busy),
+        Gauge("blocking_pool_queued_calls", "Blocking calls waiting for a free pool thread.", callback=lambda: runtime.executor.queued),
+        Gauge("obo_clients_cached", "Per-user WorkspaceClients in the pool.", callback=lambda: len(runtime.clients)),
+        Gauge("genie_active_questions", "Questions holding a Genie slot.", callback=lambda: scheduler.active),
+        Gauge("genie_queued_questions", "Questions waiting for a Genie slot.", callback=lambda: scheduler.queued),
+        Gauge("genie_questions_in_flight", "Distinct first-turn questions waiting on Genie.", callback=lambda: len(runtime.inflight)),
+        Gauge("genie_batches_running", "Batches with questions still queued or running.", callback=lambda: runtime.batches.running),
+        Gauge("genie_circuit_open", "1 while the Genie circuit breaker rejects calls.", callback=lambda: float(runtime.guard.breaker.state == "open")),
+        Gauge("similar_questions_indexed", "Questions in the near-duplicate index.", callback=lambda: len(runtime.questions)),
+    )
+    body = REGISTRY.render() + "".join(m.render() for m in extra)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@api.get("/cache/stats", response_model=CacheStatsOut, operation_id="cacheStats")
+async def cache_stats(runtime: RuntimeDep) -> CacheStatsOut:
+    answers = runtime.answers
+    return CacheStatsOut(
+        hits=answers.stats.hits,
+        misses=answers.stats.misses,
+        evictions=answers.stats.evictions,
+        entries=len(answers),
+        bytes=answers.nbytes,
+    )
+
+
+@api.get("/ask/queue", response_model=QueueStatusOut, operation_id="askQueueStatus")
+async def ask_queue_status(runtime: RuntimeDep, identity: IdentityDep) -> QueueStatusOut:
+    scheduler = runtime.scheduler
+    return QueueStatusOut(
+        active=scheduler.active,
+        queued=scheduler.queued,
+        max_concurrent=scheduler.max_concurrent,
+        user_active=scheduler.active_for(identity),
+        user_queued=scheduler.queued_for(identity),
+        max_per_user=scheduler.max_per_user,
+        retry_after=scheduler.retry_after(),
+    )
+
+
+@api.get(
+    "/questions/similar",
+    response_model=SimilarQuestionsOut,
+    operation_id="similarQuestions",
+    summary="Earlier questions that are near-duplicates of a question",
+    description=(
+        "Looks the question up in the local index of answered first-turn questions and returns those at or "
+        "above the configured similarity threshold with their SQL, most similar first. Does not call Genie."
+    ),
+)
+async def similar_questions(
+    question: Annotated[str, Query(min_length=1)],
+    config: ConfigDep,
+    runtime: RuntimeDep,
+    identity: IdentityDep,
+    limit: Annotated[int, Query(ge=1, le=50)] = 5,
+) -> SimilarQuestionsOut:
+    matches = await run_blocking(
+        runtime.questions.similar,
+        _question_scope(config, identity),
+        question,
+        threshold=config.similar_questions_threshold,
+        limit=limit,
+    )
+    return SimilarQuestionsOut(
+        question=question, matches=[SimilarQuestion.model_validate(m, from_attributes=True) for m in matches]
+    )
+
+
+def _utc(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+@api.get(
+    "/conversations",
+    response_model=ConversationPage,
+    operation_id="listConversations",
+    summary="List the current user's conversations",
+    description="Most recently updated first, from the server-side history (no Genie call).",
+)
+async def list_conversations(
+    runtime: RuntimeDep,
+    identity: IdentityDep,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=200)] = 50,
+) -> ConversationPage:
+    rows, total = await run_blocking(runtime.conversations.conversations, identity, offset=offset, limit=limit)
+    end = offset + len(rows)
+    return ConversationPage(
+        conversations=[
+            ConversationOut(**{**r, "created_at": _utc(r["created_at"]), "updated_at": _utc(r["updated_at"])})
+            for r in rows
+        ],
+        offset=offset,
+        limit=limit,
+        total=total,
+        next_offset=end if end < total else None,
+    )
+
+
+@api.get(
+    "/conversations/{conversation_id}/messages",
+    response_model=ConversationMessagePage,
+    operation_id="listConversationMessages",
+    summary="Stored answers of one conversation",
+    description=(
+        "Oldest first, from the server-side history (no Genie call). Each answer keeps the first rows of its "
+        "result; page through the full result with /api/results."
+    ),
+)
+async def list_conversation_messages(
+    conversation_id: str,
+    runtime: RuntimeDep,
+    identity: IdentityDep,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=200)] = 50,
+) -> ConversationMessagePage:
+    page = await run_blocking(
+        runtime.conversations.messages, identity, conversation_id, offset=offset, limit=limit
+    )
+    if page is None:
+        raise HTTPException(status_code=404, detail=f"Conversation {conversation_id} not found")
+    messages, total = page
+    end = offset + len(messages)
+    return ConversationMessagePage(
+        conversation_id=conversation_id,
+        messages=[ConversationMessage(created_at=_utc(ts), answer=answer) for ts, answer in messages],
+        offset=offset,
+        limit=limit,
+        total=total,
+        next_offset=end if end < total else None,
     )
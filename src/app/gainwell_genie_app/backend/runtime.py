@@ -1,12 +1,103 @@
-from databricks.sdk import WorkspaceClient
+from __future__ import annotations
 
+import asyncio
+import importlib
+from typing import TYPE_CHECKING
+
+from .admission import GenieScheduler
+from .batches import BatchStore
+from .cache import AnswerCache
+from .clients import WorkspaceClientPool
 from .config import AppConfig
+from .conversations import ConversationStore
+from .logger import logger
+from .models import AskResponse
+from .resilience import CircuitBreaker, GenieGuard, RetryPolicy
+from .similar import QuestionIndex
+from .singleflight import SingleFlight
+from .utils import BlockingExecutor
+
+if TYPE_CHECKING:
+    from databricks.sdk import WorkspaceClient
 
 
 class Runtime:
     def __init__(self, config: AppConfig) -> None:
         self.config = config
+        self.clients = WorkspaceClientPool(
+            max_clients=config.obo_client_cache_size,
+            ttl_seconds=config.obo_client_ttl_seconds,
+            pool_maxsize=config.http_pool_maxsize,
+            retry_timeout_seconds=config.sdk_retry_timeout_seconds,
+        )
+        self.executor = BlockingExecutor(config.blocking_max_threads or 2 * config.http_pool_maxsize)
+        self.answers = AnswerCache(
+            max_entries=config.answer_cache_max_entries,
+            ttl_seconds=config.answer_cache_ttl_seconds,
+            max_bytes=config.answer_cache_max_bytes,
+        )
+        self.conversations = ConversationStore(
+            config.conversation_store_path, max_rows=config.conversation_store_max_rows
+        )
+        self.questions = QuestionIndex(
+            config.similar_questions_path, max_entries=config.similar_questions_max_entries
+        )
+        self.inflight: SingleFlight[AskResponse] = SingleFlight()
+        self.guard = GenieGuard(
+            retry=RetryPolicy(
+                attempts=config.genie_retry_attempts,
+                initial=config.genie_retry_initial_seconds,
+                maximum=config.genie_retry_max_seconds,
+            ),
+            breaker=CircuitBreaker(
+                failures=config.genie_breaker_failures, reset_seconds=config.genie_breaker_reset_seconds
+            ),
+            hedge_quantile=config.genie_hedge_quantile,
+            hedge_min_samples=config.genie_hedge_min_samples,
+        )
+        self.scheduler = GenieScheduler(
+            max_concurrent=config.genie_max_concurrent,
+            max_per_user=config.genie_max_concurrent_per_user,
+            max_queued=config.genie_max_queued,
+            max_queued_per_user=config.genie_max_queued_per_user,
+            max_per_minute=config.genie_max_questions_per_minute,
+        )
+        self.batches = BatchStore(max_batches=config.genie_batch_max_kept, ttl_seconds=config.genie_batch_ttl_seconds)
+        self._sdk: asyncio.Future[object] | None = None
+        self._warmup: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        """Import the Databricks SDK and warm the workspace connection in the background.
+
+        Importing databricks.sdk takes seconds (it loads every service module), so lifespan does not
+        wait for it: the app accepts requests (UI, version, metrics) right away and only routes that
+        need a WorkspaceClient wait for ready().
+        """
+        self._sdk = asyncio.ensure_future(asyncio.to_thread(importlib.import_module, "databricks.sdk"))
+        self._warmup = asyncio.create_task(self._warm())
+
+    async def ready(self) -> None:
+        if self._sdk is None:
+            self.start()
+        assert self._sdk is not None
+        await asyncio.shield(self._sdk)
+
+    async def _warm(self) -> None:
+        try:
+            await self.ready()
+            await asyncio.to_thread(self.clients.warm)
+        except Exception as e:
+            logger.warning("Warming the workspace connection failed (first request will retry): %s", e)
 
     @property
     def ws(self) -> WorkspaceClient:
-        return WorkspaceClient()
+        return self.clients.service_client()
+
+    def close(self) -> None:
+        if self._warmup is not None:
+            self._warmup.cancel()
+        self.batches.close()
+        self.clients.close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.conversations.close()
+        self.questions.close()
@@ -0,0 +1,237 @@
+"""
+Near-duplicate index of past first-turn questions and the SQL Genie generated for them (SQLite).
+
+Paraphrases such as "claims paid by plan" and "paid claims per plan" miss the exact-match answer
+cache. Here a question is reduced to the character 3-grams of its words (lower-cased, a trailing
+plural s and a few filler words dropped, so word order does not matter), summarized by a MinHash
+signature and bucketed by LSH: NUM_BANDS bands of BAND_ROWS signature values, each band hashed to
+one indexed key. A lookup reads only the entries that share a band with the question, so its cost
+does not grow with the index. Candidates are ranked by the signature estimate of their Jaccard
+similarity (vectorized) and only the best few are scored exactly on their 3-gram sets. Words with
+digits (years, ids) must match exactly, so "claims in 2023" never matches "claims in 2024".
+
+Entries are scoped (space id and, unless shared, user); the oldest entries are evicted beyond
+max_entries.
+"""
+import hashlib
+import re
+import sqlite3
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from .cache import normalize_question
+
+NUM_BANDS = 16
+BAND_ROWS = 4
+NUM_PERM = NUM_BANDS * BAND_ROWS
+SHINGLE = 3
+# Candidates screened per lookup, those sharing the most bands first
+MAX_CANDIDATES = 200
+# The signature estimate has a standard error of about 0.06 at 64 values; score exactly within 3 of it,
+# best estimates first, at most max(EXACT_PER_RESULT * limit, MIN_EXACT) candidates
+ESTIMATE_MARGIN = 0.2
+EXACT_PER_RESULT = 4
+MIN_EXACT = 20
+
+_rng = np.random.RandomState(20240917)
+# Multiply-shift hashing: h_i(x) = (a_i * x + b_i) mod 2^64 >> 32, a_i odd
+_A = _rng.randint(1, 2**62, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.randint(0, 2**62, size=NUM_PERM, dtype=np.uint64)
+_WORD = re.compile(r"[0-9a-z]+")
+_STOPWORDS = frozenset("a an the of for in on by per to with and each all show me what is are how many".split())
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scope TEXT NOT NULL,
+    norm TEXT NOT NULL,
+    question TEXT NOT NULL,
+    sql TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    conversation_id TEXT,
+    message_id TEXT,
+    created_at REAL NOT NULL,
+    UNIQUE (scope, norm)
+);
+CREATE TABLE IF NOT EXISTS question_bands (
+    band_key INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    PRIMARY KEY (band_key, question_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS question_bands_by_question ON question_bands (question_id);
+"""
+
+
+@dataclass(frozen=True)
+class SimilarMatch:
+    question: str
+    sql: str
+    score: float
+    conversation_id: str | None
+    message_id: str | None
+
+
+def _words(question: str) -> list[str]:
+    words = []
+    for w in _WORD.findall(normalize_question(question)):
+        if w in _STOPWORDS:
+            continue
+        if len(w) > 3 and w.endswith("s") and not w.endswith("ss") and not w[-2].isdigit():
+            w = w[:-1]
+        words.append(w)
+    return words
+
+
+def shingles(question: str) -> set[str]:
+    """Character 3-grams of each word, padded with spaces so short words still count."""
+    out: set[str] = set()
+    for w in _words(question):
+        padded = f" {w} "
+        out.update(padded[i:i + SHINGLE] for i in range(max(len(padded) - SHINGLE + 1, 1)))
+    return out
+
+
+def _numbers(question: str) -> frozenset[str]:
+    return frozenset(w for w in _words(question) if any(c.isdigit() for c in w))
+
+
+def jaccard(a: set[str], b: set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def signature(grams: set[str]) -> np.ndarray:
+    """MinHash signature (NUM_PERM 32-bit values) of a 3-gram set."""
+    x = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(g.encode(), digest_size=8).digest(), "little") for g in grams),
+        dtype=np.uint64,
+        count=len(grams),
+    )
+    if not len(x):
+        return np.zeros(NUM_PERM, dtype=np.uint32)
+    with np.errstate(over="ignore"):
+        h = (_A[:, None] * x[None, :] + _B[:, None]) >> np.uint64(32)
+    return h.min(axis=1).astype(np.uint32)
+
+
+def band_keys(scope: str, sig: np.ndarray) -> list[int]:
+    """One signed 64-bit key per band (SQLite INTEGER), distinct per scope."""
+    keys = []
+    prefix = scope.encode()
+    for band in range(NUM_BANDS):
+        rows = sig[band * BAND_ROWS:(band + 1) * BAND_ROWS].astype("<u4").tobytes()
+        digest = hashlib.blake2b(prefix + struct.pack("<H", band) + rows, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+class QuestionIndex:
+    def __init__(self, path: str | Path, *, max_entries: int) -> None:
+        self.path = Path(path)
+        self.max_entries = max_entries
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+            self._count = self._db.execute("SELECT count(*) FROM questions").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def add(
+        self,
+        scope: str,
+        question: str,
+        sql: str,
+        *,
+        conversation_id: str | None = None,
+        message_id: str | None = None,
+    ) -> None:
+        """Index a question and its SQL; replaces an earlier entry for the same normalized question."""
+        grams = shingles(question)
+        if not grams:
+            return
+        sig = signature(grams)
+        keys = band_keys(scope, sig)
+        norm = normalize_question(question)
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                old = self._db.execute("SELECT id FROM questions WHERE scope = ? AND norm = ?", (scope, norm)).fetchone()
+                if old is not None:
+                    self._delete([old["id"]])
+                qid = self._db.execute(
+                    "INSERT INTO questions (scope, norm, question, sql, signature, conversation_id, message_id, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (scope, norm, question, sql, sig.astype("<u4").tobytes(), conversation_id, message_id, time.time()),
+                ).lastrowid
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO question_bands (band_key, question_id) VALUES (?, ?)",
+                    [(k, qid) for k in keys],
+                )
+                self._count += 1
+                if self._count > self.max_entries:
+                    # Evict in batches of about 1% so a full index does not delete on every insert
+                    n = self._count - self.max_entries + max(self.max_entries // 100, 1) - 1
+                    ids = [r[0] for r in self._db.execute("SELECT id FROM questions ORDER BY id LIMIT ?", (n,))]
+                    self._delete(ids)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                self._count = self._db.execute("SELECT count(*) FROM questions").fetchone()[0]
+                raise
+
+    def _delete(self, ids: list[int]) -> None:
+        # Caller holds the lock inside a transaction.
+        marks = ",".join("?" * len(ids))
+        self._db.execute(f"DELETE FROM question_bands WHERE question_id IN ({marks})", ids)
+        self._db.execute(f"DELETE FROM questions WHERE id IN ({marks})", ids)
+        self._count -= len(ids)
+
+    def similar(self, scope: str, question: str, *, threshold: float, limit: int = 5) -> list[SimilarMatch]:
+        """Indexed questions with similarity >= threshold, most similar first."""
+        grams = shingles(question)
+        if not grams:
+            return []
+        sig = signature(grams)
+        keys = band_keys(scope, sig)
+        numbers = _numbers(question)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT q.question, q.sql, q.signature, q.conversation_id, q.message_id FROM questions q JOIN ("
+                f" SELECT question_id, count(*) AS bands FROM question_bands WHERE band_key IN ({','.join('?' * len(keys))})"
+                " GROUP BY question_id ORDER BY bands DESC, question_id DESC LIMIT ?"
+                ") c ON q.id = c.question_id",
+                (*keys, MAX_CANDIDATES),
+            ).fetchall()
+        if not rows:
+            return []
+        sigs = np.frombuffer(b"".join(r["signature"] for r in rows), dtype="<u4").reshape(len(rows), NUM_PERM)
+        estimates = (sigs == sig).mean(axis=1)
+        budget = max(EXACT_PER_RESULT * limit, MIN_EXACT)
+        matches = []
+        for i in np.argsort(-estimates, kind="stable"):
+            if estimates[i] < threshold - ESTIMATE_MARGIN or budget == 0:
+                break
+            r = rows[i]
+            if _numbers(r["question"]) != numbers:
+                continue
+            budget -= 1
+            score = jaccard(grams, shingles(r["question"]))
+            if score >= threshold:
+                matches.append(SimilarMatch(r["question"], r["sql"], round(score, 4), r["conversation_id"], r["message_id"]))
+        matches.sort(key=lambda m: m.score, reverse=True)
+        return matches[:limit]
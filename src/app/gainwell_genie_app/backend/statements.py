@@ -0,0 +1,133 @@
+"""
+Re-running Genie-generated SQL directly on the SQL warehouse (Statement Execution API, OBO).
+
+A refresh or a different page size then costs only query time, not another NL-to-SQL generation.
+Statements are submitted asynchronously (wait_timeout=0s) and polled with asyncio.sleep, like Genie
+messages. Results use the EXTERNAL_LINKS disposition (no 25 MiB inline limit) in ARROW_STREAM format
+when pyarrow is installed, JSON_ARRAY otherwise, and are read through results.StatementResult, so the
+paging and export code serves them exactly like Genie attachment results.
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import os
+from typing import TYPE_CHECKING
+
+from .genie_client import PollBackoff
+from .logger import logger
+from .metrics import stage
+from .results import ResultNotFound, StatementResult
+from .utils import run_blocking
+
+if TYPE_CHECKING:
+    from databricks.sdk import WorkspaceClient
+    from databricks.sdk.service.sql import StatementResponse
+
+_PENDING_STATES = ("PENDING", "RUNNING")
+# Cancellations sent in the background; the event loop only keeps weak references to tasks
+_cancelling: set[asyncio.Task[None]] = set()
+
+
+class StatementFailed(RuntimeError):
+    """The warehouse reported FAILED, CANCELED or CLOSED for the statement."""
+
+
+def warehouse_id() -> str:
+    return os.environ.get("DATABRICKS_WAREHOUSE_ID", "").strip()
+
+
+def result_format() -> str:
+    return "ARROW_STREAM" if importlib.util.find_spec("pyarrow") is not None else "JSON_ARRAY"
+
+
+def _state(stmt: StatementResponse) -> str | None:
+    return stmt.status.state.value if stmt.status and stmt.status.state else None
+
+
+def _error(stmt: StatementResponse) -> str:
+    err = stmt.status.error if stmt.status else None
+    return (err.message if err and err.message else None) or f"statement {_state(stmt)}"
+
+
+async def execute_statement(
+    w: WorkspaceClient,
+    sql: str,
+    warehouse: str,
+    *,
+    backoff: PollBackoff,
+    row_limit: int | None = None,
+) -> StatementResult:
+    """Run sql on the warehouse and wait for it; raises StatementFailed or TimeoutError.
+
+    The statement is cancelled when it times out or the caller is cancelled.
+    """
+    from databricks.sdk.service.sql import Disposition, ExecuteStatementRequestOnWaitTimeout, Format
+
+    with stage("execution"):
+        stmt = await run_blocking(
+            w.statement_execution.execute_statement,
+            statement=sql,
+            warehouse_id=warehouse,
+            disposition=Disposition.EXTERNAL_LINKS,
+            format=Format(result_format()),
+            wait_timeout="0s",
+            on_wait_timeout=ExecuteStatementRequestOnWaitTimeout.CONTINUE,
+            row_limit=row_limit,
+        )
+        try:
+            stmt = await _wait(w, stmt, backoff)
+        except (asyncio.CancelledError, TimeoutError):
+            if stmt.statement_id:
+                task = asyncio.ensure_future(_cancel(w, stmt.statement_id))
+                _cancelling.add(task)
+                task.add_done_callback(_cancelling.discard)
+            raise
+    return StatementResult.from_statement(stmt)
+
+
+async def _wait(w: WorkspaceClient, stmt: StatementResponse, backoff: PollBackoff) -> StatementResponse:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + backoff.timeout
+    for delay in backoff.delays():
+        state = _state(stmt)
+        if state == "SUCCEEDED":
+            return stmt
+        if state not in _PENDING_STATES:
+            raise StatementFailed(_error(stmt))
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        await asyncio.sleep(min(delay, remaining))
+        stmt = await run_blocking(w.statement_execution.get_statement, stmt.statement_id)
+    raise TimeoutError(f"statement {stmt.statement_id} still {_state(stmt)} after {backoff.timeout}s")
+
+
+async def _cancel(w: WorkspaceClient, statement_id: str) -> None:
+    try:
+        await run_blocking(w.statement_execution.cancel_execution, statement_id)
+    except Exception as e:
+        logger.warning("Cancelling statement %s failed: %s", statement_id, e)
+
+
+async def genie_sql(
+    w: WorkspaceClient, space_id: str, conversation_id: str, message_id: str, attachment_id: str | None = None
+) -> tuple[str, str | None]:
+    """(SQL, attachment id) of a message's query attachment, the first one unless attachment_id is given."""
+    msg = await run_blocking(
+        w.genie.get_message, space_id=space_id, conversation_id=conversation_id, message_id=message_id
+    )
+    for att in msg.attachments or []:
+        query = getattr(att, "query", None)
+        att_id = att.attachment_id or (query.id if query else None)
+        if query and query.query and (attachment_id is None or att_id == attachment_id):
+            return query.query, att_id
+    raise ResultNotFound(f"message {message_id} has no query attachment {attachment_id or ''}".rstrip())
+
+
+async def load_statement(w: WorkspaceClient, statement_id: str) -> StatementResult:
+    """Result of a finished statement, for paging or export (fresh external links on every call)."""
+    stmt = await run_blocking(w.statement_execution.get_statement, statement_id)
+    if _state(stmt) != "SUCCEEDED":
+        raise ResultNotFound(f"statement {statement_id} has no result ({_state(stmt)})")
+    return StatementResult.from_statement(stmt)
@@ -0,0 +1,185 @@
+"""
+Static UI serving from memory.
+
+The build output is small (well under a few MB), so every file is read once at startup and served
+from memory with a strong ETag:
+
+- content-hashed build assets (assets/name-<hash>.js) are immutable and cached for a year;
+- everything else, index.html included, is revalidated on each use (304 when the ETag matches).
+
+Compressible files are sent as brotli or gzip according to Accept-Encoding. Precompressed .br/.gz
+files next to the originals are used when present (write them at build time with
+`python -m gainwell_genie_app.backend.static`); otherwise each variant is compressed on first use and
+kept. Brotli needs the optional brotli package.
+"""
+import gzip
+import hashlib
+import mimetypes
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from fastapi.responses import Response
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.types import Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Vite names chunks <name>-<8 char base64url hash>.<ext>
+_HASHED = re.compile(r"-[A-Za-z0-9_-]{8}\.[a-z0-9]+$")
+_COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/wasm")
+_MIN_COMPRESS_BYTES = 1024
+_SUFFIX = {"br": ".br", "gzip": ".gz"}
+
+
+def _compress(encoding: str, data: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def accepted_encodings(accept_encoding: str | None) -> list[str]:
+    """Encodings from an Accept-Encoding header that this server can produce, best first."""
+    q: dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        weight = 1.0
+        k, _, v = params.strip().partition("=")
+        if k.strip() == "q":
+            try:
+                weight = float(v)
+            except ValueError:
+                weight = 0.0
+        if name:
+            q[name] = weight
+    wildcard = q.get("*", 0.0)
+    available = ["br", "gzip"] if brotli is not None else ["gzip"]
+    ranked = [(q.get(e, wildcard), -i, e) for i, e in enumerate(available)]
+    return [e for weight, _, e in sorted(ranked, reverse=True) if weight > 0]
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+@dataclass
+class StaticFile:
+    path: Path
+    body: bytes
+    media_type: str
+    cache_control: str
+    digest: str
+    variants: dict[str, bytes] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def compressible(self) -> bool:
+        return len(self.body) >= _MIN_COMPRESS_BYTES and self.media_type.startswith(_COMPRESSIBLE)
+
+    def etag(self, encoding: str | None) -> str:
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def variant(self, encoding: str) -> bytes:
+        with self._lock:
+            data = self.variants.get(encoding)
+            if data is None:
+                sidecar = self.path.with_name(self.path.name + _SUFFIX[encoding])
+                # A sidecar older than its file is left over from an earlier build
+                fresh = sidecar.is_file() and sidecar.stat().st_mtime >= self.path.stat().st_mtime
+                data = sidecar.read_bytes() if fresh else _compress(encoding, self.body)
+                self.variants[encoding] = data
+            return data
+
+    def response(self, accept_encoding: str | None, if_none_match: str | None, *, head: bool = False) -> Response:
+        encoding = None
+        if self.compressible:
+            encoding = next(iter(accepted_encodings(accept_encoding)), None)
+        etag = self.etag(encoding)
+        headers = {"ETag": etag, "Cache-Control": self.cache_control}
+        if self.compressible:
+            headers["Vary"] = "Accept-Encoding"
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        body = self.variant(encoding) if encoding else self.body
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        headers["Content-Length"] = str(len(body))
+        return Response(b"" if head else body, media_type=self.media_type, headers=headers)
+
+
+class StaticUI:
+    """ASGI app serving the built UI from memory; unknown paths raise 404 for the not-found handler."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.files: dict[str, StaticFile] = {}
+        for path in sorted(p for p in directory.rglob("*") if p.is_file()):
+            if path.suffix in (".br", ".gz") and path.with_suffix("").is_file():
+                continue
+            rel = path.relative_to(directory).as_posix()
+            body = path.read_bytes()
+            media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            if media_type.startswith("text/") or media_type == "application/javascript":
+                media_type += "; charset=utf-8"
+            self.files["/" + rel] = StaticFile(
+                path=path,
+                body=body,
+                media_type=media_type,
+                cache_control=IMMUTABLE if _HASHED.search(path.name) else REVALIDATE,
+                digest=hashlib.sha256(body).hexdigest()[:32],
+            )
+
+    @property
+    def index(self) -> StaticFile | None:
+        return self.files.get("/index.html")
+
+    def precompress(self) -> None:
+        """Compute every compressed variant now rather than on first request."""
+        for f in self.files.values():
+            if f.compressible:
+                for encoding in accepted_encodings("br, gzip"):
+                    f.variant(encoding)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["method"] not in ("GET", "HEAD"):
+            raise StarletteHTTPException(status_code=405)
+        path: str = scope["path"]
+        root_path: str = scope.get("root_path", "")
+        if root_path and path.startswith(root_path + "/"):
+            path = path[len(root_path):]
+        f = self.files.get(path)
+        if f is None:
+            raise StarletteHTTPException(status_code=404)
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        response = f.response(headers.get("accept-encoding"), headers.get("if-none-match"), head=scope["method"] == "HEAD")
+        await response(scope, receive, send)
+
+
+def write_precompressed(directory: Path) -> list[Path]:
+    """Write .gz (and .br with brotli installed) next to every compressible build file."""
+    written = []
+    for f in StaticUI(directory).files.values():
+        if not f.compressible:
+            continue
+        for encoding in accepted_encodings("br, gzip"):
+            out = f.path.with_name(f.path.name + _SUFFIX[encoding])
+            out.write_bytes(_compress(encoding, f.body))
+            written.append(out)
+    return written
+
+
+if __name__ == "__main__":
+    from .._metadata import dist_dir
+
+    for p in write_precompressed(dist_dir):
+        print(p.relative_to(dist_dir), p.stat().st_size)
@@ -0,0 +1,136 @@
+"""
+Server-Sent Events for /api/ask/stream.
+
+Events (each data payload is JSON):
+- queued: 1-based position in the Genie admission queue, whenever it changes (only if the question
+  had to wait)
+- submitted: conversation_id, message_id as soon as Genie accepted the question
+- status: every Genie status transition (FILTERING_CONTEXT, ASKING_AI, EXECUTING_QUERY, ...)
+- sql / text: generated SQL and text attachments as soon as they appear
+- result: the AskResponse without top-level data (columns, types, total_row_count, ids, all
+  attachment results)
+- rows: offset + data of the primary result, one event per result chunk, up to max_rows
+- done: the same summary once all rows were sent; error: failure details (last event), with
+  retry_after when the Genie queue is full or the circuit breaker is open
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable
+
+from pydantic_core import to_json
+
+from .admission import GenieScheduler, QueueFull
+from .genie_client import (
+    PollBackoff,
+    StageClock,
+    build_response,
+    error_text,
+    fetch_results,
+    genie_space_id,
+    message_status,
+    not_configured_response,
+    parse_attachments,
+    poll_message,
+    primary_result,
+    submit_question,
+)
+from .metrics import stage
+from .models import AskResponse
+from .resilience import UNGUARDED, CircuitOpen, GuardedCalls
+
+if TYPE_CHECKING:
+    from databricks.sdk import WorkspaceClient
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse(event: str, data: object) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + to_json(data, fallback=str) + b"\n\n"
+
+
+def _summary(resp: AskResponse) -> dict:
+    return resp.model_dump(exclude={"data": True, "results": {"__all__": {"data"}}})
+
+
+async def cached_events(resp: AskResponse, *, max_rows: int) -> AsyncIterator[bytes]:
+    yield sse("result", _summary(resp))
+    if resp.data:
+        yield sse("rows", {"offset": 0, "data": resp.data[:max_rows]})
+    yield sse("done", _summary(resp))
+
+
+async def admitted_events(scheduler: GenieScheduler, user: str, events: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Queue for a Genie slot (reporting the position), then pass events through while holding it."""
+    try:
+        ticket = scheduler.enqueue(user)
+    except QueueFull as e:
+        yield sse("error", {"error": str(e), "retry_after": e.retry_after})
+        return
+    try:
+        async for position in ticket.positions():
+            yield sse("queued", {"position": position})
+        async for chunk in events:
+            yield chunk
+    finally:
+        ticket.release()
+
+
+async def ask_events(
+    question: str,
+    conversation_id: str | None = None,
+    *,
+    workspace_client: WorkspaceClient,
+    backoff: PollBackoff,
+    max_rows: int,
+    fetch_concurrency: int = 4,
+    on_response: Callable[[AskResponse], Awaitable[None]] | None = None,
+    calls: GuardedCalls = UNGUARDED,
+) -> AsyncIterator[bytes]:
+    space_id = genie_space_id()
+    if not space_id:
+        resp = not_configured_response(question)
+        yield sse("error", {"error": resp.error, "text_response": resp.text_response})
+        return
+    w = workspace_client
+    try:
+        with stage("submit"):
+            conv_id, message_id = await submit_question(w, space_id, question, conversation_id, calls=calls)
+        yield sse("submitted", {"conversation_id": conv_id, "message_id": message_id})
+        status = sql = text = None
+        msg = None
+        clock = StageClock()
+        async for msg in poll_message(w, space_id, conv_id, message_id, backoff=backoff, calls=calls):
+            clock.observe(msg)
+            if message_status(msg) != status:
+                status = message_status(msg)
+                yield sse("status", {"status": status})
+            new_sql, new_text = parse_attachments(msg)
+            if new_sql and new_sql != sql:
+                sql = new_sql
+                yield sse("sql", {"sql": sql})
+            if new_text and new_text != text:
+                text = new_text
+                yield sse("text", {"text": text})
+        clock.finish()
+        assert msg is not None
+        fetched = await fetch_results(w, space_id, msg, concurrency=fetch_concurrency, calls=calls)
+        resp = await build_response(question, msg, fetched, conv_id)
+        result = primary_result(fetched)
+        yield sse("result", _summary(resp))
+        if result is not None:
+            offset = 0
+            async for rows in result.iter_chunks(w):
+                rows = rows[: max_rows - offset]
+                if rows:
+                    yield sse("rows", {"offset": offset, "data": rows})
+                offset += len(rows)
+                if offset >= max_rows:
+                    break
+        if on_response is not None:
+            await on_response(resp)
+        yield sse("done", _summary(resp))
+    except CircuitOpen as e:
+        yield sse("error", {"error": str(e), "retry_after": e.retry_after})
+    except Exception as e:
+        err_msg = str(e)
+        yield sse("error", {"error": err_msg, "text_response": error_text(err_msg)})
@@ -1,9 +1,16 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
 from fastapi import FastAPI, Request
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
-from .._metadata import api_prefix, dist_dir
+from .._metadata import api_prefix
 from .logger import logger
+from .metrics import BLOCKING_IN_FLIGHT
+from .static import StaticUI
 
 
 _UI_MISSING_HTML = (
@@ -13,7 +20,51 @@ _UI_MISSING_HTML = (
 )
 
 
-def add_not_found_handler(app: FastAPI):
+class BlockingExecutor(ThreadPoolExecutor):
+    """The event loop's default executor (run_blocking, asyncio.to_thread), sized for SDK requests.
+
+    asyncio's own default caps at min(32, cpus + 4) threads, fewer than the shared connection pool
+    serves; this one also counts busy threads and calls waiting for one, for /api/metrics.
+    """
+
+    def __init__(self, max_workers: int) -> None:
+        super().__init__(max_workers=max_workers, thread_name_prefix="blocking")
+        self.max_workers = max_workers
+        self.busy = 0
+        self.queued = 0
+        self._counts = threading.Lock()
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        with self._counts:
+            self.queued += 1
+        future = super().submit(self._call, fn, args, kwargs)
+        # A call cancelled while still queued never runs
+        future.add_done_callback(lambda f: f.cancelled() and self._count(queued=-1))
+        return future
+
+    def _call(self, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        self._count(queued=-1, busy=1)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._count(busy=-1)
+
+    def _count(self, *, queued: int = 0, busy: int = 0) -> None:
+        with self._counts:
+            self.queued += queued
+            self.busy += busy
+
+
+async def run_blocking(fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Any:
+    """Run one blocking SDK request in a worker thread (BlockingExecutor); the thread is held only for that request."""
+    BLOCKING_IN_FLIGHT.inc()
+    try:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    finally:
+        BLOCKING_IN_FLIGHT.dec()
+
+
+def add_not_found_handler(app: FastAPI, ui: StaticUI | None = None):
     async def http_exception_handler(request: Request, exc: StarletteHTTPException):
         logger.info(
             "HTTP exception handler called for request %s with status code %s",
@@ -26,11 +77,11 @@ def add_not_found_handler(app: FastAPI):
             is_api = path.startswith(api_prefix)
             is_get_page_nav = request.method == "GET" and "text/html" in accept
             looks_like_asset = "." in path.split("/")[-1]
-            index_html = dist_dir / "index.html"
+            index = ui.index if ui is not None else None
             if (not is_api) and is_get_page_nav and not looks_like_asset:
-                if index_html.exists():
-                    return FileResponse(index_html)
+                if index is not None:
+                    return index.response(request.headers.get("accept-encoding"), request.headers.get("if-none-match"))
                 return HTMLResponse(_UI_MISSING_HTML, status_code=503)
-        return JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
+        return JSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers)
 
     app.exception_handler(StarletteHTTPException)(http_exception_handler)
@@ -12,5 +12,10 @@ setup(
         "uvicorn>=0.37.0",
         "databricks-sdk>=0.74.0",
         "python-dotenv>=1.0.0",
+        "numpy>=1.26.0",
     ],
+    extras_require={
+        "arrow": ["pyarrow>=15.0.0"],
+        "brotli": ["brotli>=1.1.0"],
+    },
 )
@@ -0,0 +1,101 @@
+"""Admission control: concurrency limits, round-robin across users, QueueFull with Retry-After."""
+import asyncio
+
+import pytest
+
+from gainwell_genie_app.backend.admission import GenieScheduler, QueueFull
+
+
+def scheduler(**limits) -> GenieScheduler:
+    return GenieScheduler(**{"max_concurrent": 1, "max_per_user": 1, "max_queued": 16, "max_queued_per_user": 8, **limits})
+
+
+def test_users_are_admitted_round_robin():
+    async def run():
+        s = scheduler()
+        held = s.enqueue("alice")
+        alice = [s.enqueue("alice") for _ in range(3)]
+        bob = s.enqueue("bob")
+        position = bob.position
+        order = []
+        current = held
+        for _ in range(4):
+            current.release()
+            current = next(t for t in alice + [bob] if t.granted and t not in order)
+            order.append(current)
+        return held, position, [(t.user, alice.index(t) if t in alice else 0) for t in order]
+
+    held, position, order = asyncio.run(run())
+    assert held.granted
+    # bob waits behind one of alice's questions, not all three
+    assert position == 2
+    assert order == [("alice", 0), ("bob", 0), ("alice", 1), ("alice", 2)]
+
+
+def test_per_user_limit_leaves_room_for_others():
+    async def run():
+        s = scheduler(max_concurrent=4, max_per_user=2)
+        alice = [s.enqueue("alice") for _ in range(3)]
+        bob = s.enqueue("bob")
+        batch = [s.enqueue("alice-batch", max_active=3) for _ in range(3)]
+        return s, alice, bob, batch
+
+    s, alice, bob, batch = asyncio.run(run())
+    assert [t.granted for t in alice] == [True, True, False]
+    assert bob.granted
+    # The fourth slot goes to the batch queue, whose own limit is wider
+    assert [t.granted for t in batch] == [True, False, False]
+    assert (s.active, s.queued, s.active_for("alice"), s.queued_for("alice")) == (4, 3, 2, 1)
+
+
+def test_full_queue_rejects_with_retry_after():
+    async def run():
+        s = scheduler(max_queued=2, max_queued_per_user=1)
+        s.enqueue("alice")
+        s.enqueue("alice")
+        with pytest.raises(QueueFull, match="maximum number of questions waiting") as per_user:
+            s.enqueue("alice")
+        s.enqueue("bob")
+        with pytest.raises(QueueFull, match="too many questions are waiting") as total:
+            s.enqueue("carol")
+        return s, per_user.value, total.value
+
+    s, per_user, total = asyncio.run(run())
+    # One slot, 10s per question until measured: the caller's turn comes after everyone queued
+    assert per_user.retry_after == 20
+    assert total.retry_after == 30
+    assert s.retry_after() == 30
+    s.max_per_minute = 3
+    assert s.retry_after() == 60
+
+
+def test_retry_after_follows_measured_hold_times():
+    async def run():
+        s = scheduler(max_concurrent=2)
+        for _ in range(20):
+            async with s.slot("alice"):
+                pass
+        return s
+
+    s = asyncio.run(run())
+    # Holds shorter than 0.1s count as 0.1s: about 20 questions per second on two slots
+    assert s.retry_after() == 1
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        s = scheduler()
+        held = s.enqueue("alice")
+        waiting = asyncio.create_task(s.slot("bob").__aenter__())
+        await asyncio.sleep(0)
+        assert s.queued_for("bob") == 1
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        queued = s.queued
+        held.release()
+        return s, queued
+
+    s, queued = asyncio.run(run())
+    assert queued == 0
+    assert (s.active, s.queued) == (0, 0)
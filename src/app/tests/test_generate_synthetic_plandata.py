@@ -0,0 +1,81 @@
+"""A small --output parquet load of scripts/generate_synthetic_plandata.py, then a daily --delta on top."""
+import importlib.util
+import sys
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("faker")
+pa = pytest.importorskip("pyarrow")
+import pyarrow.compute as pc  # noqa: E402
+import pyarrow.dataset as ds  # noqa: E402
+import pyarrow.parquet as pq  # noqa: E402
+
+SCRIPT = Path(__file__).resolve().parents[3] / "scripts" / "generate_synthetic_plandata.py"
+SCALE = "0.1"  # 350 claims, 200 enrollments, 80 members
+
+
+@pytest.fixture(scope="module")
+def gen():
+    spec = importlib.util.spec_from_file_location("generate_synthetic_plandata", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    yield module
+    del sys.modules[spec.name]
+
+
+def read(root: Path, table: str):
+    spec = {"claim": "claim_month"}.get(table)
+    partitioning = ds.partitioning(pa.schema([(spec, pa.string())]), flavor="hive") if spec else None
+    return ds.dataset(root / table, format="parquet", partitioning=partitioning).to_table()
+
+
+def latest(table, key: str) -> dict[str, dict]:
+    rows = table.sort_by([(key, "ascending"), ("lastupdate", "ascending")]).to_pylist()
+    return {r[key]: r for r in rows}
+
+
+def test_parquet_load_then_delta(gen, tmp_path):
+    common = ["--output", "parquet", "--output-dir", str(tmp_path), "--scale-factor", SCALE, "--workers", "1"]
+    gen.main(common)
+    output = gen.ParquetOutput(tmp_path, row_group_rows=1 << 20, compression="zstd")
+    counts = gen.scaled_counts(float(SCALE))
+    for table, (key, prefix) in gen.KEYS.items():
+        assert output.key_count(table, key, prefix) == counts[table]
+    months = list((tmp_path / "claim").iterdir())
+    assert months and all(p.name.startswith("claim_month=") for p in months)
+    before = latest(read(tmp_path, "claim"), "claimid")
+    assert len(before) == counts["claim"]
+
+    day = date.today().isoformat()
+    gen.main(common + ["--delta", "--as-of", day, "--new-claims", "20", "--resolved-claims", "5",
+                       "--new-enrollments", "4", "--terminations", "3"])
+
+    # The delta is appended beside the full load, never rewriting it
+    assert (tmp_path / "enrollkeys" / f"delta-{day}.parquet").exists()
+    assert pq.read_metadata(tmp_path / "enrollkeys" / "part-00000.parquet").num_rows == counts["enrollkeys"]
+    assert list((tmp_path / "claim").glob(f"claim_month=*/delta-{day}.parquet"))
+    assert output.key_count("claim", "claimid", "CLM") == counts["claim"] + 20
+    assert output.key_count("enrollkeys", "enrollid", "E") == counts["enrollkeys"] + 4
+    assert output.key_count("member", "memid", "M") == counts["member"]
+
+    claims = read(tmp_path, "claim")
+    after = latest(claims, "claimid")
+    added = set(after) - set(before)
+    assert len(added) == 20
+    changed = [k for k in before if after[k]["lastupdate"] != before[k]["lastupdate"]]
+    assert len(changed) == 5
+    assert all(before[k]["status"] == "pending" and after[k]["status"] in ("paid", "denied") for k in changed)
+    # Every row the delta wrote is stamped during that day, and points at existing members and enrollments
+    members = set(read(tmp_path, "member")["memid"].to_pylist())
+    enrollments = set(read(tmp_path, "enrollkeys")["enrollid"].to_pylist())
+    for k in added | set(changed):
+        assert after[k]["lastupdate"].date().isoformat() == day
+        assert after[k]["memid"] in members and after[k]["enrollid"] in enrollments
+
+    delta = pq.read_table(tmp_path / "enrollkeys" / f"delta-{day}.parquet")
+    assert delta.num_rows == 4 + 3
+    assert pc.sum(pc.is_valid(delta["termdate"])).as_py() == 3
+    assert len(latest(read(tmp_path, "enrollkeys"), "enrollid")) == counts["enrollkeys"] + 4
@@ -0,0 +1,58 @@
+"""Circuit breaker state changes: closed, open after consecutive failures, half-open probe."""
+import time
+
+import pytest
+
+from gainwell_genie_app.backend.resilience import CircuitBreaker, CircuitOpen
+
+RESET = 0.05
+
+
+def wait_for_reset() -> None:
+    time.sleep(RESET * 1.5)
+
+
+def test_opens_after_consecutive_failures_only():
+    breaker = CircuitBreaker(failures=3, reset_seconds=RESET)
+    for ok in (False, False, True, False, False):
+        breaker.record(ok, breaker.acquire())
+    assert breaker.state == "closed"
+    assert breaker.retry_after() == 0
+    breaker.record(False, breaker.acquire())
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen) as e:
+        breaker.check()
+    assert e.value.retry_after == 1
+    with pytest.raises(CircuitOpen):
+        breaker.acquire()
+
+
+def test_half_open_admits_one_probe():
+    breaker = CircuitBreaker(failures=1, reset_seconds=RESET)
+    breaker.record(False, breaker.acquire())
+    wait_for_reset()
+    assert breaker.state == "half_open"
+    breaker.check()  # does not take the probe
+    assert breaker.acquire() is True
+    with pytest.raises(CircuitOpen):
+        breaker.acquire()
+    # A probe that ended without an answer (cancelled, deadline) frees the probe, state unchanged
+    breaker.release(True)
+    assert breaker.state == "half_open"
+    assert breaker.acquire() is True
+
+
+def test_failed_probe_reopens_and_successful_probe_closes():
+    breaker = CircuitBreaker(failures=2, reset_seconds=RESET)
+    breaker.record(False, breaker.acquire())
+    breaker.record(False, breaker.acquire())
+    wait_for_reset()
+    breaker.record(False, breaker.acquire())
+    assert breaker.state == "open"
+    wait_for_reset()
+    breaker.record(True, breaker.acquire())
+    assert breaker.state == "closed"
+    assert breaker.acquire() is False
+    # Closed again: the failure count started over
+    breaker.record(False, breaker.acquire())
+    assert breaker.state == "closed"
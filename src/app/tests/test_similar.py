@@ -0,0 +1,49 @@
+"""Near-duplicate question index: paraphrases match, numbers must match exactly, scopes stay apart."""
+import pytest
+
+from gainwell_genie_app.backend.similar import QuestionIndex
+
+SQL = "SELECT planid, sum(totalpaid) FROM claim WHERE status = 'paid' AND year(startdate) = 2024 GROUP BY planid"
+
+
+@pytest.fixture
+def index():
+    idx = QuestionIndex(":memory:", max_entries=100)
+    idx.add("space", "Claims paid by plan in 2024", SQL, conversation_id="c1", message_id="m1")
+    yield idx
+    idx.close()
+
+
+def test_paraphrase_matches(index):
+    [match] = index.similar("space", "paid claims per plan in 2024", threshold=0.6)
+    assert match.question == "Claims paid by plan in 2024"
+    assert match.sql == SQL
+    assert match.score >= 0.6
+    assert (match.conversation_id, match.message_id) == ("c1", "m1")
+
+
+@pytest.mark.parametrize("question", ["paid claims per plan in 2023", "paid claims per plan", "paid claims per plan in 2024 q1"])
+def test_numbers_must_match_exactly(index, question):
+    assert index.similar("space", question, threshold=0.3) == []
+
+
+def test_scopes_are_separate(index):
+    assert index.similar("other space", "Claims paid by plan in 2024", threshold=0.6) == []
+
+
+def test_same_question_replaces_the_entry(index):
+    index.add("space", "claims paid by plan in 2024?", "SELECT 2")
+    assert len(index) == 1
+    [match] = index.similar("space", "Claims paid by plan in 2024", threshold=0.9)
+    assert match.sql == "SELECT 2"
+    assert match.score == 1.0
+
+
+def test_oldest_entries_are_evicted():
+    index = QuestionIndex(":memory:", max_entries=10)
+    for i in range(25):
+        index.add("space", f"members enrolled in plan PLAN{i:05d}", f"SELECT {i}")
+    assert len(index) <= 10
+    assert index.similar("space", "members enrolled in plan PLAN00000", threshold=0.9) == []
+    [match] = index.similar("space", "members enrolled in plan PLAN00024", threshold=0.9)
+    assert match.sql == "SELECT 24"
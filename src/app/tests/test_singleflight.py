@@ -0,0 +1,96 @@
+"""In-flight coalescing: one call per key, cancelled only when nobody waits for it any more."""
+import asyncio
+
+import pytest
+
+from gainwell_genie_app.backend.singleflight import SingleFlight
+
+
+class Work:
+    """A call that runs until released, recording how often it started and whether it was cancelled."""
+
+    def __init__(self) -> None:
+        self.started = 0
+        self.cancelled = False
+        self.done = asyncio.Event()
+
+    async def __call__(self) -> str:
+        self.started += 1
+        try:
+            await self.done.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return "answer"
+
+
+def test_concurrent_callers_share_one_call():
+    async def run():
+        flight, work = SingleFlight(), Work()
+        callers = [asyncio.create_task(flight.do("q", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        in_flight = len(flight)
+        work.done.set()
+        return work, in_flight, await asyncio.gather(*callers), len(flight)
+
+    work, in_flight, results, left = asyncio.run(run())
+    assert work.started == 1
+    assert in_flight == 1
+    assert results == [("answer", False), ("answer", True), ("answer", True)]
+    assert left == 0
+
+
+def test_call_goes_on_while_someone_waits():
+    async def run():
+        flight, work = SingleFlight(), Work()
+        first = asyncio.create_task(flight.do("q", work))
+        second = asyncio.create_task(flight.do("q", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        work.done.set()
+        return work, await second
+
+    work, second = asyncio.run(run())
+    assert not work.cancelled
+    assert second == ("answer", True)
+
+
+def test_call_is_cancelled_when_no_waiters_remain():
+    async def run():
+        flight, work = SingleFlight(), Work()
+        callers = [asyncio.create_task(flight.do("q", work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for c in callers:
+            c.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        in_flight = len(flight)
+        # A new caller starts a new call rather than joining the cancelled one
+        again = asyncio.create_task(flight.do("q", work))
+        await asyncio.sleep(0)
+        work.done.set()
+        return work, in_flight, await again
+
+    work, in_flight, again = asyncio.run(run())
+    assert work.cancelled
+    assert in_flight == 0
+    assert work.started == 2
+    assert again == ("answer", False)
+
+
+def test_waiter_timeout_does_not_cancel_the_shared_call():
+    async def run():
+        flight, work = SingleFlight(), Work()
+        patient = asyncio.create_task(flight.do("q", work))
+        await asyncio.sleep(0)
+        with pytest.raises(TimeoutError):
+            async with asyncio.timeout(0.01):
+                await flight.do("q", work)
+        work.done.set()
+        return work, await patient
+
+    work, patient = asyncio.run(run())
+    assert not work.cancelled
+    assert patient == ("answer", False)
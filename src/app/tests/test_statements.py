@@ -0,0 +1,96 @@
+"""Re-running SQL through the Statement Execution API, against the fake in benchmarks/fake_genie.py."""
+import asyncio
+
+import pytest
+
+from benchmarks.fake_genie import FakeGenieSettings, FakeWorkspaceClient, _row
+from gainwell_genie_app.backend import statements
+from gainwell_genie_app.backend.genie_client import PollBackoff
+from gainwell_genie_app.backend.statements import execute_statement, load_statement
+
+BACKOFF = PollBackoff(initial=0.01, maximum=0.02, jitter=0, timeout=5)
+
+
+def fake(**settings) -> FakeWorkspaceClient:
+    return FakeWorkspaceClient(FakeGenieSettings(**{"api_latency": 0, "execution_latency": 0.05, **settings}))
+
+
+@pytest.fixture(params=["ARROW_STREAM", "JSON_ARRAY"])
+def result_format(request, monkeypatch):
+    if request.param == "ARROW_STREAM":
+        pytest.importorskip("pyarrow")
+    monkeypatch.setattr(statements, "result_format", lambda: request.param)
+    return request.param
+
+
+def test_execute_polls_until_succeeded_then_pages(result_format):
+    w = fake(result_rows=250, chunk_count=3)
+
+    async def run():
+        result = await execute_statement(w, "SELECT 1", "warehouse", backoff=BACKOFF)
+        middle = await result.page(w, 80, 20)  # spans chunks 0 and 1
+        tail = await result.page(w, 240, 50)
+        again = await load_statement(w, result.statement_id)
+        return result, middle, tail, again
+
+    result, middle, tail, again = asyncio.run(run())
+    assert w.statement_execution.statements == ["SELECT 1"]
+    assert w.genie.calls["get_statement"] > 1
+    assert result.format == result_format
+    assert result.total_row_count == 250
+    assert [(c.index, c.row_offset, c.row_count) for c in result.chunks] == [(0, 0, 84), (1, 84, 84), (2, 168, 82)]
+    assert result.column_names[-1] == "totalpaid"
+    assert middle == [_row(i) for i in range(80, 100)]
+    assert tail == [_row(i) for i in range(240, 250)]
+    assert again.statement_id == result.statement_id and again.total_row_count == 250
+
+
+def test_row_limit_caps_the_result():
+    w = fake(result_rows=250)
+    result = asyncio.run(execute_statement(w, "SELECT 1", "warehouse", backoff=BACKOFF, row_limit=10))
+    assert result.total_row_count == 10
+
+
+def test_timeout_cancels_the_statement():
+    w = fake(execution_latency=60)
+    backoff = PollBackoff(initial=0.01, maximum=0.02, jitter=0, timeout=0.1)
+
+    async def run():
+        with pytest.raises(TimeoutError, match="still RUNNING"):
+            await execute_statement(w, "SELECT 1", "warehouse", backoff=backoff)
+        # The cancellation is sent in the background
+        await asyncio.gather(*statements._cancelling)
+
+    asyncio.run(run())
+    assert w.genie.calls["cancel_execution"] == 1
+    assert w.statement_execution.get_statement("run-1").status.state.value == "CANCELED"
+
+
+def test_cancelled_caller_cancels_the_statement():
+    w = fake(execution_latency=60)
+
+    async def run():
+        task = asyncio.create_task(execute_statement(w, "SELECT 1", "warehouse", backoff=BACKOFF))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.gather(*statements._cancelling)
+
+    asyncio.run(run())
+    assert w.genie.calls["cancel_execution"] == 1
+
+
+def test_external_link_chunks_are_fetched_in_order(result_format):
+    w = fake(result_rows=1_000, chunk_count=4)
+
+    async def run():
+        result = await execute_statement(w, "SELECT 1", "warehouse", backoff=BACKOFF)
+        return result, [rows async for rows in result.iter_chunks(w)]
+
+    result, chunks = asyncio.run(run())
+    # Every chunk is an external link: the first comes with the statement, the rest one request each
+    assert result.first.external_links and result.first.data_array is None
+    assert [len(rows) for rows in chunks] == [250, 250, 250, 250]
+    assert [r for rows in chunks for r in rows] == [_row(i) for i in range(1_000)]
+    assert w.genie.calls["result_chunk"] == 3